@@ -4,11 +4,48 @@ from Cloudforms.utils import CloudformsBase, CloudformsEndpoint
 
 # pylint: disable=too-few-public-methods
 class Client(CloudformsBase):
-    '''Public interface to the library'''
+    '''Public interface to the library
+
+    :param string host: appliance hostname (or IP address)
+    :param bool secure_host: use HTTPS
+    :param string username: API username
+    :param string password: API password
+    :param logger: a logger-like object (optional)
+    :param integer pool_connections: number of host pools to cache
+    :param integer pool_maxsize: max connections kept open per host
+    :param bool pool_block: block when all pooled connections are busy
+    :param bool keep_alive: reuse connections between calls
+    :param Cloudforms.cache.ResponseCache cache: cache for GET results
+                                                 (disabled by default)
+    :param decoder: JSON decoder name ('orjson', 'ujson' or 'json') or
+                    function, defaults to the fastest one installed
+    :param Cloudforms.retry.RetryPolicy retry: retry policy for failed
+                                               calls (disabled by default)
+    :param Cloudforms.retry.CircuitBreaker breaker: circuit breaker for
+                                                    the appliance
+                                                    (disabled by default)
+    :param list hooks: functions called with a
+                       :class:`Cloudforms.metrics.CallInfo` after every
+                       call, ex. a :class:`Cloudforms.metrics.MetricsCollector`
+    :param Cloudforms.limiter.RateLimiter limiter: rate / concurrency
+                                                   limits for the appliance
+                                                   (disabled by default)
+    :param Cloudforms.cache.SingleFlight coalesce: shares calls in
+                                                   progress between
+                                                   identical reads
+                                                   (disabled by default)
+    :param Cloudforms.transport.Transport transport: sends the requests
+                                                     (defaults to pooled
+                                                     HTTP/1.1 connections,
+                                                     see HTTP2Transport)
+    '''
     # pylint: disable=too-many-arguments
     def __init__(self, host='127.0.0.1', secure_host=True,
                  username='admin', password='smartvm',
-                 logger=None):
+                 logger=None, pool_connections=10, pool_maxsize=10,
+                 pool_block=False, keep_alive=True, cache=None,
+                 decoder=None, retry=None, breaker=None,
+                 limiter=None, hooks=None, coalesce=None, transport=None):
         endpoint = CloudformsEndpoint(
             host=host,
             secure=secure_host,
@@ -18,4 +55,16 @@ class Client(CloudformsBase):
                      'Accept': 'application/json'}
         )
 
-        CloudformsBase.__init__(self, endpoint, logger)
+        CloudformsBase.__init__(self, endpoint, logger,
+                                pool_connections=pool_connections,
+                                pool_maxsize=pool_maxsize,
+                                pool_block=pool_block,
+                                keep_alive=keep_alive,
+                                cache=cache,
+                                decoder=decoder,
+                                retry=retry,
+                                breaker=breaker,
+                                limiter=limiter,
+                                hooks=hooks,
+                                coalesce=coalesce,
+                                transport=transport)
@@ -6,6 +6,7 @@ from Cloudforms.managers.provision_request import ProvisionRequestManager
 from Cloudforms.managers.tag import TagManager
 from Cloudforms.managers.task import TaskManager
 from Cloudforms.managers.vs import VSManager
+from Cloudforms.multi import MultiClient
 
 assert Client
 assert ProviderManager
@@ -13,3 +14,4 @@ assert ProvisionRequestManager
 assert TagManager
 assert TaskManager
 assert VSManager
+assert MultiClient
@@ -0,0 +1,81 @@
+'''Cloudforms public asyncio library interface'''
+from Cloudforms.utils import CloudformsEndpoint
+from Cloudforms.aio.utils import AsyncCloudformsBase
+
+
+# pylint: disable=too-few-public-methods
+class AsyncClient(AsyncCloudformsBase):
+    '''Public asyncio interface to the library
+
+    :param string host: appliance hostname (or IP address)
+    :param bool secure_host: use HTTPS
+    :param string username: API username
+    :param string password: API password
+    :param logger: a logger-like object (optional)
+    :param integer pool_maxsize: max connections kept open in total
+    :param integer pool_maxsize_per_host: max connections per host
+    :param float keep_alive: seconds to keep idle connections open
+    :param integer max_concurrency: max requests in flight at once
+    :param Cloudforms.cache.ResponseCache cache: cache for GET results
+                                                 (disabled by default)
+    :param decoder: JSON decoder name ('orjson', 'ujson' or 'json') or
+                    function, defaults to the fastest one installed
+    :param Cloudforms.retry.RetryPolicy retry: retry policy for failed
+                                               calls (disabled by default)
+    :param Cloudforms.retry.CircuitBreaker breaker: circuit breaker for
+                                                    the appliance
+                                                    (disabled by default)
+    :param list hooks: functions called with a
+                       :class:`Cloudforms.metrics.CallInfo` after every
+                       call, ex. a :class:`Cloudforms.metrics.MetricsCollector`
+    :param Cloudforms.limiter.RateLimiter limiter: rate / concurrency
+                                                   limits for the appliance
+                                                   (disabled by default)
+    :param Cloudforms.cache.SingleFlight coalesce: shares calls in
+                                                   progress between
+                                                   identical reads
+                                                   (disabled by default)
+
+    Example::
+
+        import asyncio
+        from Cloudforms.aio import AsyncClient, AsyncVSManager
+
+        async def main():
+            async with AsyncClient(max_concurrency=50) as client:
+                vs_mgr = AsyncVSManager(client)
+                instances = await vs_mgr.list({'attributes': 'id'})
+                await asyncio.gather(*[
+                    vs_mgr.get(instance['id']) for instance in instances])
+
+        asyncio.get_event_loop().run_until_complete(main())
+    '''
+    # pylint: disable=too-many-arguments
+    def __init__(self, host='127.0.0.1', secure_host=True,
+                 username='admin', password='smartvm',
+                 logger=None, pool_maxsize=100, pool_maxsize_per_host=0,
+                 keep_alive=15, max_concurrency=None, cache=None,
+                 decoder=None, retry=None, breaker=None,
+                 limiter=None, hooks=None, coalesce=None):
+        endpoint = CloudformsEndpoint(
+            host=host,
+            secure=secure_host,
+            username=username,
+            password=password,
+            headers={'Content-Type': 'application/json',
+                     'Accept': 'application/json'}
+        )
+
+        AsyncCloudformsBase.__init__(
+            self, endpoint, logger,
+            pool_maxsize=pool_maxsize,
+            pool_maxsize_per_host=pool_maxsize_per_host,
+            keep_alive=keep_alive,
+            max_concurrency=max_concurrency,
+            cache=cache,
+            decoder=decoder,
+            retry=retry,
+            breaker=breaker,
+            limiter=limiter,
+            hooks=hooks,
+            coalesce=coalesce)
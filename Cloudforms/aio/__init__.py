@@ -0,0 +1,17 @@
+'''Cloudforms asyncio interface (requires Python 3.6+ and aiohttp)'''
+from Cloudforms.aio.API import AsyncClient
+
+from Cloudforms.aio.managers.provider import AsyncProviderManager
+from Cloudforms.aio.managers.provision_request import (
+    AsyncProvisionRequestManager
+)
+from Cloudforms.aio.managers.tag import AsyncTagManager
+from Cloudforms.aio.managers.task import AsyncTaskManager
+from Cloudforms.aio.managers.vs import AsyncVSManager
+
+assert AsyncClient
+assert AsyncProviderManager
+assert AsyncProvisionRequestManager
+assert AsyncTagManager
+assert AsyncTaskManager
+assert AsyncVSManager
@@ -0,0 +1,211 @@
+'''
+    Cloudforms.aio.AsyncProviderManager
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    Asynchronous Provider Manager (see Cloudforms.ProviderManager)
+
+    :license: MIT, see LICENSE for more details.
+'''
+from Cloudforms.managers.provider import ProviderManager
+from Cloudforms.records import Provider, as_records
+from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    update_fields,
+    update_params,
+    normalize_object,
+    normalize_collection
+)
+from Cloudforms.aio.utils import (
+    AsyncBatcher,
+    as_async_records,
+    iter_collection,
+    perform_action_many,
+    get_many
+)
+from Cloudforms.aio.managers.tag import AsyncServiceTagManager
+
+
+class AsyncProviderManager(object):
+    '''Manages Providers (asyncio).
+
+    :param Cloudforms.aio.AsyncClient client: an async API client instance
+    :param bool records: return Provider records (see Cloudforms.records)
+                         instead of dictionaries
+
+    Example::
+
+        from Cloudforms.aio import AsyncClient, AsyncProviderManager
+        client = AsyncClient()
+        provider_mgr = AsyncProviderManager(client)
+    '''
+    #: Named field presets (see :attr:`Cloudforms.ProviderManager.FIELDS`)
+    FIELDS = ProviderManager.FIELDS
+
+    def __init__(self, client, records=False):
+        self.client = client
+        self.record_class = Provider if records else None
+        self.tags = AsyncServiceTagManager(client, 'providers')
+
+    async def get(self, _id, params=None, fields=None):
+        '''Retrieve details about a provider on the account
+
+        :param string _id: Specifies which provider the request is for
+        :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :returns: Dictionary representing the matching provider
+        '''
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        return as_records(self.record_class, normalize_object(
+            await self.client.call('get', '/providers/%s' % _id,
+                                   params=params)))
+
+    # pylint: disable=too-many-arguments
+    async def get_many(self, ids, params=None, fields=None, batch_size=None,
+                       query=False):
+        '''Retrieve details about many providers, batch_size per request
+        (see :func:`Cloudforms.aio.utils.get_many`)
+
+        :param list ids: Specifies which providers the request is for
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer batch_size: number of providers per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: List of dictionaries representing the matching
+                  providers, in the same order as ids (None for IDs not
+                  found)
+        '''
+        return as_records(self.record_class, await get_many(
+            self.client, 'providers', ids,
+            update_fields(params, fields, self.FIELDS), batch_size, query))
+
+    # pylint: disable=too-many-arguments
+    def batcher(self, params=None, fields=None, window=0.005,
+                batch_size=None, query=False):
+        '''Returns a batcher turning concurrent lookups of single
+        providers into batched get_many calls (see
+        :class:`Cloudforms.aio.utils.AsyncBatcher`)
+
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param float window: seconds a lookup waits for others
+        :param integer batch_size: max providers per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: Cloudforms.aio.utils.AsyncBatcher
+        '''
+        return AsyncBatcher(
+            lambda ids: self.get_many(ids, params, fields, batch_size,
+                                      query),
+            window, batch_size or DEFAULT_BATCH_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def list(self, params=None, page_size=None, workers=None,
+             fields=None, stream=False):
+        '''Retrieve a list of all providers on the account
+
+        :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer page_size: if set, lazily page through the
+                                  collection this many resources at a time
+        :param integer workers: if set, fetch this many pages concurrently
+                                (implies paging)
+        :param bool stream: decode resources as the response downloads
+                            (in a single request unless page_size is set)
+        :returns: Awaitable list of dictionaries or, when paging, an
+                  asynchronous generator of dictionaries
+        '''
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        if page_size or workers or stream:
+            return as_async_records(self.record_class, iter_collection(
+                self.client, '/providers', params, page_size, workers, stream))
+        return self._list(params)
+
+    async def _list(self, params):
+        '''Retrieves the whole collection in a single request'''
+        return as_records(self.record_class, normalize_collection(
+            await self.client.call('get', '/providers', params=params)))
+
+    async def perform_action(self, _id, action, params=None):
+        '''Sends a request to perform an action on a provider
+
+        :param string _id: Specifies which provider the request is for
+        :param string action: The action to request (delete, refresh, etc.)
+        :param dict params: Additional POST request data
+        :returns: Task request, or Provider, dictionary object
+        '''
+        params = update_params(params, {'action': action})
+        return normalize_object(
+            await self.client.call('post', '/providers/%s' % _id,
+                                   data=params))
+
+    async def perform_action_many(self, ids, action, params=None,
+                                  batch_size=None):
+        '''Sends batched requests to perform an action on many providers
+
+        :param list ids: Specifies which providers the request is for
+        :param string action: The action to request (delete, refresh, etc.)
+        :param dict params: Additional per-resource POST request data
+        :param integer batch_size: number of providers per request
+        :returns: List of result dictionaries, in the same order as ids
+                  (failed items have a false 'success' key)
+        '''
+        return await perform_action_many(self.client, 'providers', ids,
+                                         action, params, batch_size)
+
+    async def create(self, params=None):
+        '''Creates a new provider on the account (pass-through params)
+
+        :param dict params: Additional POST request data
+        :returns: Provider dictionary object
+        '''
+        return normalize_object(
+            await self.client.call('post', '/providers', data=params))
+
+    # pylint: disable=too-many-arguments
+    async def create_amazon(self, name, region,
+                            access_key, secret_key,
+                            params=None):
+        '''Creates a new Amazon (AWS) provider on the account
+
+        :param name string: Display name of the provider
+        :param region string: AWS region (ex. us-east-1)
+        :param access_key string: AWS API Access Key ID
+        :param secret_key string: AWS API Access Secret Key
+        :param dict params: Additional POST request data
+        :returns: Provider dictionary object
+        '''
+        return await self.create(update_params(params, {
+            'type': 'ManageIQ::Providers::Amazon::CloudManager',
+            'name': name,
+            'provider_region': region,
+            'credentials': {
+                'userid': access_key,
+                'password': secret_key
+            }
+        }))
+
+    async def delete(self, _id, params=None):
+        '''Sends a request to delete a provider (see perform_action)'''
+        return await self.perform_action(_id, 'delete', params)
+
+    async def refresh(self, _id, params=None):
+        '''Sends a request to refresh a provider (see perform_action)'''
+        return await self.perform_action(_id, 'refresh', params)
+
+    async def update(self, _id, params=None):
+        '''Sends a request to update a provider (see perform_action)'''
+        return await self.perform_action(_id, 'edit', params)
+
+    async def delete_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to delete many providers'''
+        return await self.perform_action_many(ids, 'delete', params,
+                                              batch_size)
+
+    async def refresh_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to refresh many providers'''
+        return await self.perform_action_many(ids, 'refresh', params,
+                                              batch_size)
@@ -0,0 +1,281 @@
+'''
+    Cloudforms.aio.AsyncProvisionRequestManager
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    Asynchronous Provision Request Manager
+    (see Cloudforms.ProvisionRequestManager)
+
+    :license: MIT, see LICENSE for more details.
+'''
+import asyncio
+from Cloudforms.managers.provision_request import (
+    ProvisionRequestManager,
+    next_batch,
+    track_missing,
+    track_submitted,
+    track_timeout
+)
+from Cloudforms.records import ProvisionRequest, as_records
+from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    update_fields,
+    monotonic,
+    update_params,
+    normalize_object,
+    normalize_collection
+)
+from Cloudforms.poller import Backoff, CollectionPoller
+from Cloudforms.aio.utils import (
+    AsyncBatcher,
+    as_async_records,
+    iter_collection,
+    post_resources,
+    wait_collection,
+    get_many
+)
+
+
+class AsyncProvisionRequestManager(object):
+    '''Manages Provision Requests (asyncio).
+
+    :param Cloudforms.aio.AsyncClient client: an async API client instance
+    :param bool records: return ProvisionRequest records (see
+                         Cloudforms.records) instead of dictionaries
+
+    Example::
+
+        from Cloudforms.aio import AsyncClient, AsyncProvisionRequestManager
+        client = AsyncClient()
+        preq_mgr = AsyncProvisionRequestManager(client)
+    '''
+    #: Named field presets (see ProvisionRequestManager.FIELDS)
+    FIELDS = ProvisionRequestManager.FIELDS
+
+    def __init__(self, client, records=False):
+        self.client = client
+        self.record_class = ProvisionRequest if records else None
+
+    async def get(self, _id, params=None, fields=None):
+        '''Retrieve details about a provision request on the account
+
+        :param string _id: Specifies which provision request the request is for
+        :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :returns: Dictionary representing the matching provision request
+        '''
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        return as_records(self.record_class, normalize_object(
+            await self.client.call('get', '/provision_requests/%s' %
+                                   _id, params=params)))
+
+    # pylint: disable=too-many-arguments
+    async def get_many(self, ids, params=None, fields=None, batch_size=None,
+                       query=False):
+        '''Retrieve details about many provision requests, batch_size per
+        request (see :func:`Cloudforms.aio.utils.get_many`)
+
+        :param list ids: Specifies which provision requests the request is
+                         for
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer batch_size: number of provision requests per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: List of dictionaries representing the matching
+                  provision requests, in the same order as ids (None for
+                  IDs not found)
+        '''
+        return as_records(self.record_class, await get_many(
+            self.client, 'provision_requests', ids,
+            update_fields(params, fields, self.FIELDS), batch_size, query))
+
+    # pylint: disable=too-many-arguments
+    def batcher(self, params=None, fields=None, window=0.005,
+                batch_size=None, query=False):
+        '''Returns a batcher turning concurrent lookups of single
+        provision requests into batched get_many calls (see
+        :class:`Cloudforms.aio.utils.AsyncBatcher`)
+
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param float window: seconds a lookup waits for others
+        :param integer batch_size: max provision requests per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: Cloudforms.aio.utils.AsyncBatcher
+        '''
+        return AsyncBatcher(
+            lambda ids: self.get_many(ids, params, fields, batch_size,
+                                      query),
+            window, batch_size or DEFAULT_BATCH_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def list(self, params=None, page_size=None, workers=None,
+             fields=None, stream=False):
+        '''Retrieve a list of all provision requests on the account
+
+        :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer page_size: if set, lazily page through the
+                                  collection this many resources at a time
+        :param integer workers: if set, fetch this many pages concurrently
+                                (implies paging)
+        :param bool stream: decode resources as the response downloads
+                            (in a single request unless page_size is set)
+        :returns: Awaitable list of dictionaries or, when paging, an
+                  asynchronous generator of dictionaries
+        '''
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        if page_size or workers or stream:
+            return as_async_records(self.record_class, iter_collection(
+                self.client, '/provision_requests', params,
+                page_size, workers, stream))
+        return self._list(params)
+
+    async def _list(self, params):
+        '''Retrieves the whole collection in a single request'''
+        return as_records(self.record_class, normalize_collection(
+            await self.client.call('get', '/provision_requests',
+                                   params=params)))
+
+    async def perform_action(self, _id, action, params=None):
+        '''Sends a request to perform an action on a provision request
+
+        :param string _id: Specifies which provision request the request is for
+        :param string action: The action to request (delete, refresh, etc.)
+        :param dict params: Additional POST request data
+        :returns: ProvisionRequest dictionary object
+        '''
+        params = update_params(params, {'action': action})
+        return normalize_object(
+            await self.client.call('post', '/provision_requests/%s' %
+                                   _id, data=params))
+
+    async def create(self, params=None):
+        '''Creates a new provision request on the account
+
+        :param dict params: Additional POST request data
+        :returns: ProvisionRequest dictionary object
+        '''
+        params = update_params(params, {'action': 'create'})
+        return normalize_object(
+            await self.client.call('post', '/provision_requests',
+                                   data=params))
+
+    async def wait(self, _id, timeout=30, request_state='finished',
+                   params=None):
+        '''Waits for a provision request to reach a certain request_state
+
+        :param string request_state: wait until the provision request reaches
+                                     this request_state (case insensitive)
+        :param integer timeout: operation timeout (in seconds)
+        :param dict params: response-level options (attributes, limit, etc.)
+        :returns bool: **True** on success, **False** on error or timeout
+        '''
+        params = update_params(params, {'expand': 'resources'})
+        deadline = monotonic() + timeout
+        while monotonic() <= deadline:
+            # Bypasses the client's cache, polls need the current state
+            preq = normalize_object(await self.client.call(
+                'get', '/provision_requests/%s' % _id, params=params,
+                cache=False))
+            if not preq or not preq.get('request_state'):
+                return False
+            elif preq.get('request_state').lower() == request_state.lower():
+                return True
+            await asyncio.sleep(1)
+        return False
+
+    # pylint: disable=too-many-arguments
+    def wait_many(self, ids, timeout=30, request_state='finished',
+                  params=None, batch_size=None, backoff=None):
+        '''Waits for many provision requests to reach a certain request_state
+        (see :meth:`Cloudforms.ProvisionRequestManager.wait_many`)
+
+        :returns: Asynchronous generator yielding each provision request as it
+                  completes
+        '''
+        poller = CollectionPoller(self.client, '/provision_requests',
+                                  'request_state', request_state,
+                                  params=params, batch_size=batch_size)
+        poller.add(ids)
+        return wait_collection(self.client, poller, timeout, backoff)
+
+    # pylint: disable=too-many-arguments
+    def create_many(self, specs, max_outstanding=50, batch_size=None,
+                    timeout=None, request_state='finished', params=None,
+                    backoff=None):
+        '''Provisions in bulk: submits provision requests in batches and
+        yields each one as it completes
+        (see :meth:`Cloudforms.ProvisionRequestManager.create_many`)
+
+        Create requests and polling queries are sent concurrently.
+
+        :returns: Asynchronous generator yielding each provision request
+                  as it completes
+        '''
+        if max_outstanding < 1:
+            raise ValueError('max_outstanding must be at least 1')
+        return self._create_many(specs, max_outstanding, batch_size,
+                                 timeout, request_state, params, backoff)
+
+    # pylint: disable=too-many-arguments,too-many-locals
+    async def _create_many(self, specs, max_outstanding, batch_size,
+                           timeout, request_state, params, backoff):
+        '''Submits and tracks provision requests (see create_many)'''
+        poller = CollectionPoller(self.client, '/provision_requests',
+                                  'request_state', request_state,
+                                  params=params, batch_size=batch_size)
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        backoff = backoff or Backoff()
+        deadline = None if timeout is None else monotonic() + timeout
+        specs = iter(specs)
+        seen = set()
+        exhausted = False
+        while True:
+            # Top up the outstanding provision requests
+            batches = list()
+            while not exhausted:
+                room = max_outstanding - len(poller.pending) - \
+                    sum(len(batch) for batch in batches)
+                batch = next_batch(specs, room, batch_size)
+                if not batch:
+                    exhausted = room > 0
+                    break
+                batches.append(batch)
+            results = await asyncio.gather(*[
+                post_resources(self.client, 'provision_requests', 'create',
+                               batch) for batch in batches])
+            for batch, ret in zip(batches, results):
+                for failure in track_submitted(poller, batch, ret):
+                    yield failure
+            if not poller.pending:
+                if exhausted:
+                    return
+                continue
+            remaining = None if deadline is None else deadline - monotonic()
+            if remaining is not None and remaining <= 0:
+                for failure in track_timeout(poller, specs):
+                    yield failure
+                return
+            await asyncio.sleep(backoff.next() if remaining is None
+                                else min(backoff.next(), remaining))
+            queries = poller.queries()
+            pages = await asyncio.gather(*[
+                self.client.call('get', poller.path, params=query,
+                                 cache=False)
+                for _, query in queries])
+            done = list()
+            for (queried, _), page in zip(queries, pages):
+                done.extend(poller.update(
+                    queried, page if isinstance(page, list) else list()))
+            for preq in done:
+                yield preq
+            for failure in track_missing(poller, seen):
+                yield failure
+            # Poll eagerly again while things are progressing
+            if done:
+                backoff.reset()
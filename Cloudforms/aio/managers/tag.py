@@ -0,0 +1,214 @@
+'''
+    Cloudforms.aio.AsyncTagManager
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    Asynchronous Tag Manager (see Cloudforms.TagManager)
+
+    :license: MIT, see LICENSE for more details.
+'''
+import asyncio
+from Cloudforms.managers.tag import TagManager, tag_resources
+from Cloudforms.poller import Backoff
+from Cloudforms.records import Tag, as_records
+from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    chunked,
+    update_fields,
+    update_params,
+    normalize_object,
+    normalize_collection,
+    permanent_failure
+)
+from Cloudforms.aio.utils import (
+    AsyncBatcher,
+    as_async_records,
+    iter_collection,
+    post_resources,
+    get_many
+)
+
+
+class AsyncServiceTagManager(object):
+    '''Manages Tags for Services (asyncio).
+
+    :param Cloudforms.aio.AsyncClient client: an async API client instance
+    :param string svc: a service name to bind to
+    '''
+    def __init__(self, client, svc):
+        self.client = client
+        self.svc = svc
+
+    async def assign(self, _id, names):
+        '''Assigns one or more tags to a service
+
+        :param string _id: Specifies which service item the request is for
+        :param list names: Names of tags to assign (['/my/tag', '/a/tag'])
+        '''
+        await self.client.call('post', '/%s/%s/tags' % (self.svc, _id), data={
+            'action': 'assign',
+            'resources': [{'name': name} for name in names]
+        })
+
+    async def unassign(self, _id, names):
+        '''Un-assigns one or more tags to a service
+
+        :param string _id: Specifies which service item the request is for
+        :param list names: Names of tags to un-assign (['/my/tag', '/a/tag'])
+        '''
+        await self.client.call('post', '/%s/%s/tags' % (self.svc, _id), data={
+            'action': 'unassign',
+            'resources': [{'name': name} for name in names]
+        })
+
+    async def assign_many(self, tags, batch_size=None, retries=2,
+                          backoff=None):
+        '''Assigns tags to many services using collection-level POSTs
+        (see :meth:`Cloudforms.managers.tag.ServiceTagManager.assign_many`);
+        batches are sent concurrently
+
+        :param dict tags: service item ID -> names of tags to assign
+        :returns: Dictionary of service item ID -> result dictionary
+        '''
+        return await self._tag_many('assign_tags', tags, batch_size,
+                                    retries, backoff)
+
+    async def unassign_many(self, tags, batch_size=None, retries=2,
+                            backoff=None):
+        '''Un-assigns tags from many services using collection-level POSTs
+        (see :meth:`Cloudforms.managers.tag.ServiceTagManager.assign_many`);
+        batches are sent concurrently
+
+        :param dict tags: service item ID -> names of tags to un-assign
+        :returns: Dictionary of service item ID -> result dictionary
+        '''
+        return await self._tag_many('unassign_tags', tags, batch_size,
+                                    retries, backoff)
+
+    # pylint: disable=too-many-arguments
+    async def _tag_many(self, action, tags, batch_size, retries, backoff):
+        '''Sends a tag action in batches, retrying failed resources'''
+        backoff = backoff or Backoff()
+        pending = tag_resources(self.client, self.svc, tags)
+        results = dict()
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(backoff.next())
+            chunks = list(chunked(pending, batch_size or DEFAULT_BATCH_SIZE))
+            batches = await asyncio.gather(*[
+                post_resources(self.client, self.svc, action,
+                               [data for _, data in chunk])
+                for chunk in chunks])
+            failed = list()
+            for chunk, ret in zip(chunks, batches):
+                for (_id, data), result in zip(chunk, ret):
+                    results[_id] = result
+                    if not result.get('success') and \
+                       not permanent_failure(result):
+                        failed.append((_id, data))
+            if not failed:
+                break
+            pending = failed
+        return results
+
+
+class AsyncTagManager(object):
+    '''Manages Tags (asyncio).
+
+    :param Cloudforms.aio.AsyncClient client: an async API client instance
+    :param bool records: return Tag records (see Cloudforms.records)
+                         instead of dictionaries
+
+    Example::
+
+        from Cloudforms.aio import AsyncClient, AsyncTagManager
+        client = AsyncClient()
+        tag_mgr = AsyncTagManager(client)
+    '''
+    #: Named field presets (see :attr:`Cloudforms.TagManager.FIELDS`)
+    FIELDS = TagManager.FIELDS
+
+    def __init__(self, client, records=False):
+        self.client = client
+        self.record_class = Tag if records else None
+
+    async def get(self, _id, params=None, fields=None):
+        '''Retrieve details about a tag on the account
+
+        :param string _id: Specifies which tag the request is for
+        :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :returns: Dictionary representing the matching tag
+        '''
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        return as_records(self.record_class, normalize_object(
+            await self.client.call('get', '/tags/%s' % _id, params=params)))
+
+    # pylint: disable=too-many-arguments
+    async def get_many(self, ids, params=None, fields=None, batch_size=None,
+                       query=False):
+        '''Retrieve details about many tags, batch_size per request
+        (see :func:`Cloudforms.aio.utils.get_many`)
+
+        :param list ids: Specifies which tags the request is for
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer batch_size: number of tags per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: List of dictionaries representing the matching
+                  tags, in the same order as ids (None for IDs not
+                  found)
+        '''
+        return as_records(self.record_class, await get_many(
+            self.client, 'tags', ids,
+            update_fields(params, fields, self.FIELDS), batch_size, query))
+
+    # pylint: disable=too-many-arguments
+    def batcher(self, params=None, fields=None, window=0.005,
+                batch_size=None, query=False):
+        '''Returns a batcher turning concurrent lookups of single
+        tags into batched get_many calls (see
+        :class:`Cloudforms.aio.utils.AsyncBatcher`)
+
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param float window: seconds a lookup waits for others
+        :param integer batch_size: max tags per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: Cloudforms.aio.utils.AsyncBatcher
+        '''
+        return AsyncBatcher(
+            lambda ids: self.get_many(ids, params, fields, batch_size,
+                                      query),
+            window, batch_size or DEFAULT_BATCH_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def list(self, params=None, page_size=None, workers=None,
+             fields=None, stream=False):
+        '''Retrieve a list of all tags on the account
+
+        :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer page_size: if set, lazily page through the
+                                  collection this many resources at a time
+        :param integer workers: if set, fetch this many pages concurrently
+                                (implies paging)
+        :param bool stream: decode resources as the response downloads
+                            (in a single request unless page_size is set)
+        :returns: Awaitable list of dictionaries or, when paging, an
+                  asynchronous generator of dictionaries
+        '''
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        if page_size or workers or stream:
+            return as_async_records(self.record_class, iter_collection(
+                self.client, '/tags', params, page_size, workers, stream))
+        return self._list(params)
+
+    async def _list(self, params):
+        '''Retrieves the whole collection in a single request'''
+        return as_records(self.record_class, normalize_collection(
+            await self.client.call('get', '/tags', params=params)))
@@ -0,0 +1,166 @@
+'''
+    Cloudforms.aio.AsyncTaskManager
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    Asynchronous Task Manager (see Cloudforms.TaskManager)
+
+    :license: MIT, see LICENSE for more details.
+'''
+import asyncio
+from Cloudforms.managers.task import TaskManager
+from Cloudforms.records import Task, as_records
+from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    update_fields,
+    monotonic,
+    update_params,
+    normalize_object,
+    normalize_collection
+)
+from Cloudforms.poller import CollectionPoller
+from Cloudforms.aio.utils import (
+    AsyncBatcher,
+    as_async_records,
+    iter_collection,
+    wait_collection,
+    get_many
+)
+
+
+class AsyncTaskManager(object):
+    '''Manages Tasks (asyncio).
+
+    :param Cloudforms.aio.AsyncClient client: an async API client instance
+    :param bool records: return Task records (see Cloudforms.records)
+                         instead of dictionaries
+
+    Example::
+
+        from Cloudforms.aio import AsyncClient, AsyncTaskManager
+        client = AsyncClient()
+        task_mgr = AsyncTaskManager(client)
+    '''
+    #: Named field presets (see :attr:`Cloudforms.TaskManager.FIELDS`)
+    FIELDS = TaskManager.FIELDS
+
+    def __init__(self, client, records=False):
+        self.client = client
+        self.record_class = Task if records else None
+
+    async def get(self, _id, params=None, fields=None):
+        '''Retrieve details about a task on the account
+
+        :param string _id: Specifies which task the request is for
+        :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :returns: Dictionary representing the matching task
+        '''
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        return as_records(self.record_class, normalize_object(
+            await self.client.call('get', '/tasks/%s' % _id, params=params)))
+
+    # pylint: disable=too-many-arguments
+    async def get_many(self, ids, params=None, fields=None, batch_size=None,
+                       query=False):
+        '''Retrieve details about many tasks, batch_size per request
+        (see :func:`Cloudforms.aio.utils.get_many`)
+
+        :param list ids: Specifies which tasks the request is for
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer batch_size: number of tasks per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: List of dictionaries representing the matching
+                  tasks, in the same order as ids (None for IDs not
+                  found)
+        '''
+        return as_records(self.record_class, await get_many(
+            self.client, 'tasks', ids,
+            update_fields(params, fields, self.FIELDS), batch_size, query))
+
+    # pylint: disable=too-many-arguments
+    def batcher(self, params=None, fields=None, window=0.005,
+                batch_size=None, query=False):
+        '''Returns a batcher turning concurrent lookups of single
+        tasks into batched get_many calls (see
+        :class:`Cloudforms.aio.utils.AsyncBatcher`)
+
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param float window: seconds a lookup waits for others
+        :param integer batch_size: max tasks per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: Cloudforms.aio.utils.AsyncBatcher
+        '''
+        return AsyncBatcher(
+            lambda ids: self.get_many(ids, params, fields, batch_size,
+                                      query),
+            window, batch_size or DEFAULT_BATCH_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def list(self, params=None, page_size=None, workers=None,
+             fields=None, stream=False):
+        '''Retrieve a list of all tasks on the account
+
+        :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer page_size: if set, lazily page through the
+                                  collection this many resources at a time
+        :param integer workers: if set, fetch this many pages concurrently
+                                (implies paging)
+        :param bool stream: decode resources as the response downloads
+                            (in a single request unless page_size is set)
+        :returns: Awaitable list of dictionaries or, when paging, an
+                  asynchronous generator of dictionaries
+        '''
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        if page_size or workers or stream:
+            return as_async_records(self.record_class, iter_collection(
+                self.client, '/tasks', params, page_size, workers, stream))
+        return self._list(params)
+
+    async def _list(self, params):
+        '''Retrieves the whole collection in a single request'''
+        return as_records(self.record_class, normalize_collection(
+            await self.client.call('get', '/tasks', params=params)))
+
+    async def wait(self, _id, timeout=30, state='finished', params=None):
+        '''Waits for a task to reach a certain state
+
+        :param string state: wait until the task reaches this state
+                             (case insensitive)
+        :param integer timeout: operation timeout (in seconds)
+        :param dict params: response-level options (attributes, limit, etc.)
+        :returns bool: **True** on success, **False** on error or timeout
+        '''
+        params = update_params(params, {'expand': 'resources'})
+        deadline = monotonic() + timeout
+        while monotonic() <= deadline:
+            # Bypasses the client's cache, polls need the current state
+            task = normalize_object(await self.client.call(
+                'get', '/tasks/%s' % _id, params=params, cache=False))
+            if not task or not task.get('state'):
+                return False
+            elif task.get('state').lower() == state.lower():
+                return True
+            await asyncio.sleep(1)
+        return False
+
+    # pylint: disable=too-many-arguments
+    def wait_many(self, ids, timeout=30, state='finished', params=None,
+                  batch_size=None, backoff=None):
+        '''Waits for many tasks to reach a certain state
+        (see :meth:`Cloudforms.TaskManager.wait_many`)
+
+        :returns: Asynchronous generator yielding each task as it
+                  completes
+        '''
+        poller = CollectionPoller(self.client, '/tasks', 'state', state,
+                                  params=params, batch_size=batch_size)
+        poller.add(ids)
+        return wait_collection(self.client, poller, timeout, backoff)
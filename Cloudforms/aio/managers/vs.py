@@ -0,0 +1,197 @@
+'''
+    Cloudforms.aio.AsyncVSManager
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    Asynchronous VS Manager (see Cloudforms.VSManager)
+
+    :license: MIT, see LICENSE for more details.
+'''
+from Cloudforms.managers.vs import VSManager
+from Cloudforms.records import VirtualServer, as_records
+from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    update_fields,
+    update_params,
+    normalize_object,
+    normalize_collection
+)
+from Cloudforms.aio.managers.tag import AsyncServiceTagManager
+from Cloudforms.aio.utils import (
+    AsyncBatcher,
+    as_async_records,
+    iter_collection,
+    perform_action_many,
+    get_many
+)
+
+
+class AsyncVSManager(object):
+    '''Manages Virtual Servers (asyncio).
+
+    :param Cloudforms.aio.AsyncClient client: an async API client instance
+    :param bool records: return VirtualServer records (see Cloudforms.records)
+                         instead of dictionaries
+
+    Example::
+
+        from Cloudforms.aio import AsyncClient, AsyncVSManager
+        client = AsyncClient()
+        vs_mgr = AsyncVSManager(client)
+    '''
+    #: Named field presets (see :attr:`Cloudforms.VSManager.FIELDS`)
+    FIELDS = VSManager.FIELDS
+
+    def __init__(self, client, records=False):
+        self.client = client
+        self.record_class = VirtualServer if records else None
+        self.tags = AsyncServiceTagManager(client, 'vms')
+
+    async def get(self, _id, params=None, fields=None):
+        '''Retrieve details about a virtual server on the account
+
+        :param string _id: Specifies which virtual server the request is for
+        :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :returns: Dictionary representing the matching virtual server
+        '''
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        return as_records(self.record_class, normalize_object(
+            await self.client.call('get', '/vms/%s' % _id, params=params)))
+
+    # pylint: disable=too-many-arguments
+    async def get_many(self, ids, params=None, fields=None, batch_size=None,
+                       query=False):
+        '''Retrieve details about many virtual servers, batch_size per request
+        (see :func:`Cloudforms.aio.utils.get_many`)
+
+        :param list ids: Specifies which virtual servers the request is for
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer batch_size: number of virtual servers per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: List of dictionaries representing the matching
+                  virtual servers, in the same order as ids (None for IDs not
+                  found)
+        '''
+        return as_records(self.record_class, await get_many(
+            self.client, 'vms', ids,
+            update_fields(params, fields, self.FIELDS), batch_size, query))
+
+    # pylint: disable=too-many-arguments
+    def batcher(self, params=None, fields=None, window=0.005,
+                batch_size=None, query=False):
+        '''Returns a batcher turning concurrent lookups of single
+        virtual servers into batched get_many calls (see
+        :class:`Cloudforms.aio.utils.AsyncBatcher`)
+
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param float window: seconds a lookup waits for others
+        :param integer batch_size: max virtual servers per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: Cloudforms.aio.utils.AsyncBatcher
+        '''
+        return AsyncBatcher(
+            lambda ids: self.get_many(ids, params, fields, batch_size,
+                                      query),
+            window, batch_size or DEFAULT_BATCH_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def list(self, params=None, page_size=None, workers=None,
+             fields=None, stream=False):
+        '''Retrieve a list of all virtual servers on the account
+
+        :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer page_size: if set, lazily page through the
+                                  collection this many resources at a time
+        :param integer workers: if set, fetch this many pages concurrently
+                                (implies paging)
+        :param bool stream: decode resources as the response downloads
+                            (in a single request unless page_size is set)
+        :returns: Awaitable list of dictionaries or, when paging, an
+                  asynchronous generator of dictionaries
+
+        Example::
+
+            instances = await vs_mgr.list({'attributes': 'id'})
+            async for instance in vs_mgr.list(page_size=500):
+                print(instance['id'])
+        '''
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        if page_size or workers or stream:
+            return as_async_records(self.record_class, iter_collection(
+                self.client, '/vms', params, page_size, workers, stream))
+        return self._list(params)
+
+    async def _list(self, params):
+        '''Retrieves the whole collection in a single request'''
+        return as_records(self.record_class, normalize_collection(
+            await self.client.call('get', '/vms', params=params)))
+
+    async def perform_action(self, _id, action, params=None):
+        '''Sends a request to perform an action on a virtual server
+
+        :param string _id: Specifies which virtual server the request is for
+        :param string action: The action to request (start, stop, suspend)
+        :param dict params: Additional POST request data
+        :returns: Task request dictionary (see TaskManager)
+        '''
+        params = update_params(params, {'action': action})
+        return normalize_object(
+            await self.client.call('post', '/vms/%s' % _id, data=params))
+
+    async def perform_action_many(self, ids, action, params=None,
+                                  batch_size=None):
+        '''Sends batched requests to perform an action on many virtual servers
+
+        :param list ids: Specifies which virtual servers the request is for
+        :param string action: The action to request (start, stop, suspend)
+        :param dict params: Additional per-resource POST request data
+        :param integer batch_size: number of virtual servers per request
+        :returns: List of task request dictionaries, in the same order
+                  as ids (failed items have a false 'success' key)
+        '''
+        return await perform_action_many(self.client, 'vms', ids, action,
+                                         params, batch_size)
+
+    async def start(self, _id, params=None):
+        '''Sends a request to start a virtual server (see perform_action)'''
+        return await self.perform_action(_id, 'start', params)
+
+    async def stop(self, _id, params=None):
+        '''Sends a request to stop a virtual server (see perform_action)'''
+        return await self.perform_action(_id, 'stop', params)
+
+    async def suspend(self, _id, params=None):
+        '''Sends a request to suspend a virtual server (see perform_action)'''
+        return await self.perform_action(_id, 'suspend', params)
+
+    async def delete(self, _id, params=None):
+        '''Sends a request to delete a virtual server (see perform_action)'''
+        return await self.perform_action(_id, 'delete', params)
+
+    async def start_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to start many virtual servers'''
+        return await self.perform_action_many(ids, 'start', params,
+                                              batch_size)
+
+    async def stop_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to stop many virtual servers'''
+        return await self.perform_action_many(ids, 'stop', params,
+                                              batch_size)
+
+    async def suspend_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to suspend many virtual servers'''
+        return await self.perform_action_many(ids, 'suspend', params,
+                                              batch_size)
+
+    async def delete_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to delete many virtual servers'''
+        return await self.perform_action_many(ids, 'delete', params,
+                                              batch_size)
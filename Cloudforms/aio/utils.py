@@ -0,0 +1,849 @@
+'''Cloudforms - Core asyncio classes and definitions'''
+import asyncio
+from weakref import WeakKeyDictionary
+from Cloudforms.exceptions import (
+    CloudformsError,
+    CloudformsHTTPError
+)
+from Cloudforms.decoders import ResourceScanner, get_decoder
+from Cloudforms.logs import log_payload
+from Cloudforms.metrics import CallInfo
+from Cloudforms.poller import Backoff
+from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_PAGE_SIZE,
+    STREAM_CHUNK_SIZE,
+    changes_collection,
+    chunked,
+    collection_total,
+    id_params,
+    index_resources,
+    monotonic,
+    query_resources,
+    request_failure,
+    update_params,
+    normalize_result
+)
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+def to_query(params):
+    '''Flattens params into (key, value) pairs aiohttp will accept'''
+    query = list()
+    for key, value in (params or dict()).items():
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            query.append((key, item if isinstance(item, str) else
+                          str(item).lower() if isinstance(item, bool) else
+                          str(item)))
+    return query
+
+
+async def get_page(client, path, params, offset, limit, stream=False):
+    '''Returns a single offset/limit page of a collection
+
+    With stream set the page is returned as an asynchronous generator
+    instead.
+    '''
+    page = await client.call('get', path, stream=stream,
+                             params=update_params(params, {
+                                 'offset': offset,
+                                 'limit': limit
+                             }))
+    if stream:
+        return page
+    # An exhausted collection returns an empty list of resources
+    return page if isinstance(page, list) else list()
+
+
+def as_async_records(record_class, resources):
+    '''Wraps an asynchronous generator of resources in records
+
+    :param type record_class: Record subclass to use (None for dicts)
+    :param resources: asynchronous generator of dictionaries
+    '''
+    if record_class is None:
+        return resources
+
+    async def wrap():
+        '''Yields each resource as a record'''
+        async for resource in resources:
+            yield record_class(resource)
+    return wrap()
+
+
+# pylint: disable=too-many-arguments
+async def iter_collection(client, path, params=None, page_size=None,
+                          workers=None, stream=False):
+    '''Lazily walks a collection one offset/limit page at a time
+
+    Asynchronous counterpart of :func:`Cloudforms.utils.iter_collection`.
+    If workers is set, the remaining pages (after the first) are fetched
+    concurrently, workers pages at a time, and yielded in order.
+    If stream is set, each page is decoded as it downloads, without
+    page_size the collection is then streamed in a single request.
+    Prefetched pages (workers) are always decoded whole.
+
+    :returns: Asynchronous generator yielding one resource at a time
+    '''
+    if stream and not (page_size or workers):
+        async for resource in await client.call(
+                'get', path, params=params, stream=True):
+            yield resource
+        return
+    page_size = page_size or DEFAULT_PAGE_SIZE
+    # Pages may come back shorter than page_size (the appliance caps
+    # limit), offsets move on by the number of resources returned
+    offset = 0
+    if stream and not workers:
+        while True:
+            count = 0
+            async for resource in await get_page(
+                    client, path, params, offset, page_size, stream=True):
+                count += 1
+                yield resource
+            if not count:
+                return
+            offset += count
+    while True:
+        page = await client.call('get', path, raw=True,
+                                 params=update_params(params, {
+                                     'offset': offset,
+                                     'limit': page_size
+                                 }))
+        resources = page.get('resources') or list() \
+            if isinstance(page, dict) else list()
+        for resource in resources:
+            yield resource
+        total = collection_total(page)
+        if not resources or (total is not None and
+                             offset + len(resources) >= total):
+            return
+        if workers and total is not None and not offset:
+            break
+        offset += len(resources)
+    # Prefetched pages are as long as the first one, asking for more
+    # than the appliance returns would leave gaps
+    stride = len(resources)
+    for window in chunked(range(stride, total, stride), workers):
+        pages = await asyncio.gather(*[
+            get_page(client, path, params, offset, stride)
+            for offset in window])
+        for page in pages:
+            for resource in page:
+                yield resource
+
+
+async def post_resources(client, collection, action, resources):
+    '''Sends one collection-level action POST for a batch of resources
+
+    Asynchronous counterpart of :func:`Cloudforms.utils.post_resources`.
+
+    :returns: List of result dictionaries, one per resource (in order)
+    '''
+    try:
+        ret = await client.call('post', '/%s' % collection, data={
+            'action': action,
+            'resources': resources
+        })
+        ret = ret if isinstance(ret, list) else list()
+        failure = {'message': 'No result returned for resource'}
+    except (CloudformsError, aiohttp.ClientError,
+            asyncio.TimeoutError) as err:
+        ret, failure = list(), request_failure(err)
+    return ret[:len(resources)] + [
+        dict(failure, success=False, href=resource.get('href'))
+        for resource in resources[len(ret):]]
+
+
+async def perform_action_many(client, collection, ids, action, params=None,
+                              batch_size=None):
+    '''Performs an action on many resources using collection-level POSTs
+
+    Asynchronous counterpart of
+    :func:`Cloudforms.utils.perform_action_many`; batches are sent
+    concurrently (subject to the client's concurrency limit).
+
+    :returns: List of result dictionaries, in the same order as ids
+    '''
+    batches = await asyncio.gather(*[
+        post_resources(client, collection, action, [
+            update_params(params, {
+                'href': '%s/%s/%s' % (client.base_url, collection, _id)
+            }) for _id in chunk])
+        for chunk in chunked(ids, batch_size or DEFAULT_BATCH_SIZE)])
+    return [result for batch in batches for result in batch]
+
+
+# pylint: disable=too-many-arguments
+async def get_many(client, collection, ids, params=None, batch_size=None,
+                   query=False):
+    '''Fetches many resources by ID, batch_size per request
+
+    Asynchronous counterpart of :func:`Cloudforms.utils.get_many`;
+    batches are sent concurrently (subject to the client's concurrency
+    limit).
+
+    :returns: List of resources, in the same order as ids (None for IDs
+              that were not found)
+    '''
+    def fetch(chunk):
+        '''Returns the coroutine fetching one batch'''
+        if query:
+            return client.call(
+                'post', '/%s' % collection, params=params,
+                data=query_resources(client, collection, chunk))
+        return client.call('get', '/%s' % collection,
+                           params=id_params(params, chunk))
+
+    batches = await asyncio.gather(*[
+        fetch(chunk) for chunk in chunked(
+            sorted(set(str(_id) for _id in ids)),
+            batch_size or DEFAULT_BATCH_SIZE)])
+    return index_resources(ids, [resource for batch in batches
+                                 for resource in batch or list()])
+
+
+class AsyncBatcher(object):
+    '''Collects the lookups made by concurrent coroutines for a short
+    window and fetches them all at once
+
+    Asynchronous counterpart of :class:`Cloudforms.batcher.Batcher`;
+    fetch is a coroutine function. Batches are fetched in the event loop
+    of the lookups.
+
+    :param fetch: coroutine function taking a list of IDs and returning
+                  the list of their resources, in the same order
+    :param float window: seconds to wait for other lookups
+    :param integer max_batch: max IDs fetched at once
+
+    Example::
+
+        vms = vs_mgr.batcher(fields='identity')
+        found = await asyncio.gather(*[vms.get(_id) for _id in ids])
+    '''
+    def __init__(self, fetch, window=0.005, max_batch=DEFAULT_BATCH_SIZE):
+        self.fetch = fetch
+        self.window = window
+        self.max_batch = max_batch
+        self.lookups = 0
+        self.batches = 0
+        self._pending = dict()
+        self._timer = None
+        self._tasks = set()
+
+    async def get(self, _id):
+        '''Returns a resource, fetched along with the other lookups made
+        within the window (None if it was not found)'''
+        return (await self.get_many([_id]))[0]
+
+    async def get_many(self, ids):
+        '''Returns resources, fetched along with the other lookups made
+        within the window (None for IDs not found)'''
+        loop = asyncio.get_event_loop()
+        futures = list()
+        for _id in ids:
+            _id = str(_id)
+            self.lookups += 1
+            future = self._pending.get(_id)
+            if future is None:
+                future = self._pending[_id] = loop.create_future()
+                if len(self._pending) >= self.max_batch:
+                    self._flush()
+            futures.append(future)
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        # A caller giving up must not cancel the lookup for the others
+        return list(await asyncio.gather(*[
+            asyncio.shield(future) for future in futures]))
+
+    def _flush(self):
+        '''Starts fetching the pending lookups'''
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, dict()
+        if batch:
+            self.batches += 1
+            task = asyncio.ensure_future(self._run(batch))
+            # Keep a reference until the task is done
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        '''Fetches a batch of lookups and hands out the results'''
+        ids = list(batch)
+        try:
+            resources = list(await self.fetch(ids) or list())
+        except Exception as err:  # pylint: disable=broad-except
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(err)
+                    # Mark it retrieved, every waiter may have given up
+                    future.exception()
+            return
+        for idx, _id in enumerate(ids):
+            if not batch[_id].done():
+                batch[_id].set_result(
+                    resources[idx] if idx < len(resources) else None)
+
+    @property
+    def stats(self):
+        '''Returns counters for monitoring (lookups, batches fetched)'''
+        return {
+            'lookups': self.lookups,
+            'batches': self.batches,
+            'pending': len(self._pending)
+        }
+
+
+def trace_config():
+    '''Returns an aiohttp TraceConfig filling in the connection level
+    timings of a call's CallInfo (passed as trace_request_ctx)'''
+    config = aiohttp.TraceConfig()
+
+    def mark(name):
+        '''Returns a callback recording when a phase started'''
+        async def callback(_session, context, _params):
+            if context.trace_request_ctx is not None:
+                setattr(context, name, monotonic())
+        return callback
+
+    def elapsed(context, name):
+        '''Returns the time since a phase started'''
+        return monotonic() - getattr(context, name)
+
+    async def on_queued_end(_session, context, _params):
+        if context.trace_request_ctx is not None:
+            context.setup = elapsed(context, 'queued_start')
+            context.trace_request_ctx.add('queue', context.setup)
+
+    async def on_dns_end(_session, context, _params):
+        if context.trace_request_ctx is not None:
+            context.dns = elapsed(context, 'dns_start')
+            context.trace_request_ctx.add('dns', context.dns)
+
+    async def on_connect_end(_session, context, _params):
+        if context.trace_request_ctx is not None:
+            # Name resolution happens within connection set up
+            connect = elapsed(context, 'connect_start')
+            context.setup = getattr(context, 'setup', 0.0) + connect
+            context.trace_request_ctx.add(
+                'connect', connect - getattr(context, 'dns', 0.0))
+
+    async def on_request_end(_session, context, _params):
+        if context.trace_request_ctx is not None:
+            context.trace_request_ctx.add(
+                'server', elapsed(context, 'request_start') -
+                getattr(context, 'setup', 0.0))
+    config.on_request_start.append(mark('request_start'))
+    config.on_connection_queued_start.append(mark('queued_start'))
+    config.on_connection_queued_end.append(on_queued_end)
+    config.on_dns_resolvehost_start.append(mark('dns_start'))
+    config.on_dns_resolvehost_end.append(on_dns_end)
+    config.on_connection_create_start.append(mark('connect_start'))
+    config.on_connection_create_end.append(on_connect_end)
+    config.on_request_end.append(on_request_end)
+    return config
+
+
+async def acquire_limiter(limiter):
+    '''Waits for a token and a slot without blocking the event loop
+    (see :meth:`Cloudforms.limiter.RateLimiter.acquire`)
+
+    :param Cloudforms.limiter.RateLimiter limiter: the limiter to wait for
+    :returns: Time spent waiting (in seconds)
+    '''
+    start = monotonic()
+    limiter.queue()
+    try:
+        delay = limiter.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        blocked = bool(delay)
+        semaphore = limiter_semaphore(limiter)
+        if semaphore is not None:
+            blocked = blocked or semaphore.locked()
+            await semaphore.acquire()
+    except BaseException:
+        limiter.queue(-1)
+        raise
+    waited = monotonic() - start if blocked else 0.0
+    limiter.started(waited)
+    return waited
+
+
+def release_limiter(limiter):
+    '''Gives back the slot taken by acquire_limiter'''
+    limiter.finished()
+    semaphore = limiter_semaphore(limiter)
+    if semaphore is not None:
+        semaphore.release()
+
+
+def limiter_semaphore(limiter):
+    '''Returns a limiter's in-flight semaphore for the running event loop'''
+    if not limiter.max_in_flight:
+        return None
+    loop = asyncio.get_event_loop()
+    semaphore = limiter.async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = limiter.async_semaphores[loop] = \
+            asyncio.Semaphore(limiter.max_in_flight)
+    return semaphore
+
+
+async def wait_collection(client, poller, timeout=30, backoff=None):
+    '''Polls until every resource completes or timeout expires
+
+    Asynchronous counterpart of
+    :meth:`Cloudforms.poller.CollectionPoller.wait`. The poller only
+    keeps track of state here, requests are sent through client.
+
+    :returns: Asynchronous generator yielding each resource as it completes
+    '''
+    backoff = backoff or Backoff()
+    deadline = monotonic() + timeout
+    while poller.pending:
+        queries = poller.queries()
+        pages = await asyncio.gather(*[
+            client.call('get', poller.path, params=params, cache=False)
+            for _, params in queries])
+        done = list()
+        for (queried, _), page in zip(queries, pages):
+            done.extend(poller.update(
+                queried, page if isinstance(page, list) else list()))
+        for resource in done:
+            yield resource
+        remaining = deadline - monotonic()
+        if not poller.pending or remaining <= 0:
+            return
+        # Poll eagerly again while things are progressing
+        if done:
+            backoff.reset()
+        await asyncio.sleep(min(backoff.next(), remaining))
+
+
+async def coalesce_call(flights, key, func):
+    '''Awaits func(), unless an identical call is in progress in the
+    running event loop (see :meth:`Cloudforms.cache.SingleFlight.do`)
+
+    :param Cloudforms.cache.SingleFlight flights: calls in progress
+    :param tuple key: the call's key
+    :param func: coroutine function making the call
+    :returns: Tuple of (result, shared)
+    '''
+    loop = asyncio.get_event_loop()
+    pending = flights.async_flights.get(loop)
+    if pending is None:
+        pending = flights.async_flights[loop] = dict()
+    future = pending.get(key)
+    if future is not None:
+        flights.count(shared=True)
+        # A waiter giving up must not cancel the call for the others
+        return await asyncio.shield(future), True
+    future = pending[key] = loop.create_future()
+    flights.count(shared=False)
+    try:
+        ret = await func()
+    except BaseException as err:
+        if isinstance(err, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(err)
+            # Mark it retrieved, there may be nobody waiting
+            future.exception()
+        raise
+    else:
+        future.set_result(ret)
+    finally:
+        del pending[key]
+    return ret, False
+
+
+# pylint: disable=too-few-public-methods,too-many-instance-attributes
+class AsyncCloudformsBase(object):
+    '''Base class for asyncio clients
+
+    All requests share one aiohttp session (and so one connection pool)
+    per client, and at most max_concurrency requests are in flight at
+    any time.
+
+    :param CloudformsEndpoint endpoint: the appliance to talk to
+    :param logger: a logger-like object (optional)
+    :param integer pool_maxsize: max connections kept open in total
+    :param integer pool_maxsize_per_host: max connections per host
+                                          (0 for no limit)
+    :param float keep_alive: seconds to keep idle connections open
+                             (0 disables keep-alive)
+    :param integer max_concurrency: max requests in flight at once
+                                    (None for no limit)
+    :param Cloudforms.cache.ResponseCache cache: cache for GET results
+    :param decoder: JSON decoder name or function
+                    (see :func:`Cloudforms.decoders.get_decoder`)
+    :param Cloudforms.retry.RetryPolicy retry: retry policy for failed calls
+    :param Cloudforms.retry.CircuitBreaker breaker: circuit breaker for
+                                                    the appliance
+    :param Cloudforms.limiter.RateLimiter limiter: rate / concurrency
+                                                   limits for the appliance
+    :param list hooks: functions called with a
+                       :class:`Cloudforms.metrics.CallInfo` after every
+                       call (ex. a MetricsCollector)
+    :param Cloudforms.cache.SingleFlight coalesce: shares calls in
+                                                   progress between
+                                                   identical reads
+    '''
+    # pylint: disable=too-many-arguments
+    def __init__(self, endpoint, logger=None, pool_maxsize=100,
+                 pool_maxsize_per_host=0, keep_alive=15,
+                 max_concurrency=None, cache=None, decoder=None,
+                 retry=None, breaker=None, limiter=None, hooks=None,
+                 coalesce=None):
+        if aiohttp is None:
+            raise CloudformsError('AsyncClient requires aiohttp '
+                                  '(pip install Cloudforms[async])')
+        self.endpoint = endpoint
+        self.log = logger
+        self.pool_maxsize = pool_maxsize
+        self.pool_maxsize_per_host = pool_maxsize_per_host
+        self.keep_alive = keep_alive
+        self.cache = cache
+        self.coalesce = coalesce
+        self.decoder = get_decoder(decoder)
+        self.retry = retry
+        self.breaker = breaker
+        self.limiter = limiter
+        self.hooks = list(hooks or [])
+        if breaker is not None and breaker.name is None:
+            breaker.name = endpoint.host
+        self.max_concurrency = max_concurrency
+        # Per event loop semaphores (one client may serve several loops)
+        self._semaphores = WeakKeyDictionary()
+        self._session = None
+
+    @property
+    def semaphore(self):
+        '''Returns the concurrency limit's semaphore for the running event
+        loop (None for no limit)'''
+        if not self.max_concurrency:
+            return None
+        loop = asyncio.get_event_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = \
+                asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    @property
+    def base_url(self):
+        '''Returns the API base URL for the endpoint'''
+        return '%s://%s/api' % (
+            'https' if self.endpoint.secure else 'http',
+            self.endpoint.host)
+
+    @property
+    def session(self):
+        '''Returns the client's session (created on first use)'''
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_maxsize,
+                    limit_per_host=self.pool_maxsize_per_host,
+                    keepalive_timeout=self.keep_alive or None,
+                    force_close=not self.keep_alive,
+                    ssl=False),
+                auth=aiohttp.BasicAuth(self.endpoint.username,
+                                       self.endpoint.password),
+                headers=self.endpoint.headers,
+                trace_configs=[trace_config()] if self.hooks else None)
+        return self._session
+
+    async def close(self):
+        '''Closes all pooled connections'''
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    # pylint: disable=too-many-arguments
+    async def call(self, method, path, data=None, params=None, raw=False,
+                   stream=False, cache=True):
+        '''Makes an API call (see :meth:`Cloudforms.utils.CloudformsBase.call`)
+
+        With stream set, the result is an asynchronous generator.
+        '''
+        # Normalize the method name for later string comparison
+        method = method.lower()
+        info = CallInfo(method, path) if self.hooks else None
+        if stream:
+            if method != 'get' or raw:
+                raise CloudformsError('Only (non-raw) GET responses '
+                                      'can be streamed')
+            return self._stream(method, path, data, params, info)
+        if info is None:
+            return await self._dispatch(method, path, data, params, raw,
+                                        cache)
+        start = monotonic()
+        try:
+            return await self._dispatch(method, path, data, params, raw,
+                                        cache, info)
+        except Exception as err:
+            info.error = err.__class__.__name__
+            raise
+        finally:
+            info.timings['total'] = monotonic() - start
+            self._report(info)
+
+    # pylint: disable=too-many-arguments
+    async def _dispatch(self, method, path, data, params, raw, cache=True,
+                        info=None):
+        '''Makes an API call (sharing an identical call in progress, if
+        coalescing is enabled)'''
+        # Writes always go through the cache (they invalidate it)
+        send = self._cached if cache or method != 'get' else self._call
+        if self.coalesce is not None and data is None and \
+           method in self.coalesce.methods:
+            async def lead():
+                '''Makes the call (the others report the leader's info)'''
+                return await send(method, path, data, params, raw, info), \
+                    info
+
+            (ret, leader), shared = await coalesce_call(
+                self.coalesce,
+                self.coalesce.key(method, path, params, raw) + (cache,),
+                lead)
+            if shared and info:
+                info.share(leader)
+            return ret
+        return await send(method, path, data, params, raw, info)
+
+    # pylint: disable=too-many-arguments
+    async def _cached(self, method, path, data, params, raw, info=None):
+        '''Makes an API call (through the cache, if there is one)'''
+        if self.cache is None:
+            return await self._call(method, path, data, params, raw, info)
+        if changes_collection(method, data):
+            try:
+                return await self._call(method, path, data, params, raw,
+                                        info)
+            finally:
+                self.cache.invalidate(path)
+        if method != 'get':
+            return await self._call(method, path, data, params, raw, info)
+        key = self.cache.key(method, path, params, raw)
+        ret = self.cache.get(key)
+        if ret is not None:
+            if info:
+                # Only successful reads are cached
+                info.cached, info.status = True, 200
+            return ret
+        # Revalidate a stale copy (if we have one) instead of refetching
+        status, headers, obj = await self._fetch(
+            method, path, data, params, self.cache.validators(key), info)
+        if status == 304:
+            ret = self.cache.revalidated(key)
+            if ret is not None:
+                if info:
+                    info.cached = True
+                return ret
+            status, headers, obj = await self._fetch(
+                method, path, data, params, info=info)
+        ret = self._result(method, path, obj, raw, headers)
+        self.cache.set(key, ret, headers)
+        return ret
+
+    def _report(self, info):
+        '''Hands a call's CallInfo to every hook'''
+        for hook in self.hooks:
+            try:
+                hook(info)
+            # pylint: disable=broad-except
+            except Exception as err:
+                # Instrumentation must never break API calls
+                if self.log:
+                    self.log.error('Metrics hook failed: %s', err)
+
+    # pylint: disable=too-many-arguments
+    async def _call(self, method, path, data, params, raw, info=None):
+        '''Makes an API call (bypassing the cache)'''
+        _, headers, obj = await self._fetch(method, path, data, params,
+                                            info=info)
+        return self._result(method, path, obj, raw, headers)
+
+    # pylint: disable=too-many-arguments
+    async def _fetch(self, method, path, data, params, headers=None,
+                     info=None):
+        '''Sends a request (subject to the concurrency limit)
+
+        :returns: Tuple of (status, response headers, decoded body),
+                  the body is None for a 304 (Not Modified)
+        '''
+        semaphore = self.semaphore
+        if semaphore is None:
+            return await self._exchange(method, path, data, params, headers,
+                                        info)
+        async with semaphore:
+            return await self._exchange(method, path, data, params, headers,
+                                        info)
+
+    # pylint: disable=too-many-arguments
+    async def _exchange(self, method, path, data, params, headers,
+                        info=None):
+        '''Sends a request and decodes the response body'''
+        res = await self._request(method, path, data, params, headers, info)
+        try:
+            if res.status == 304:
+                return res.status, res.headers, None
+            if info is None:
+                # Get a proper return object
+                return res.status, res.headers, \
+                    self.decoder(await res.read())
+            start = monotonic()
+            body = await res.read()
+            info.add('transfer', monotonic() - start)
+            info.bytes = len(body)
+            start = monotonic()
+            obj = self.decoder(body)
+            info.add('decode', monotonic() - start)
+            return res.status, res.headers, obj
+        finally:
+            res.release()
+
+    # pylint: disable=too-many-arguments
+    async def _stream(self, method, path, data, params, info=None):
+        '''Sends a request, yields resources as they are decoded
+
+        The request counts against the concurrency limit (and holds its
+        connection) until the generator is exhausted or closed.
+        '''
+        semaphore = self.semaphore
+        if semaphore is None:
+            async for resource in self._stream_response(
+                    method, path, data, params, info):
+                yield resource
+            return
+        async with semaphore:
+            async for resource in self._stream_response(
+                    method, path, data, params, info):
+                yield resource
+
+    # pylint: disable=too-many-arguments
+    async def _stream_response(self, method, path, data, params, info):
+        '''Streams a response body through a ResourceScanner'''
+        if info is None:
+            res = await self._request(method, path, data, params)
+        else:
+            # Report once the response headers are in (as the threaded
+            # client does), the body is read at the consumer's pace
+            start = monotonic()
+            try:
+                res = await self._request(method, path, data, params,
+                                          info=info)
+            except Exception as err:
+                info.error = err.__class__.__name__
+                raise
+            finally:
+                info.timings['total'] = monotonic() - start
+                self._report(info)
+        try:
+            scanner = ResourceScanner()
+            async for chunk in res.content.iter_chunked(STREAM_CHUNK_SIZE):
+                for resource in scanner.feed(chunk):
+                    yield resource
+            scanner.close()
+        finally:
+            res.release()
+
+    # pylint: disable=too-many-arguments
+    async def _request(self, method, path, data, params, headers=None,
+                       info=None):
+        '''Sends a request (retrying it if need be) and checks the
+        response status (see :meth:`Cloudforms.utils.CloudformsBase._request`)
+
+        :returns: The response, its body unread (release it when done)
+        '''
+        # Log our API call
+        if self.log:
+            log_payload(self.log, 'API Call', method,
+                        '%s%s' % (self.base_url, path), data)
+        attempt = self.retry.attempt(method) if self.retry else None
+        while True:
+            try:
+                res = await self._send(method, path, data, params, headers,
+                                       info)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                delay = attempt.delay() if attempt else None
+                if delay is None:
+                    raise
+            else:
+                delay = attempt.delay(res.headers.get('Retry-After')) \
+                    if attempt and res.status in self.retry.statuses \
+                    else None
+                if delay is None:
+                    break
+                res.release()
+            if self.log:
+                self.log.info('API Retry: [%s] %s%s in %.2fs', method,
+                              self.base_url, path, delay)
+            if info:
+                info.add('retry_wait', delay)
+            await asyncio.sleep(delay)
+        if info:
+            info.status = res.status
+            info.retries = attempt.retries if attempt else 0
+        # If the call was rejected, raise an error
+        if res.status not in [200, 201] and \
+           not (headers and res.status == 304):
+            res.release()
+            raise CloudformsHTTPError(res.status, res.reason)
+        return res
+
+    # pylint: disable=too-many-arguments
+    async def _send(self, method, path, data, params, headers, info=None):
+        '''Sends a request once (if the circuit breaker allows it), as
+        soon as the rate limiter allows it'''
+        if self.breaker is not None:
+            self.breaker.before()
+        if self.limiter is not None:
+            waited = await acquire_limiter(self.limiter)
+            if info:
+                info.add('queue', waited)
+        try:
+            res = await self.session.request(
+                method,
+                '%s%s' % (self.base_url, path),
+                json=data,
+                params=to_query(params),
+                headers=headers,
+                trace_request_ctx=info)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if self.breaker is not None:
+                self.breaker.failure()
+            raise
+        finally:
+            if self.limiter is not None:
+                release_limiter(self.limiter)
+        if self.breaker is not None:
+            self.breaker.record(res.status)
+        return res
+
+    # pylint: disable=too-many-arguments
+    def _result(self, method, path, obj, raw, headers=None):
+        '''Reduces a decoded response to what the consumer cares about'''
+        if raw:
+            return obj
+        ret = normalize_result(method, obj)
+        # Log our API result
+        if self.log:
+            log_payload(self.log, 'API Result', method,
+                        '%s%s' % (self.base_url, path), ret,
+                        int((headers or dict()).get('Content-Length', 0)))
+        return ret
@@ -0,0 +1,121 @@
+'''
+    Cloudforms.batcher
+    ~~~~~~~~~~~~~~~~~~
+    Micro-batching of single resource lookups into collection queries
+
+    :license: MIT, see LICENSE for more details.
+'''
+import threading
+import time
+from concurrent.futures import Future
+from Cloudforms.utils import DEFAULT_BATCH_SIZE
+
+
+class Batcher(object):
+    '''Collects the lookups made by concurrent callers for a short window
+    and fetches them all at once
+
+    The first lookup of a batch waits for window seconds (or until
+    max_batch IDs are pending) then fetches every pending ID with a
+    single call to fetch; each caller gets its own resource back (None
+    if it was not found). Lookups of an ID already pending share its
+    result. Errors of a batch are raised to each of its callers.
+
+    Managers provide ready to use batchers (see, for instance,
+    :meth:`Cloudforms.managers.vs.VSManager.batcher`).
+
+    :param fetch: function taking a list of IDs and returning the list
+                  of their resources, in the same order
+    :param float window: seconds to wait for other lookups
+    :param integer max_batch: max IDs fetched at once
+
+    Example::
+
+        vms = vs_mgr.batcher(fields='identity')
+        # Called from many threads: ~1 request per window
+        vm = vms.get('1000000000042')
+        print(vms.stats)
+    '''
+    def __init__(self, fetch, window=0.005, max_batch=DEFAULT_BATCH_SIZE):
+        self.fetch = fetch
+        self.window = window
+        self.max_batch = max_batch
+        self.lookups = 0
+        self.batches = 0
+        self._pending = dict()
+        self._leader = False
+        self._lock = threading.Lock()
+
+    def get(self, _id):
+        '''Returns a resource, fetched along with the other lookups made
+        within the window
+
+        :param string _id: ID of the resource
+        :returns: The resource, or None if it was not found
+        '''
+        return self.get_many([_id])[0]
+
+    def get_many(self, ids):
+        '''Returns resources, fetched along with the other lookups made
+        within the window (see get)
+
+        :param list ids: IDs of the resources
+        :returns: List of resources (None for IDs not found)
+        '''
+        futures = list()
+        batches = list()
+        with self._lock:
+            for _id in ids:
+                _id = str(_id)
+                self.lookups += 1
+                future = self._pending.get(_id)
+                if future is None:
+                    future = self._pending[_id] = Future()
+                    if len(self._pending) >= self.max_batch:
+                        batches.append(self._take())
+                futures.append(future)
+            # The first caller of a batch fetches it after the window
+            leader = bool(self._pending) and not self._leader
+            self._leader = self._leader or leader
+        for batch in batches:
+            self._run(batch)
+        if leader:
+            time.sleep(self.window)
+            with self._lock:
+                batch = self._take()
+            self._run(batch)
+        return [future.result() for future in futures]
+
+    def _take(self):
+        '''Returns the pending lookups (the next lookup starts a new
+        batch); must be called with the lock held'''
+        batch, self._pending = self._pending, dict()
+        self._leader = False
+        return batch
+
+    def _run(self, batch):
+        '''Fetches a batch of lookups and hands out the results'''
+        if not batch:
+            return
+        ids = list(batch)
+        with self._lock:
+            self.batches += 1
+        try:
+            resources = self.fetch(ids)
+        except Exception as err:  # pylint: disable=broad-except
+            for future in batch.values():
+                future.set_exception(err)
+            return
+        resources = list(resources or list())
+        for idx, _id in enumerate(ids):
+            batch[_id].set_result(
+                resources[idx] if idx < len(resources) else None)
+
+    @property
+    def stats(self):
+        '''Returns counters for monitoring (lookups, batches fetched)'''
+        return {
+            'lookups': self.lookups,
+            'batches': self.batches,
+            'pending': len(self._pending)
+        }
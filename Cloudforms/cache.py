@@ -0,0 +1,272 @@
+'''
+    Cloudforms.cache
+    ~~~~~~~~~~~~~~~~
+    Opt-in TTL + LRU cache for read-only API calls, and coalescing of
+    concurrent identical reads
+
+    :license: MIT, see LICENSE for more details.
+'''
+import threading
+from collections import OrderedDict, namedtuple
+from weakref import WeakKeyDictionary
+from Cloudforms.utils import monotonic
+
+CacheEntry = namedtuple(
+    'CacheEntry',
+    ['expires', 'value', 'etag', 'last_modified'])
+
+
+def cache_key(method, path, params=None, raw=False):
+    '''Returns a hashable key for a call (params order does not matter)'''
+    return (method.lower(), path, raw, tuple(sorted(
+        (key, tuple(value) if isinstance(value, (list, tuple)) else value)
+        for key, value in (params or dict()).items())))
+
+
+def collection_of(path):
+    '''Returns the top-level collection a path belongs to (/vms/1 -> /vms)'''
+    return '/%s' % path.strip('/').split('/')[0]
+
+
+class ResponseCache(object):
+    '''Caches GET results in memory for a limited time
+
+    Any non-GET call made through the same client drops every cached
+    entry of the collection it touched (ex. POST /vms/1 drops /vms/*).
+    Cached objects are shared between callers, treat them as read-only.
+    Calls made with cache=False (as the managers' wait methods and the
+    pollers do) skip the cache altogether.
+
+    If revalidate is set, entries whose response carried an ETag or
+    Last-Modified header are kept after they expire, and the next read
+    is sent as a conditional GET (If-None-Match / If-Modified-Since).
+    A 304 (Not Modified) reply then serves the stored copy without
+    transferring or decoding the body again. With ttl=0 every read is
+    revalidated this way.
+
+    :param integer maxsize: max number of entries (least recently used
+                            entries are evicted first)
+    :param float ttl: default entry lifetime (in seconds)
+    :param dict ttls: per-path lifetimes keyed by path prefix, the longest
+                      matching prefix wins (ex. {'/tags': 3600, '/tasks': 0})
+    :param bool revalidate: use conditional GETs for expired entries
+
+    Example::
+
+        cache = ResponseCache(maxsize=10000, ttl=30, ttls={'/tags': 3600})
+        client = Cloudforms.Client(cache=cache)
+        ...
+        print(cache.hits, cache.misses)
+    '''
+    def __init__(self, maxsize=1024, ttl=60, ttls=None, revalidate=True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.revalidate = revalidate
+        self.ttls = sorted((ttls or dict()).items(),
+                           key=lambda x: len(x[0]), reverse=True)
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(method, path, params=None, raw=False):
+        '''Returns the cache key for a call (see cache_key)'''
+        return cache_key(method, path, params, raw)
+
+    def ttl_for(self, path):
+        '''Returns the entry lifetime for a path'''
+        for prefix, ttl in self.ttls:
+            if path.startswith(prefix):
+                return ttl
+        return self.ttl
+
+    def get(self, key):
+        '''Returns a cached value, or None if missing or expired'''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires < monotonic():
+                # Drop expired entries unless they can be revalidated
+                if entry is not None and \
+                   not (entry.etag or entry.last_modified):
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Mark as most recently used
+            self._entries.pop(key)
+            self._entries[key] = entry
+            return entry.value
+
+    def validators(self, key):
+        '''Returns conditional request headers for a stale entry'''
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        headers = dict()
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers or None
+
+    def revalidated(self, key):
+        '''Renews a stale entry (after a 304) and returns its value
+
+        :returns: The cached value, or None if the entry was dropped
+                  (invalidated) while it was being revalidated
+        '''
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._entries[key] = entry._replace(
+                expires=monotonic() + self.ttl_for(key[1]))
+            self.revalidations += 1
+            return entry.value
+
+    def set(self, key, value, headers=None):
+        '''Caches a value along with the response's validators
+
+        :param tuple key: the call's cache key
+        :param value: the call's result
+        :param dict headers: the response headers (ETag, Last-Modified)
+        '''
+        headers = headers if self.revalidate and headers else dict()
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        ttl = self.ttl_for(key[1])
+        if value is None or not (ttl or etag or last_modified):
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = CacheEntry(
+                monotonic() + ttl, value, etag, last_modified)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path=None):
+        '''Drops every entry of path's collection (or everything)'''
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            root = collection_of(path)
+            for key in [key for key in self._entries
+                        if collection_of(key[1]) == root]:
+                del self._entries[key]
+
+    @property
+    def stats(self):
+        '''Returns counters for monitoring'''
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+            'size': len(self._entries),
+            'maxsize': self.maxsize
+        }
+
+
+class Flight(object):
+    '''A call in progress, and its outcome once done'''
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    '''Shares one in-flight call between concurrent identical reads
+
+    While a call is in progress, identical calls (same method, path,
+    params and raw flag) made by other threads wait for it and get its
+    decoded result (or its error) instead of reaching the appliance
+    again. Nothing is kept once the call completes (see ResponseCache
+    for that). Shared objects are handed to every waiting caller, treat
+    them as read-only.
+
+    Use one per client (keys do not include the appliance). The
+    asynchronous client coalesces calls made within each event loop.
+
+    :param tuple methods: methods whose calls are coalesced (only
+                          idempotent ones make sense)
+
+    Example::
+
+        flights = SingleFlight()
+        client = Cloudforms.Client(coalesce=flights)
+        ...
+        print(flights.stats)
+    '''
+    def __init__(self, methods=('get',)):
+        self.methods = methods
+        self.calls = 0
+        self.hits = 0
+        self._flights = dict()
+        self._lock = threading.Lock()
+        # Per event loop futures (see Cloudforms.aio.utils)
+        self.async_flights = WeakKeyDictionary()
+
+    @staticmethod
+    def key(method, path, params=None, raw=False):
+        '''Returns the key identical calls share (see cache_key)'''
+        return cache_key(method, path, params, raw)
+
+    def count(self, shared):
+        '''Records a call made (or, if shared, one that was spared)'''
+        with self._lock:
+            if shared:
+                self.hits += 1
+            else:
+                self.calls += 1
+
+    def do(self, key, func):
+        '''Calls func, unless an identical call is in progress
+
+        :param tuple key: the call's key
+        :param func: function making the call
+        :returns: Tuple of (result, shared), shared is True if the
+                  result came from another caller's call
+        '''
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+                self.calls += 1
+            else:
+                self.hits += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = func()
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    @property
+    def stats(self):
+        '''Returns counters for monitoring (calls made, calls spared)'''
+        return {
+            'calls': self.calls,
+            'hits': self.hits,
+            'in_flight': len(self._flights) + sum(
+                len(flights) for flights in
+                list(self.async_flights.values()))
+        }
@@ -0,0 +1,183 @@
+'''
+    Cloudforms.decoders
+    ~~~~~~~~~~~~~~~~~~~
+    Pluggable (and streaming) JSON decoding of API responses
+
+    :license: MIT, see LICENSE for more details.
+'''
+import json
+import re
+from codecs import getincrementaldecoder
+from importlib import import_module
+from Cloudforms.exceptions import CloudformsError, CloudformsBadResult
+
+#: Known decoders, fastest first (the first one installed is the default)
+DECODERS = ('orjson', 'ujson', 'json')
+
+# Characters that matter when scanning outside / inside of strings
+_STRUCTURE = re.compile(r'[][{}",]')
+_STRING = re.compile(r'["\\]')
+_WHITESPACE = re.compile(r'\s*')
+
+
+def get_decoder(decoder=None):
+    '''Returns a function decoding a JSON document (bytes) to objects
+
+    :param decoder: a decoder name (one of DECODERS), a callable or
+                    None for the fastest decoder installed
+    '''
+    if callable(decoder):
+        return decoder
+    if decoder is not None:
+        if decoder not in DECODERS:
+            raise CloudformsError('Unknown JSON decoder "%s"' % decoder)
+        try:
+            return import_module(decoder).loads
+        except ImportError:
+            raise CloudformsError('JSON decoder "%s" is not installed'
+                                  % decoder)
+    for name in DECODERS:
+        try:
+            return import_module(name).loads
+        except ImportError:
+            continue
+
+
+class ResourceScanner(object):
+    '''Incrementally splits a collection response into resources
+
+    Chunks of a response body are fed in as they arrive. Every time an
+    element of the (top-level) "resources" array is complete it is
+    decoded on its own and returned, so the body is never buffered (or
+    decoded) as a whole. Anything outside of that array is skipped.
+
+    Resources are decoded with the standard library's (C) scanner since
+    it can tell where a document ends, which is what makes resource by
+    resource decoding affordable.
+
+    :param string key: name of the array to extract
+    :param string encoding: character encoding of the body
+    '''
+    def __init__(self, key='resources', encoding='utf-8'):
+        self.key = '"%s"' % key
+        self.text = getincrementaldecoder(encoding)()
+        self.raw_decode = json.JSONDecoder().raw_decode
+        self.buf = u''
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.string_start = None
+        self.key_seen = False
+        self.in_array = False
+
+    def feed(self, chunk):
+        '''Scans the next chunk of the body
+
+        :returns: List of the resources completed by this chunk
+        '''
+        self.buf += self.text.decode(chunk)
+        resources = list()
+        while True:
+            if self.in_array:
+                if not self._scan_array(resources):
+                    break
+            elif self.in_string:
+                match = _STRING.search(self.buf, self.pos)
+                if match is None:
+                    break
+                self.pos = match.end()
+                if match.group() == '\\':
+                    # Skip the escaped character (may be in the next chunk)
+                    self.pos += 1
+                    continue
+                self.in_string = False
+                if self.depth == 1:
+                    self.key_seen = self.buf[
+                        self.string_start:self.pos] == self.key
+            else:
+                match = _STRUCTURE.search(self.buf, self.pos)
+                if match is None:
+                    break
+                char, self.pos = match.group(), match.end()
+                if char == '"':
+                    self.in_string = True
+                    self.string_start = match.start()
+                elif char in '[{':
+                    self.depth += 1
+                    self.in_array = char == '[' and self.depth == 2 and \
+                        self.key_seen
+                elif char in ']}':
+                    self.depth -= 1
+        self._compact()
+        return resources
+
+    def _scan_array(self, resources):
+        '''Decodes the complete resources at the head of the buffer
+
+        :returns: False if more of the body is needed to go on
+        '''
+        self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+        if self.pos == len(self.buf):
+            return False
+        char = self.buf[self.pos]
+        if char == ',':
+            self.pos += 1
+        elif char == ']':
+            self.pos += 1
+            self.depth -= 1
+            self.in_array = self.key_seen = False
+        else:
+            try:
+                resource, end = self.raw_decode(self.buf, self.pos)
+            except ValueError:
+                # Incomplete (or broken, which surfaces at the end)
+                return False
+            if char not in '{["':
+                # A number (or literal) may continue in the next chunk
+                # (ex. 12. or 1e), it is complete once followed by , or ]
+                end = _WHITESPACE.match(self.buf, end).end()
+                if end == len(self.buf) or self.buf[end] not in ',]':
+                    return False
+            resources.append(resource)
+            self.pos = end
+        return True
+
+    def close(self):
+        '''Checks that the body did not end inside the resources array'''
+        if self.in_array:
+            raise CloudformsBadResult(self.buf[:100], 'Truncated or '
+                                      'malformed resources array')
+
+    def _compact(self):
+        '''Drops the part of the buffer that is no longer needed'''
+        keep = self.pos
+        if self.in_string and self.depth == 1:
+            keep = min(keep, self.string_start)
+        keep = min(keep, len(self.buf))
+        if keep:
+            self.buf = self.buf[keep:]
+            self.pos -= keep
+            if self.string_start is not None:
+                self.string_start -= keep
+
+
+def iter_resources(chunks, key='resources', encoding='utf-8'):
+    '''Lazily decodes the resources of a collection response
+
+    :param chunks: iterable of body chunks (bytes), ex.
+                   response.iter_content(65536)
+    :param string key: name of the array to extract
+    :param string encoding: character encoding of the body
+    :returns: Generator yielding one resource at a time
+
+    Example::
+
+        with open('vms.json', 'rb') as body:
+            for vm in iter_resources(iter(lambda: body.read(65536), b'')):
+                print(vm['name'])
+    '''
+    scanner = ResourceScanner(key, encoding)
+    for chunk in chunks:
+        for resource in scanner.feed(chunk):
+            yield resource
+    scanner.close()
@@ -51,3 +51,58 @@ class CloudformsAPIError(CloudformsError):
 
 class CloudformsBadResult(CloudformsAPIError):
     '''Cloudforms - API results error (malformed / unexcepted data)'''
+
+
+class CloudformsCircuitOpenError(CloudformsError):
+    '''Cloudforms - Circuit breaker open (the request was not sent)
+
+    Provides host and retry_after (seconds until a trial request is
+    let through) properties.
+    '''
+    def __init__(self, host, retry_after, *args):
+        CloudformsError.__init__(
+            self, 'Circuit open for %s, retry in %.1fs' % (host, retry_after),
+            *args)
+        self.host = host
+        self.retry_after = retry_after
+
+    def __repr__(self):
+        return '<%s(%s): %.1fs>' % (self.__class__.__name__,
+                                    self.host,
+                                    self.retry_after)
+
+
+class CloudformsRegionError(CloudformsError):
+    '''Cloudforms - A region of a MultiClient failed (or timed out)
+
+    Provides region and error (the underlying exception, None on a
+    timeout) properties.
+    '''
+    def __init__(self, region, error, *args):
+        CloudformsError.__init__(
+            self, 'Region %s %s' % (
+                region, 'failed: %s' % error if error is not None
+                else 'timed out'), *args)
+        self.region = region
+        self.error = error
+
+    def __repr__(self):
+        return '<%s(%s): %r>' % (self.__class__.__name__,
+                                 self.region,
+                                 self.error)
+
+
+class CloudformsTransportError(CloudformsError):
+    '''Cloudforms - A request could not be sent, or its response read
+    (connection failure, protocol error, timeout)
+
+    Provides an error property (the underlying exception).
+    '''
+    def __init__(self, error, *args):
+        CloudformsError.__init__(
+            self, 'Transport error: %s' % (
+                str(error) or error.__class__.__name__), *args)
+        self.error = error
+
+    def __repr__(self):
+        return '<%s: %r>' % (self.__class__.__name__, self.error)
@@ -0,0 +1,161 @@
+'''
+    Cloudforms.export
+    ~~~~~~~~~~~~~~~~~
+    Columnar export of collections (for analytics)
+
+    :license: MIT, see LICENSE for more details.
+'''
+from array import array
+try:
+    import numpy
+except ImportError:  # pragma: no cover (numpy is optional)
+    numpy = None
+
+NAN = float('nan')
+
+
+def as_float(value):
+    '''Returns a value as a float (NaN if it is missing or not a number)'''
+    try:
+        return float(value) if value is not None else NAN
+    except (TypeError, ValueError):
+        return NAN
+
+
+class DictionaryColumn(object):
+    '''Dictionary-encoded string column
+
+    Every distinct value is stored once in categories, rows only hold
+    its (integer) position. Missing values are encoded as -1. This is
+    the same layout as an Arrow dictionary array, ex.
+    pyarrow.DictionaryArray.from_arrays(column.codes, column.categories).
+
+    :param string name: column (attribute) name
+    '''
+    __slots__ = ('name', 'codes', 'categories', '_index')
+
+    def __init__(self, name):
+        self.name = name
+        self.codes = array('i')
+        self.categories = list()
+        self._index = dict()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def append(self, value):
+        '''Encodes and appends a value'''
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def code(self, value):
+        '''Returns the code of a value (-1 if it never occurs)'''
+        return self._index.get(value, -1)
+
+    def value(self, row):
+        '''Returns the (decoded) value of a row'''
+        code = self.codes[row]
+        return self.categories[code] if code >= 0 else None
+
+    def counts(self):
+        '''Returns a dictionary of value -> number of rows'''
+        if numpy is not None and not isinstance(self.codes, array):
+            tally = numpy.bincount(self.codes[self.codes >= 0],
+                                   minlength=len(self.categories))
+        else:
+            tally = [0] * len(self.categories)
+            for code in self.codes:
+                if code >= 0:
+                    tally[code] += 1
+        return dict(zip(self.categories, (int(x) for x in tally)))
+
+
+class Columns(object):
+    '''Column store filled one resource at a time
+
+    Numeric columns are packed float64 buffers (array.array, or numpy
+    arrays sharing the same memory once finished if numpy is installed).
+    Missing or non-numeric values are stored as NaN. String columns are
+    DictionaryColumn objects.
+
+    :param list numeric: names of the numeric attributes
+    :param list strings: names of the string attributes
+    '''
+    def __init__(self, numeric=None, strings=None):
+        self.numeric = dict((name, array('d')) for name in numeric or [])
+        self.strings = dict((name, DictionaryColumn(name))
+                            for name in strings or [])
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        if name in self.numeric:
+            return self.numeric[name]
+        return self.strings[name]
+
+    def __contains__(self, name):
+        return name in self.numeric or name in self.strings
+
+    def append(self, resource):
+        '''Appends one resource (dictionary or record)'''
+        for name, column in self.numeric.items():
+            column.append(as_float(resource.get(name)))
+        for name, column in self.strings.items():
+            column.append(resource.get(name))
+        self.size += 1
+
+    def extend(self, resources):
+        '''Appends every resource of an iterable (consumed lazily)'''
+        for resource in resources:
+            self.append(resource)
+        return self
+
+    def finish(self):
+        '''Turns the buffers into numpy arrays (without copying them)
+
+        Does nothing if numpy is not installed. No resources can be
+        appended afterwards.
+        '''
+        if numpy is None:
+            return self
+        for name, column in self.numeric.items():
+            if isinstance(column, array):
+                self.numeric[name] = numpy.frombuffer(
+                    column, dtype=numpy.float64)
+        for column in self.strings.values():
+            if isinstance(column.codes, array):
+                column.codes = numpy.frombuffer(
+                    column.codes, dtype=numpy.intc)
+        return self
+
+
+def export_columns(resources, numeric=None, strings=None):
+    '''Streams resources into a Columns store
+
+    Resources are consumed one at a time, so with a paging generator
+    (ex. manager.list(page_size=1000)) only a single page of decoded
+    resources is held in memory at once.
+
+    :param resources: iterable of resources (dictionaries or records)
+    :param list numeric: names of the numeric attributes
+    :param list strings: names of the string attributes
+    :returns: Finished Columns store
+
+    Example::
+
+        cols = export_columns(vs_mgr.list(page_size=1000),
+                              numeric=['ram_size'],
+                              strings=['power_state'])
+        powered_on = cols['power_state'].codes == \\
+            cols['power_state'].code('on')
+        print(cols['ram_size'][powered_on].sum())
+    '''
+    return Columns(numeric, strings).extend(resources).finish()
@@ -0,0 +1,205 @@
+'''
+    Cloudforms.inventory
+    ~~~~~~~~~~~~~~~~~~~~
+    Persistent (SQLite) inventory snapshot with incremental refresh
+
+    :license: MIT, see LICENSE for more details.
+'''
+import json
+import sqlite3
+from Cloudforms.utils import chunked, collection_total
+from Cloudforms.managers.provider import ProviderManager
+from Cloudforms.managers.tag import TagManager
+from Cloudforms.managers.task import TaskManager
+from Cloudforms.managers.vs import VSManager
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS resources (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    updated_on TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+);
+CREATE TABLE IF NOT EXISTS syncs (
+    collection TEXT PRIMARY KEY,
+    synced_to TEXT
+);
+'''
+
+
+class InventoryStore(object):
+    '''Keeps a local copy of the inventory on disk
+
+    The first refresh of a collection loads it in full (paged). Later
+    refreshes only fetch records whose updated_on is at or after the
+    newest updated_on already stored, merge them in, then drop records
+    that disappeared (found with a cheap attributes=id sweep).
+    Collections without an updated_on column (tags) are always reloaded
+    in full.
+
+    :param Cloudforms.API.Client client: an API client instance
+    :param string path: SQLite database file (":memory:" for testing)
+    :param list collections: collections to manage (default: all of
+                             vms, providers, tags, tasks)
+    :param integer page_size: number of resources fetched per request
+
+    Example::
+
+        store = InventoryStore(client, '/var/cache/cloudforms.db')
+        store.refresh()
+        for vm in store.list('vms'):
+            print(vm['name'])
+    '''
+    #: collection -> (manager class, column used for delta refreshes)
+    COLLECTIONS = {
+        'vms': (VSManager, 'updated_on'),
+        'providers': (ProviderManager, 'updated_on'),
+        'tasks': (TaskManager, 'updated_on'),
+        'tags': (TagManager, None)
+    }
+
+    def __init__(self, client, path, collections=None, page_size=1000):
+        self.client = client
+        self.page_size = page_size
+        self.collections = collections or sorted(self.COLLECTIONS)
+        self.managers = dict(
+            (name, self.COLLECTIONS[name][0](client))
+            for name in self.collections)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        '''Closes the database'''
+        self.db.close()
+
+    def synced_to(self, collection):
+        '''Returns the newest updated_on seen for a collection (or None)'''
+        row = self.db.execute(
+            'SELECT synced_to FROM syncs WHERE collection = ?',
+            (collection,)).fetchone()
+        return row[0] if row else None
+
+    def refresh(self, collections=None, full=False):
+        '''Brings the local copy up to date
+
+        :param list collections: collections to refresh (default: all)
+        :param bool full: reload from scratch instead of fetching deltas
+        :returns: Dictionary of collection -> number of records fetched
+        '''
+        stats = dict()
+        for collection in collections or self.collections:
+            field = self.COLLECTIONS[collection][1]
+            since = self.synced_to(collection)
+            with self.db:
+                if full or not field or since is None:
+                    stats[collection] = self._load(collection, field)
+                else:
+                    stats[collection] = self._merge(collection, field, since)
+        return stats
+
+    def _store(self, collection, field, resources):
+        '''Upserts resources, returns (count, newest field value)'''
+        count, newest = 0, None
+        for chunk in chunked(resources, 500):
+            self.db.executemany(
+                'INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?)',
+                [(collection, str(res.get('id')),
+                  res.get(field) if field else None,
+                  json.dumps(res)) for res in chunk])
+            count += len(chunk)
+            for res in chunk:
+                value = res.get(field) if field else None
+                if value and (newest is None or value > newest):
+                    newest = value
+        return count, newest
+
+    def _mark(self, collection, newest):
+        '''Records how far a collection has been synced'''
+        if newest is not None:
+            self.db.execute('INSERT OR REPLACE INTO syncs VALUES (?, ?)',
+                            (collection, newest))
+
+    def _load(self, collection, field):
+        '''Replaces a collection with a full copy'''
+        self.db.execute('DELETE FROM resources WHERE collection = ?',
+                        (collection,))
+        self.db.execute('DELETE FROM syncs WHERE collection = ?',
+                        (collection,))
+        count, newest = self._store(
+            collection, field,
+            self.managers[collection].list(page_size=self.page_size))
+        self._mark(collection, newest)
+        return count
+
+    def _merge(self, collection, field, since):
+        '''Merges in changed records and drops removed ones'''
+        mgr = self.managers[collection]
+        # ">=" since records updated in the same second as the last
+        # sync may not have been seen yet (re-storing is harmless)
+        count, newest = self._store(collection, field, mgr.list(
+            {'filter[]': ['%s>=%s' % (field, since)]},
+            page_size=self.page_size))
+        self._mark(collection, newest)
+        live = self._live_ids(collection)
+        gone = [(collection, _id) for (_id,) in self.db.execute(
+            'SELECT id FROM resources WHERE collection = ?', (collection,))
+                if _id not in live]
+        self.db.executemany(
+            'DELETE FROM resources WHERE collection = ? AND id = ?', gone)
+        return count
+
+    def _live_ids(self, collection):
+        '''Returns the IDs of every resource of a collection
+
+        Pages are keyed by ID (sorted by ID, then past the last ID seen)
+        rather than by offset: resources removed during the sweep would
+        otherwise shift the later pages, and live records skipped that
+        way would be dropped. Pages may come back shorter than asked
+        for (the appliance caps limit), only the total left (or an
+        empty page) ends the sweep.
+        '''
+        live = set()
+        last = None
+        while True:
+            params = {
+                'expand': 'resources',
+                'attributes': 'id',
+                'sort_by': 'id',
+                'sort_order': 'asc',
+                'limit': self.page_size
+            }
+            if last is not None:
+                params['filter[]'] = ['id>%s' % last]
+            page = self.client.call('get', '/%s' % collection,
+                                    params=params, raw=True, cache=False)
+            ids = [int(res['id']) for res in page.get('resources') or list()
+                   if res.get('id')]
+            if not ids:
+                return live
+            live.update(str(_id) for _id in ids)
+            # The total of the page's query is what was left to sweep
+            left = collection_total(page)
+            if left is not None and len(ids) >= left:
+                return live
+            last = max(ids)
+
+    def get(self, collection, _id):
+        '''Returns a stored record (or None)'''
+        row = self.db.execute(
+            'SELECT data FROM resources WHERE collection = ? AND id = ?',
+            (collection, str(_id))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self, collection):
+        '''Returns a generator over the stored records of a collection'''
+        for (data,) in self.db.execute(
+                'SELECT data FROM resources WHERE collection = ?',
+                (collection,)):
+            yield json.loads(data)
+
+    def count(self, collection):
+        '''Returns the number of stored records of a collection'''
+        return self.db.execute(
+            'SELECT COUNT(*) FROM resources WHERE collection = ?',
+            (collection,)).fetchone()[0]
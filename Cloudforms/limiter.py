@@ -0,0 +1,149 @@
+'''
+    Cloudforms.limiter
+    ~~~~~~~~~~~~~~~~~~
+    Client-side rate limiting and concurrency capping per appliance
+
+    :license: MIT, see LICENSE for more details.
+'''
+import threading
+import time
+from weakref import WeakKeyDictionary
+from Cloudforms.utils import monotonic
+
+
+class RateLimiter(object):
+    '''Token bucket rate limiter with a cap on requests in flight
+
+    Each request takes a token; tokens are refilled at rate per second
+    and up to burst of them can be saved up. Requests beyond that wait
+    their turn (in order) instead of being sent in bursts. Independently,
+    at most max_in_flight requests are sent at the same time, a slot is
+    held until the response (headers) came back.
+
+    Share one limiter between every client (and thread) talking to the
+    same appliance. The asynchronous client can share it too: tokens
+    are common to all users, the in-flight cap applies to threads and to
+    each event loop separately.
+
+    How long requests waited for a token and a slot is recorded (see
+    stats) to tell whether the limits are holding work back.
+
+    :param float rate: requests per second (None for no rate limit)
+    :param integer burst: requests that can be sent at once after an
+                          idle period (defaults to one second's worth)
+    :param integer max_in_flight: max concurrent requests (None for no
+                                  limit)
+
+    Example::
+
+        limiter = RateLimiter(rate=20, max_in_flight=8)
+        clients = [Cloudforms.Client(limiter=limiter) for _ in range(4)]
+        ...
+        print(limiter.stats)
+    '''
+    def __init__(self, rate=None, burst=None, max_in_flight=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self.max_in_flight = max_in_flight
+        self.semaphore = threading.Semaphore(max_in_flight) \
+            if max_in_flight else None
+        self.in_flight = 0
+        self.queued = 0
+        self.acquired = 0
+        self.waited = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._tokens = float(self.burst)
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+        # Per event loop asyncio semaphores (see Cloudforms.aio.utils)
+        self.async_semaphores = WeakKeyDictionary()
+
+    def reserve(self):
+        '''Takes a token, returns how long to wait before using it
+
+        Tokens may be taken ahead of time (the balance goes negative),
+        which queues callers in the order they asked.
+        '''
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(
+                self.burst,
+                self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def queue(self, count=1):
+        '''Records requests starting (or, if negative, giving up) waiting'''
+        with self._lock:
+            self.queued += count
+
+    def started(self, waited):
+        '''Records a request let through after waiting for waited seconds
+        (0 if it did not have to wait)'''
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+            self.acquired += 1
+            if waited:
+                self.waited += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def finished(self):
+        '''Records a request done with its slot'''
+        with self._lock:
+            self.in_flight -= 1
+
+    def acquire(self):
+        '''Waits for a token and a slot (blocking the calling thread)
+
+        :returns: Time spent waiting (in seconds)
+        '''
+        start = monotonic()
+        self.queue()
+        try:
+            delay = self.reserve()
+            if delay:
+                time.sleep(delay)
+            blocked = bool(delay)
+            if self.semaphore is not None and \
+               not self.semaphore.acquire(False):
+                blocked = True
+                self.semaphore.acquire()
+        except BaseException:
+            self.queue(-1)
+            raise
+        waited = monotonic() - start if blocked else 0.0
+        self.started(waited)
+        return waited
+
+    def release(self):
+        '''Gives back the slot taken by acquire'''
+        self.finished()
+        if self.semaphore is not None:
+            self.semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    @property
+    def stats(self):
+        '''Returns counters for monitoring (wait times in seconds)'''
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'acquired': self.acquired,
+            'waited': self.waited,
+            'wait_total': self.wait_total,
+            'wait_mean': (self.wait_total / self.acquired
+                          if self.acquired else 0.0),
+            'wait_max': self.wait_max
+        }
@@ -0,0 +1,164 @@
+'''
+    Cloudforms.logs
+    ~~~~~~~~~~~~~~~
+    Cheap, size-bounded and redacted logging of API payloads
+
+    Payloads are handed to loggers as Payload objects, which are only
+    formatted when a handler actually emits the record. At INFO level a
+    payload is summarized (ex. "1,234 resources, 3.2MB"); its content is
+    only logged when the logger is set to DEBUG, truncated to
+    DEBUG_LENGTH characters.
+    Values of credential-like keys (see REDACTED_KEYS) are never logged.
+
+    :license: MIT, see LICENSE for more details.
+'''
+import json
+import logging
+
+#: Key (sub)strings whose values are replaced by REDACTED
+REDACTED_KEYS = ('password', 'secret', 'token', 'auth_key', 'private_key')
+REDACTED = '[redacted]'
+#: Max length of payloads logged in full at INFO level
+SUMMARY_LENGTH = 200
+#: Max length of payloads logged at DEBUG level (None for no limit)
+DEBUG_LENGTH = 4096
+
+_ELLIPSIS = '...'
+
+
+def redacted(key):
+    '''Returns True if the value of key must not be logged'''
+    try:
+        key = key.lower()
+    except AttributeError:
+        return False
+    return any(word in key for word in REDACTED_KEYS)
+
+
+def format_size(size):
+    '''Returns a byte count in a human readable form (ex. 3.2MB)'''
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return ('%d%s' if unit == 'B' else '%.1f%s') % (size, unit)
+        size /= 1024.0
+    return '%.1fGB' % size
+
+
+def _tokens(obj):
+    '''Yields the JSON-like text of obj piece by piece (redacted)'''
+    if isinstance(obj, dict):
+        yield '{'
+        for idx, (key, value) in enumerate(obj.items()):
+            yield '%s%s: ' % (', ' if idx else '', json.dumps(key))
+            if redacted(key):
+                yield json.dumps(REDACTED)
+            else:
+                for token in _tokens(value):
+                    yield token
+        yield '}'
+    elif isinstance(obj, (list, tuple)):
+        yield '['
+        for idx, value in enumerate(obj):
+            if idx:
+                yield ', '
+            for token in _tokens(value):
+                yield token
+        yield ']'
+    else:
+        try:
+            yield json.dumps(obj)
+        except (TypeError, ValueError):
+            yield repr(obj)
+
+
+def truncate(obj, length=None):
+    '''Formats obj (redacted), stopping after length characters
+
+    Formatting stops as soon as the limit is reached, so the cost is
+    bounded by length rather than by the size of obj.
+    '''
+    if obj is None:
+        return ''
+    parts = list()
+    total = 0
+    for token in _tokens(obj):
+        parts.append(token)
+        total += len(token)
+        if length is not None and total > length:
+            return ''.join(parts)[:max(0, length - len(_ELLIPSIS))] + \
+                _ELLIPSIS
+    return ''.join(parts)
+
+
+def summarize(obj, size=None):
+    '''Describes a payload in a few words (ex. "1,234 resources, 3.2MB")
+
+    Collections are described by their item count; anything else is
+    formatted in full if short enough, truncated otherwise.
+
+    :param obj: decoded payload
+    :param integer size: payload size in bytes (if known)
+    '''
+    action = None
+    if isinstance(obj, dict) and isinstance(obj.get('resources'), list):
+        action = obj.get('action')
+        obj = obj['resources']
+    if isinstance(obj, list):
+        text = '%s resource%s' % ('{:,}'.format(len(obj)),
+                                  '' if len(obj) == 1 else 's')
+        if action:
+            text = '%s, %s' % (action, text)
+    else:
+        text = truncate(obj, SUMMARY_LENGTH)
+    if size:
+        text = '%s, %s' % (text, format_size(size)) if text \
+            else format_size(size)
+    return text
+
+
+def debug_enabled(logger):
+    '''Returns True if logger would emit DEBUG records'''
+    is_enabled_for = getattr(logger, 'isEnabledFor', None)
+    return bool(is_enabled_for and is_enabled_for(logging.DEBUG))
+
+
+class Payload(object):
+    '''Lazily formatted payload, for use as a logging argument
+
+    :param obj: decoded payload
+    :param integer size: payload size in bytes (if known)
+    :param bool verbose: format the (truncated) content rather than a
+                         summary
+
+    Example::
+
+        log.info('API Result: %s', Payload(ret, len(res.content)))
+    '''
+    __slots__ = ('obj', 'size', 'verbose')
+
+    def __init__(self, obj, size=None, verbose=False):
+        self.obj = obj
+        self.size = size
+        self.verbose = verbose
+
+    def __str__(self):
+        if self.verbose:
+            return truncate(self.obj, DEBUG_LENGTH)
+        return summarize(self.obj, self.size)
+
+    __repr__ = __str__
+
+
+def log_payload(logger, message, method, url, obj, size=None):
+    '''Logs an API call or result at INFO level: summarized, or with its
+    (truncated) content when the logger is set to DEBUG
+
+    :param logger: a logging.Logger (or compatible object)
+    :param string message: what is logged (ex. "API Call")
+    :param string method: HTTP method
+    :param string url: full URL called
+    :param obj: payload sent or received
+    :param integer size: payload size in bytes (if known)
+    '''
+    logger.info('%s: [%s] %s [%s]', message, method, url,
+                Payload(obj, size, debug_enabled(logger)))
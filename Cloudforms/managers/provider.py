@@ -5,10 +5,17 @@
 
     :license: MIT, see LICENSE for more details.
 '''
+from Cloudforms.records import Provider, as_records
+from Cloudforms.batcher import Batcher
 from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    update_fields,
     update_params,
     normalize_object,
-    normalize_collection
+    normalize_collection,
+    iter_collection,
+    perform_action_many,
+    get_many
 )
 from Cloudforms.managers.tag import ServiceTagManager
 
@@ -17,6 +24,8 @@ class ProviderManager(object):
     '''Manages Providers.
 
     :param Cloudforms.API.Client client: an API client instance
+    :param bool records: return Provider records (see Cloudforms.records)
+                         instead of dictionaries
 
     Example::
 
@@ -24,15 +33,24 @@ class ProviderManager(object):
         client = Cloudforms.Client()
         provider_mgr = Cloudforms.ProviderManager(client)
     '''
-    def __init__(self, client):
+    #: Named field presets (see the fields argument of get and list)
+    FIELDS = {
+        'identity': ['id', 'name'],
+        'type': ['id', 'name', 'type', 'hostname']
+    }
+
+    def __init__(self, client, records=False):
         self.client = client
+        self.record_class = Provider if records else None
         self.tags = ServiceTagManager(client, 'providers')
 
-    def get(self, _id, params=None):
+    def get(self, _id, params=None, fields=None):
         '''Retrieve details about a provider on the account
 
         :param string _id: Specifies which provider the request is for
         :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
         :returns: Dictionary representing the matching provider
 
         Example::
@@ -42,24 +60,96 @@ class ProviderManager(object):
             for provider in providers:
                 provider_details = provider_mgr.get(provider['id'])
         '''
-        params = update_params(params, {'expand': 'resources'})
-        return normalize_object(
-            self.client.call('get', '/providers/%s' % _id, params=params))
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        return as_records(self.record_class, normalize_object(
+            self.client.call('get', '/providers/%s' % _id, params=params)))
+
+    # pylint: disable=too-many-arguments
+    def get_many(self, ids, params=None, fields=None, batch_size=None,
+                 query=False):
+        '''Retrieve details about many providers, batch_size per request
+        (see :func:`Cloudforms.utils.get_many`)
+
+        :param list ids: Specifies which providers the request is for
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer batch_size: number of providers per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: List of dictionaries representing the matching
+                  providers, in the same order as ids (None for IDs not
+                  found)
+
+        Example::
+
+            providers = provider_mgr.get_many(['1', '2', '3'],
+                                              fields='identity')
+        '''
+        return as_records(self.record_class, get_many(
+            self.client, 'providers', ids,
+            update_fields(params, fields, self.FIELDS), batch_size, query))
 
-    def list(self, params=None):
+    # pylint: disable=too-many-arguments
+    def batcher(self, params=None, fields=None, window=0.005,
+                batch_size=None, query=False):
+        '''Returns a batcher turning concurrent lookups of single
+        providers into batched get_many calls (see
+        :class:`Cloudforms.batcher.Batcher`)
+
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param float window: seconds a lookup waits for others
+        :param integer batch_size: max providers per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: Cloudforms.batcher.Batcher
+
+        Example::
+
+            providers = provider_mgr.batcher(fields='identity')
+            # Called from many threads, a request per window or so
+            provider = providers.get('1')
+        '''
+        return Batcher(
+            lambda ids: self.get_many(ids, params, fields, batch_size,
+                                      query),
+            window, batch_size or DEFAULT_BATCH_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def list(self, params=None, page_size=None, workers=None,
+             fields=None, stream=False):
         '''Retrieve a list of all providers on the account
 
         :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer page_size: if set, lazily page through the
+                                  collection this many resources at a time
+        :param integer workers: if set, read the total from the first page
+                                and fetch the rest this many pages at a
+                                time (implies paging)
+        :param bool stream: decode resources as the response downloads
+                            (in a single request unless page_size is set)
         :returns: List of dictionaries representing the matching providers
 
         Example::
 
             # Gets a list of all providers (returns IDs only)
             providers = provider_mgr.list({'attributes': 'id'})
+
+            # Walks all providers, 500 per request, without
+            # holding the whole collection in memory
+            for provider in provider_mgr.list(page_size=500):
+                print(provider['id'])
         '''
-        params = update_params(params, {'expand': 'resources'})
-        return normalize_collection(
-            self.client.call('get', '/providers', params=params))
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        if page_size or workers or stream:
+            return as_records(self.record_class, iter_collection(
+                self.client, '/providers', params, page_size, workers, stream))
+        return as_records(self.record_class, normalize_collection(
+            self.client.call('get', '/providers', params=params)))
 
     def perform_action(self, _id, action, params=None):
         '''Sends a request to perform an action on a provider
@@ -80,6 +170,29 @@ class ProviderManager(object):
         return normalize_object(
             self.client.call('post', '/providers/%s' % _id, data=params))
 
+    def perform_action_many(self, ids, action, params=None,
+                            batch_size=None):
+        '''Sends requests to perform an action on many providers
+
+        Resources are sent in batches using collection-level POSTs
+        instead of one request per provider.
+
+        :param list ids: Specifies which providers the request is for
+        :param string action: The action to request (delete, refresh, etc.)
+        :param dict params: Additional per-resource POST request data
+        :param integer batch_size: number of providers per request
+        :returns: List of result dictionaries, in the same order as ids
+                  (failed items have a false 'success' key)
+
+        Example::
+
+            # Refresh every provider on the account
+            ids = [p['id'] for p in provider_mgr.list({'attributes': 'id'})]
+            provider_mgr.perform_action_many(ids, 'refresh')
+        '''
+        return perform_action_many(self.client, 'providers', ids, action,
+                                   params, batch_size)
+
     def create(self, params=None):
         '''Creates a new provider on the account (pass-through params)
 
@@ -176,6 +289,26 @@ class ProviderManager(object):
         '''
         return self.perform_action(_id, 'refresh', params)
 
+    def delete_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to delete many providers
+
+        :param list ids: Specifies which providers the request is for
+        :param dict params: Additional per-resource POST request data
+        :param integer batch_size: number of providers per request
+        :returns: List of result dictionaries (see perform_action_many)
+        '''
+        return self.perform_action_many(ids, 'delete', params, batch_size)
+
+    def refresh_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to refresh many providers
+
+        :param list ids: Specifies which providers the request is for
+        :param dict params: Additional per-resource POST request data
+        :param integer batch_size: number of providers per request
+        :returns: List of result dictionaries (see perform_action_many)
+        '''
+        return self.perform_action_many(ids, 'refresh', params, batch_size)
+
     def update(self, _id, params=None):
         '''Sends a request to update a provider
 
@@ -5,19 +5,81 @@
 
     :license: MIT, see LICENSE for more details.
 '''
+from itertools import islice
 from time import sleep
-from datetime import datetime, timedelta
+from Cloudforms.records import ProvisionRequest, as_records
+from Cloudforms.batcher import Batcher
 from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    update_fields,
+    monotonic,
     update_params,
     normalize_object,
-    normalize_collection
+    normalize_collection,
+    iter_collection,
+    post_resources,
+    get_many
 )
+from Cloudforms.poller import Backoff, CollectionPoller
+
+
+def next_batch(specs, room, batch_size):
+    '''Returns the next (at most batch_size) specs to submit when room
+    more provision requests can be outstanding'''
+    return list(islice(specs, min(room, batch_size))) if room > 0 \
+        else list()
+
+
+def track_submitted(poller, specs, results):
+    '''Starts polling the provision requests created by a batch
+
+    :returns: List of failed submissions (result dictionaries, with the
+              spec that failed)
+    '''
+    failed = list()
+    for spec, result in zip(specs, results):
+        if result.get('success', True) and result.get('id') is not None:
+            poller.add([result['id']])
+        else:
+            failed.append(update_params(result, {'spec': spec}))
+    return failed
+
+
+def track_missing(poller, seen):
+    '''Returns failed results for the provision requests that vanished
+    since the last call (seen is the set of those already reported)'''
+    missing = poller.missing - seen
+    seen.update(missing)
+    return [{
+        'success': False,
+        'id': _id,
+        'message': 'Provision request no longer exists'
+    } for _id in sorted(missing)]
+
+
+def track_timeout(poller, specs):
+    '''Returns failed results for what a timed out run leaves behind:
+    the provision requests still outstanding, then every spec that was
+    not submitted (specs is read to the end)'''
+    failed = [{
+        'success': False,
+        'id': _id,
+        'message': 'Timed out waiting for the provision request'
+    } for _id in sorted(poller.pending)]
+    failed.extend({
+        'success': False,
+        'spec': spec,
+        'message': 'Not submitted (timed out)'
+    } for spec in specs)
+    return failed
 
 
 class ProvisionRequestManager(object):
     '''Manages Provision Requests.
 
     :param Cloudforms.API.Client client: an API client instance
+    :param bool records: return ProvisionRequest records (see
+                         Cloudforms.records) instead of dictionaries
 
     Example::
 
@@ -25,14 +87,23 @@ class ProvisionRequestManager(object):
         client = Cloudforms.Client()
         preq_mgr = Cloudforms.ProvisionRequestManager(client)
     '''
-    def __init__(self, client):
+    #: Named field presets (see the fields argument of get and list)
+    FIELDS = {
+        'identity': ['id', 'description'],
+        'state': ['id', 'request_state', 'status', 'message']
+    }
+
+    def __init__(self, client, records=False):
         self.client = client
+        self.record_class = ProvisionRequest if records else None
 
-    def get(self, _id, params=None):
+    def get(self, _id, params=None, fields=None):
         '''Retrieve details about a provision request on the account
 
         :param string _id: Specifies which provision request the request is for
         :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
         :returns: Dictionary representing the matching provision request
 
         Example::
@@ -42,15 +113,79 @@ class ProvisionRequestManager(object):
             for preq in preqs:
                 preq_details = preq_mgr.get(preq['id'])
         '''
-        params = update_params(params, {'expand': 'resources'})
-        return normalize_object(
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        return as_records(self.record_class, normalize_object(
             self.client.call('get', '/provision_requests/%s' %
-                             _id, params=params))
+                             _id, params=params)))
+
+    # pylint: disable=too-many-arguments
+    def get_many(self, ids, params=None, fields=None, batch_size=None,
+                 query=False):
+        '''Retrieve details about many provision requests, batch_size per
+        request (see :func:`Cloudforms.utils.get_many`)
+
+        :param list ids: Specifies which provision requests the request is
+                         for
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer batch_size: number of provision requests per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: List of dictionaries representing the matching
+                  provision requests, in the same order as ids (None for
+                  IDs not found)
+
+        Example::
+
+            requests = preq_mgr.get_many(['1', '2', '3'],
+                                         fields=['id', 'request_state'])
+        '''
+        return as_records(self.record_class, get_many(
+            self.client, 'provision_requests', ids,
+            update_fields(params, fields, self.FIELDS), batch_size, query))
+
+    # pylint: disable=too-many-arguments
+    def batcher(self, params=None, fields=None, window=0.005,
+                batch_size=None, query=False):
+        '''Returns a batcher turning concurrent lookups of single
+        provision requests into batched get_many calls (see
+        :class:`Cloudforms.batcher.Batcher`)
+
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param float window: seconds a lookup waits for others
+        :param integer batch_size: max provision requests per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: Cloudforms.batcher.Batcher
+
+        Example::
 
-    def list(self, params=None):
+            requests = preq_mgr.batcher(fields=['id', 'request_state'])
+            # Called from many threads, a request per window or so
+            request = requests.get('1')
+        '''
+        return Batcher(
+            lambda ids: self.get_many(ids, params, fields, batch_size,
+                                      query),
+            window, batch_size or DEFAULT_BATCH_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def list(self, params=None, page_size=None, workers=None,
+             fields=None, stream=False):
         '''Retrieve a list of all provision requests on the account
 
         :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer page_size: if set, lazily page through the
+                                  collection this many resources at a time
+        :param integer workers: if set, read the total from the first page
+                                and fetch the rest this many pages at a
+                                time (implies paging)
+        :param bool stream: decode resources as the response downloads
+                            (in a single request unless page_size is set)
         :returns: List of dictionaries representing the
                   matching provision requests
 
@@ -58,10 +193,20 @@ class ProvisionRequestManager(object):
 
             # Gets a list of all provision requests (returns IDs only)
             preqs = preq_mgr.list({'attributes': 'id'})
+
+            # Walks all provision requests, 500 per request, without
+            # holding the whole collection in memory
+            for preq in preq_mgr.list(page_size=500):
+                print(preq['id'])
         '''
-        params = update_params(params, {'expand': 'resources'})
-        return normalize_collection(
-            self.client.call('get', '/provision_requests', params=params))
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        if page_size or workers or stream:
+            return as_records(self.record_class, iter_collection(
+                self.client, '/provision_requests', params,
+                page_size, workers, stream))
+        return as_records(self.record_class, normalize_collection(
+            self.client.call('get', '/provision_requests', params=params)))
 
     def perform_action(self, _id, action, params=None):
         '''Sends a request to perform an action on a provision request
@@ -95,12 +240,143 @@ class ProvisionRequestManager(object):
         :param dict params: response-level options (attributes, limit, etc.)
         :returns bool: **True** on success, **False** on error or timeout
         '''
-        deadline = datetime.now() + timedelta(seconds=timeout)
-        while datetime.now() <= deadline:
-            preq = self.get(_id, params=params)
+        params = update_params(params, {'expand': 'resources'})
+        deadline = monotonic() + timeout
+        while monotonic() <= deadline:
+            # Bypasses the client's cache, polls need the current state
+            preq = normalize_object(self.client.call(
+                'get', '/provision_requests/%s' % _id, params=params,
+                cache=False))
             if not preq or not preq.get('request_state'):
                 return False
             elif preq.get('request_state').lower() == request_state.lower():
                 return True
             sleep(1)
         return False
+
+    # pylint: disable=too-many-arguments
+    def wait_many(self, ids, timeout=30, request_state='finished',
+                  params=None, batch_size=None, backoff=None):
+        '''Waits for many provision requests to reach a certain request_state
+
+        All outstanding provision requests are polled together using one
+        collection query (per batch_size provision requests) per tick,
+        backing off exponentially (with jitter) while nothing completes.
+
+        :param list ids: Specifies which provision requests the request is
+                         for
+        :param integer timeout: operation timeout (in seconds)
+        :param string request_state: wait until each provision request reaches
+                                     this request_state (case insensitive)
+        :param dict params: response-level options (attributes, etc.)
+        :param integer batch_size: number of provision requests per query
+        :param Cloudforms.poller.Backoff backoff: polling delay policy
+        :returns: Generator yielding each provision request (dictionary)
+                  as it reaches the requested request_state
+
+        Example::
+
+            # Wait for a batch of provision requests
+            for preq in preq_mgr.wait_many(ids, timeout=600):
+                print(preq['id'], 'done')
+        '''
+        poller = CollectionPoller(self.client, '/provision_requests',
+                                  'request_state', request_state,
+                                  params=params, batch_size=batch_size)
+        poller.add(ids)
+        return poller.wait(timeout=timeout, backoff=backoff)
+
+    # pylint: disable=too-many-arguments,too-many-locals
+    def create_many(self, specs, max_outstanding=50, batch_size=None,
+                    timeout=None, request_state='finished', params=None,
+                    backoff=None):
+        '''Provisions in bulk: submits provision requests in batches and
+        yields each one as it completes
+
+        Specs are read (lazily) from specs and submitted using
+        collection-level create POSTs, so that at most max_outstanding
+        provision requests are waiting at any time. All outstanding
+        provision requests are tracked by one CollectionPoller, and
+        more are submitted as they complete.
+
+        Submissions the appliance refused, and provision requests that
+        vanished before completing, are yielded as failed results
+        (success is False; refused ones carry their spec). So is
+        everything left when timeout expires: the provision requests
+        still outstanding and the specs not submitted yet (specs is
+        then read to the end, it must not be endless).
+
+        :param specs: iterable of provision request specs (the POST
+                      request data of create)
+        :param integer max_outstanding: max provision requests waiting
+                                        at once (at least 1)
+        :param integer batch_size: max specs per create request (and
+                                   provision requests per query)
+        :param integer timeout: give up after this many seconds (None
+                                to wait for everything)
+        :param string request_state: yield provision requests once they
+                                     reach this request_state
+        :param dict params: response-level options used when polling
+        :param Cloudforms.poller.Backoff backoff: polling delay policy
+        :returns: Generator yielding each provision request (dictionary)
+                  as it completes
+
+        Example::
+
+            specs = ({
+                'template_fields': {'guid': template_guid},
+                'vm_fields': {'vm_name': 'web-%03d' % idx}
+            } for idx in range(500))
+            for preq in preq_mgr.create_many(specs, max_outstanding=40):
+                print(preq.get('id'), preq.get('status'))
+        '''
+        if max_outstanding < 1:
+            raise ValueError('max_outstanding must be at least 1')
+        return self._create_many(specs, max_outstanding, batch_size,
+                                 timeout, request_state, params, backoff)
+
+    # pylint: disable=too-many-arguments,too-many-locals
+    def _create_many(self, specs, max_outstanding, batch_size, timeout,
+                     request_state, params, backoff):
+        '''Submits and tracks provision requests (see create_many)'''
+        poller = CollectionPoller(self.client, '/provision_requests',
+                                  'request_state', request_state,
+                                  params=params, batch_size=batch_size)
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        backoff = backoff or Backoff()
+        deadline = None if timeout is None else monotonic() + timeout
+        specs = iter(specs)
+        seen = set()
+        exhausted = False
+        while True:
+            # Top up the outstanding provision requests
+            while not exhausted:
+                room = max_outstanding - len(poller.pending)
+                batch = next_batch(specs, room, batch_size)
+                if not batch:
+                    exhausted = room > 0
+                    break
+                for failure in track_submitted(
+                        poller, batch, post_resources(
+                            self.client, 'provision_requests', 'create',
+                            batch)):
+                    yield failure
+            if not poller.pending:
+                if exhausted:
+                    return
+                continue
+            remaining = None if deadline is None else deadline - monotonic()
+            if remaining is not None and remaining <= 0:
+                for failure in track_timeout(poller, specs):
+                    yield failure
+                return
+            sleep(backoff.next() if remaining is None
+                  else min(backoff.next(), remaining))
+            done = poller.poll()
+            for preq in done:
+                yield preq
+            for failure in track_missing(poller, seen):
+                yield failure
+            # Poll eagerly again while things are progressing
+            if done:
+                backoff.reset()
@@ -5,13 +5,38 @@
 
     :license: MIT, see LICENSE for more details.
 '''
+from time import sleep
+from Cloudforms.poller import Backoff
+from Cloudforms.records import Tag, as_records
+from Cloudforms.batcher import Batcher
 from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    chunked,
+    update_fields,
     update_params,
     normalize_object,
-    normalize_collection
+    normalize_collection,
+    iter_collection,
+    post_resources,
+    permanent_failure,
+    get_many
 )
 
 
+def tag_resources(client, svc, tags):
+    '''Returns (ID, POST request data) pairs for a collection-level
+    assign_tags / unassign_tags action
+
+    :param Cloudforms.API.Client client: an API client instance
+    :param string svc: collection name (ex. vms)
+    :param dict tags: resource ID -> list of tag names
+    '''
+    return [(_id, {
+        'href': '%s/%s/%s' % (client.base_url, svc, _id),
+        'tags': [{'name': name} for name in names]
+    }) for _id, names in tags.items()]
+
+
 class ServiceTagManager(object):
     '''Manages Tags for Services.
 
@@ -60,11 +85,76 @@ class ServiceTagManager(object):
             'resources': [{'name': name} for name in names]
         })
 
+    def assign_many(self, tags, batch_size=None, retries=2, backoff=None):
+        '''Assigns tags to many services using collection-level POSTs
+
+        Resources are sent batch_size at a time (assign_tags action).
+        Resources whose assignment failed (the request failed, or the
+        appliance reported a failure) are sent again, up to retries
+        times, after a backoff delay. Failures sending again cannot fix
+        (the resource was not found, the request was rejected, see
+        :func:`Cloudforms.utils.permanent_failure`) are final.
+
+        :param dict tags: service item ID -> names of tags to assign
+        :param integer batch_size: number of resources per request
+        :param integer retries: max retries of failed resources
+        :param Cloudforms.poller.Backoff backoff: delay between retries
+        :returns: Dictionary of service item ID -> result dictionary
+
+        Example::
+
+            # Tag a whole environment, then report what failed
+            results = vs_mgr.tags.assign_many(
+                dict((vm['id'], ['/environment/prod']) for vm in vms))
+            failed = [_id for _id, res in results.items()
+                      if not res.get('success')]
+        '''
+        return self._tag_many('assign_tags', tags, batch_size, retries,
+                              backoff)
+
+    def unassign_many(self, tags, batch_size=None, retries=2, backoff=None):
+        '''Un-assigns tags from many services using collection-level POSTs
+        (see assign_many)
+
+        :param dict tags: service item ID -> names of tags to un-assign
+        :param integer batch_size: number of resources per request
+        :param integer retries: max retries of failed resources
+        :param Cloudforms.poller.Backoff backoff: delay between retries
+        :returns: Dictionary of service item ID -> result dictionary
+        '''
+        return self._tag_many('unassign_tags', tags, batch_size, retries,
+                              backoff)
+
+    # pylint: disable=too-many-arguments
+    def _tag_many(self, action, tags, batch_size, retries, backoff):
+        '''Sends a tag action in batches, retrying failed resources'''
+        backoff = backoff or Backoff()
+        pending = tag_resources(self.client, self.svc, tags)
+        results = dict()
+        for attempt in range(retries + 1):
+            if attempt:
+                sleep(backoff.next())
+            failed = list()
+            for chunk in chunked(pending, batch_size or DEFAULT_BATCH_SIZE):
+                ret = post_resources(self.client, self.svc, action,
+                                     [data for _, data in chunk])
+                for (_id, data), result in zip(chunk, ret):
+                    results[_id] = result
+                    if not result.get('success') and \
+                       not permanent_failure(result):
+                        failed.append((_id, data))
+            if not failed:
+                break
+            pending = failed
+        return results
+
 
 class TagManager(object):
     '''Manages Tags.
 
     :param Cloudforms.API.Client client: an API client instance
+    :param bool records: return Tag records (see Cloudforms.records)
+                         instead of dictionaries
 
     Example::
 
@@ -72,14 +162,22 @@ class TagManager(object):
         client = Cloudforms.Client()
         tag_mgr = Cloudforms.TagManager(client)
     '''
-    def __init__(self, client):
+    #: Named field presets (see the fields argument of get and list)
+    FIELDS = {
+        'identity': ['id', 'name']
+    }
+
+    def __init__(self, client, records=False):
         self.client = client
+        self.record_class = Tag if records else None
 
-    def get(self, _id, params=None):
+    def get(self, _id, params=None, fields=None):
         '''Retrieve details about a tag on the account
 
         :param string _id: Specifies which tag the request is for
         :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
         :returns: Dictionary representing the matching tag
 
         Example::
@@ -89,21 +187,92 @@ class TagManager(object):
             for tag in tags:
                 tag_details = tag_mgr.get(tag['id'])
         '''
-        params = update_params(params, {'expand': 'resources'})
-        return normalize_object(
-            self.client.call('get', '/tags/%s' % _id, params=params))
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        return as_records(self.record_class, normalize_object(
+            self.client.call('get', '/tags/%s' % _id, params=params)))
+
+    # pylint: disable=too-many-arguments
+    def get_many(self, ids, params=None, fields=None, batch_size=None,
+                 query=False):
+        '''Retrieve details about many tags, batch_size per request
+        (see :func:`Cloudforms.utils.get_many`)
+
+        :param list ids: Specifies which tags the request is for
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer batch_size: number of tags per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: List of dictionaries representing the matching
+                  tags, in the same order as ids (None for IDs not
+                  found)
+
+        Example::
+
+            tags = tag_mgr.get_many(['1', '2', '3'], fields='identity')
+        '''
+        return as_records(self.record_class, get_many(
+            self.client, 'tags', ids,
+            update_fields(params, fields, self.FIELDS), batch_size, query))
 
-    def list(self, params=None):
+    # pylint: disable=too-many-arguments
+    def batcher(self, params=None, fields=None, window=0.005,
+                batch_size=None, query=False):
+        '''Returns a batcher turning concurrent lookups of single
+        tags into batched get_many calls (see
+        :class:`Cloudforms.batcher.Batcher`)
+
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param float window: seconds a lookup waits for others
+        :param integer batch_size: max tags per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: Cloudforms.batcher.Batcher
+
+        Example::
+
+            tags = tag_mgr.batcher(fields='identity')
+            # Called from many threads, a request per window or so
+            tag = tags.get('1')
+        '''
+        return Batcher(
+            lambda ids: self.get_many(ids, params, fields, batch_size,
+                                      query),
+            window, batch_size or DEFAULT_BATCH_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def list(self, params=None, page_size=None, workers=None,
+             fields=None, stream=False):
         '''Retrieve a list of all tags on the account
 
         :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer page_size: if set, lazily page through the
+                                  collection this many resources at a time
+        :param integer workers: if set, read the total from the first page
+                                and fetch the rest this many pages at a
+                                time (implies paging)
+        :param bool stream: decode resources as the response downloads
+                            (in a single request unless page_size is set)
         :returns: List of dictionaries representing the matching tags
 
         Example::
 
             # Gets a list of all tags (returns IDs only)
             tags = tag_mgr.list({'attributes': 'id'})
+
+            # Walks all tags, 500 per request, without
+            # holding the whole collection in memory
+            for tag in tag_mgr.list(page_size=500):
+                print(tag['id'])
         '''
-        params = update_params(params, {'expand': 'resources'})
-        return normalize_collection(
-            self.client.call('get', '/tags', params=params))
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        if page_size or workers or stream:
+            return as_records(self.record_class, iter_collection(
+                self.client, '/tags', params, page_size, workers, stream))
+        return as_records(self.record_class, normalize_collection(
+            self.client.call('get', '/tags', params=params)))
@@ -6,18 +6,27 @@
     :license: MIT, see LICENSE for more details.
 '''
 from time import sleep
-from datetime import datetime, timedelta
+from Cloudforms.records import Task, as_records
+from Cloudforms.batcher import Batcher
 from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    update_fields,
+    monotonic,
     update_params,
     normalize_object,
-    normalize_collection
+    normalize_collection,
+    iter_collection,
+    get_many
 )
+from Cloudforms.poller import CollectionPoller
 
 
 class TaskManager(object):
     '''Manages Tasks.
 
     :param Cloudforms.API.Client client: an API client instance
+    :param bool records: return Task records (see Cloudforms.records)
+                         instead of dictionaries
 
     Example::
 
@@ -25,14 +34,23 @@ class TaskManager(object):
         client = Cloudforms.Client()
         task_mgr = Cloudforms.TaskManager(client)
     '''
-    def __init__(self, client):
+    #: Named field presets (see the fields argument of get and list)
+    FIELDS = {
+        'identity': ['id', 'name'],
+        'state': ['id', 'state', 'status', 'message']
+    }
+
+    def __init__(self, client, records=False):
         self.client = client
+        self.record_class = Task if records else None
 
-    def get(self, _id, params=None):
+    def get(self, _id, params=None, fields=None):
         '''Retrieve details about a task on the account
 
         :param string _id: Specifies which task the request is for
         :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
         :returns: Dictionary representing the matching task
 
         Example::
@@ -42,24 +60,96 @@ class TaskManager(object):
             for task in tasks:
                 task_details = task_mgr.get(task['id'])
         '''
-        params = update_params(params, {'expand': 'resources'})
-        return normalize_object(
-            self.client.call('get', '/tasks/%s' % _id, params=params))
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        return as_records(self.record_class, normalize_object(
+            self.client.call('get', '/tasks/%s' % _id, params=params)))
+
+    # pylint: disable=too-many-arguments
+    def get_many(self, ids, params=None, fields=None, batch_size=None,
+                 query=False):
+        '''Retrieve details about many tasks, batch_size per request
+        (see :func:`Cloudforms.utils.get_many`)
+
+        :param list ids: Specifies which tasks the request is for
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer batch_size: number of tasks per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: List of dictionaries representing the matching
+                  tasks, in the same order as ids (None for IDs not
+                  found)
+
+        Example::
+
+            tasks = task_mgr.get_many(['1', '2', '3'],
+                                      fields=['id', 'state', 'status'])
+        '''
+        return as_records(self.record_class, get_many(
+            self.client, 'tasks', ids,
+            update_fields(params, fields, self.FIELDS), batch_size, query))
+
+    # pylint: disable=too-many-arguments
+    def batcher(self, params=None, fields=None, window=0.005,
+                batch_size=None, query=False):
+        '''Returns a batcher turning concurrent lookups of single
+        tasks into batched get_many calls (see
+        :class:`Cloudforms.batcher.Batcher`)
+
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param float window: seconds a lookup waits for others
+        :param integer batch_size: max tasks per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: Cloudforms.batcher.Batcher
+
+        Example::
 
-    def list(self, params=None):
+            tasks = task_mgr.batcher(fields=['id', 'state', 'status'])
+            # Called from many threads, a request per window or so
+            task = tasks.get('1')
+        '''
+        return Batcher(
+            lambda ids: self.get_many(ids, params, fields, batch_size,
+                                      query),
+            window, batch_size or DEFAULT_BATCH_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def list(self, params=None, page_size=None, workers=None,
+             fields=None, stream=False):
         '''Retrieve a list of all tasks on the account
 
         :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer page_size: if set, lazily page through the
+                                  collection this many resources at a time
+        :param integer workers: if set, read the total from the first page
+                                and fetch the rest this many pages at a
+                                time (implies paging)
+        :param bool stream: decode resources as the response downloads
+                            (in a single request unless page_size is set)
         :returns: List of dictionaries representing the matching tasks
 
         Example::
 
             # Gets a list of all tasks (returns IDs only)
             tasks = task_mgr.list({'attributes': 'id'})
+
+            # Walks all tasks, 500 per request, without
+            # holding the whole collection in memory
+            for task in task_mgr.list(page_size=500):
+                print(task['id'])
         '''
-        params = update_params(params, {'expand': 'resources'})
-        return normalize_collection(
-            self.client.call('get', '/tasks', params=params))
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        if page_size or workers or stream:
+            return as_records(self.record_class, iter_collection(
+                self.client, '/tasks', params, page_size, workers, stream))
+        return as_records(self.record_class, normalize_collection(
+            self.client.call('get', '/tasks', params=params)))
 
     def wait(self, _id, timeout=30, state='finished', params=None):
         '''Waits for a task to reach a certain state
@@ -80,12 +170,45 @@ class TaskManager(object):
                 # Wait for the task to finish and collect the result
                 task_succeeded = task_mgr.wait(task.get('task_id'))
         '''
-        deadline = datetime.now() + timedelta(seconds=timeout)
-        while datetime.now() <= deadline:
-            task = self.get(_id, params=params)
+        params = update_params(params, {'expand': 'resources'})
+        deadline = monotonic() + timeout
+        while monotonic() <= deadline:
+            # Bypasses the client's cache, polls need the current state
+            task = normalize_object(self.client.call(
+                'get', '/tasks/%s' % _id, params=params, cache=False))
             if not task or not task.get('state'):
                 return False
             elif task.get('state').lower() == state.lower():
                 return True
             sleep(1)
         return False
+
+    # pylint: disable=too-many-arguments
+    def wait_many(self, ids, timeout=30, state='finished', params=None,
+                  batch_size=None, backoff=None):
+        '''Waits for many tasks to reach a certain state
+
+        All outstanding tasks are polled together using one collection
+        query (per batch_size tasks) per tick, backing off exponentially
+        (with jitter) while nothing completes.
+
+        :param list ids: Specifies which tasks the request is for
+        :param integer timeout: operation timeout (in seconds)
+        :param string state: wait until each task reaches
+                             this state (case insensitive)
+        :param dict params: response-level options (attributes, etc.)
+        :param integer batch_size: number of tasks per query
+        :param Cloudforms.poller.Backoff backoff: polling delay policy
+        :returns: Generator yielding each task (dictionary) as it
+                  reaches the requested state
+
+        Example::
+
+            # Wait for a batch of tasks, handling each as it completes
+            for task in task_mgr.wait_many(ids, timeout=600):
+                print(task['id'], 'done')
+        '''
+        poller = CollectionPoller(self.client, '/tasks', 'state', state,
+                                  params=params, batch_size=batch_size)
+        poller.add(ids)
+        return poller.wait(timeout=timeout, backoff=backoff)
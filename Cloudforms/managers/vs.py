@@ -5,10 +5,19 @@
 
     :license: MIT, see LICENSE for more details.
 '''
+from Cloudforms.export import export_columns
+from Cloudforms.managers.tag import ServiceTagManager
+from Cloudforms.records import VirtualServer, as_records
+from Cloudforms.batcher import Batcher
 from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    update_fields,
     update_params,
     normalize_object,
-    normalize_collection
+    normalize_collection,
+    iter_collection,
+    perform_action_many,
+    get_many
 )
 
 
@@ -16,6 +25,8 @@ class VSManager(object):
     '''Manages Virtual Servers.
 
     :param Cloudforms.API.Client client: an API client instance
+    :param bool records: return VirtualServer records (see Cloudforms.records)
+                         instead of dictionaries
 
     Example::
 
@@ -23,14 +34,29 @@ class VSManager(object):
         client = Cloudforms.Client()
         vs_mgr = Cloudforms.VSManager(client)
     '''
-    def __init__(self, client):
+    #: Named field presets (see the fields argument of get and list)
+    FIELDS = {
+        'identity': ['id', 'name'],
+        'power_state': ['id', 'name', 'power_state', 'raw_power_state'],
+        'capacity': ['id', 'name', 'cpu_total_cores', 'ram_size',
+                     'used_disk_storage']
+    }
+    #: Columns exported by default (see export)
+    EXPORT_NUMERIC = ['cpu_total_cores', 'ram_size', 'used_disk_storage']
+    EXPORT_STRINGS = ['vendor', 'type', 'power_state']
+
+    def __init__(self, client, records=False):
         self.client = client
+        self.record_class = VirtualServer if records else None
+        self.tags = ServiceTagManager(client, 'vms')
 
-    def get(self, _id, params=None):
+    def get(self, _id, params=None, fields=None):
         '''Retrieve details about a virtual server on the account
 
         :param string _id: Specifies which virtual server the request is for
         :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
         :returns: Dictionary representing the matching virtual server
 
         Example::
@@ -40,14 +66,76 @@ class VSManager(object):
             for instance in instances:
                 vs_details = vs_mgr.get(instance['id'])
         '''
-        params = update_params(params, {'expand': 'resources'})
-        return normalize_object(
-            self.client.call('get', '/vms/%s' % _id, params=params))
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        return as_records(self.record_class, normalize_object(
+            self.client.call('get', '/vms/%s' % _id, params=params)))
+
+    # pylint: disable=too-many-arguments
+    def get_many(self, ids, params=None, fields=None, batch_size=None,
+                 query=False):
+        '''Retrieve details about many virtual servers, batch_size per request
+        (see :func:`Cloudforms.utils.get_many`)
+
+        :param list ids: Specifies which virtual servers the request is for
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer batch_size: number of virtual servers per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: List of dictionaries representing the matching
+                  virtual servers, in the same order as ids (None for IDs not
+                  found)
 
-    def list(self, params=None):
+        Example::
+
+            vms = vs_mgr.get_many(['1', '2', '3'], fields='power_state')
+        '''
+        return as_records(self.record_class, get_many(
+            self.client, 'vms', ids,
+            update_fields(params, fields, self.FIELDS), batch_size, query))
+
+    # pylint: disable=too-many-arguments
+    def batcher(self, params=None, fields=None, window=0.005,
+                batch_size=None, query=False):
+        '''Returns a batcher turning concurrent lookups of single
+        virtual servers into batched get_many calls (see
+        :class:`Cloudforms.batcher.Batcher`)
+
+        :param dict params: response-level options (attributes, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param float window: seconds a lookup waits for others
+        :param integer batch_size: max virtual servers per request
+        :param bool query: use query action POSTs instead of filtered GETs
+        :returns: Cloudforms.batcher.Batcher
+
+        Example::
+
+            vms = vs_mgr.batcher(fields='power_state')
+            # Called from many threads, a request per window or so
+            vm = vms.get('1')
+        '''
+        return Batcher(
+            lambda ids: self.get_many(ids, params, fields, batch_size,
+                                      query),
+            window, batch_size or DEFAULT_BATCH_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def list(self, params=None, page_size=None, workers=None,
+             fields=None, stream=False):
         '''Retrieve a list of all virtual servers on the account
 
         :param dict params: response-level options (attributes, limit, etc.)
+        :param fields: only return these attributes (list of names, or
+                       the name of a preset in FIELDS)
+        :param integer page_size: if set, lazily page through the
+                                  collection this many resources at a time
+        :param integer workers: if set, read the total from the first page
+                                and fetch the rest this many pages at a
+                                time (implies paging)
+        :param bool stream: decode resources as the response downloads
+                            (in a single request unless page_size is set)
         :returns: List of dictionaries representing the matching
                   virtual server
 
@@ -55,10 +143,59 @@ class VSManager(object):
 
             # Gets a list of all virtual server instances (returns IDs only)
             instances = vs_mgr.list({'attributes': 'id'})
+
+            # Walks all virtual server instances, 500 per request, without
+            # holding the whole collection in memory
+            for instance in vs_mgr.list(page_size=500):
+                print(instance['id'])
+
+            # Only fetch the columns needed to check power states
+            instances = vs_mgr.list(fields='power_state')
+            instances = vs_mgr.list(fields=['id', 'name', 'vendor'])
         '''
-        params = update_params(params, {'expand': 'resources'})
-        return normalize_collection(
-            self.client.call('get', '/vms', params=params))
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), fields, self.FIELDS)
+        if page_size or workers or stream:
+            return as_records(self.record_class, iter_collection(
+                self.client, '/vms', params, page_size, workers, stream))
+        return as_records(self.record_class, normalize_collection(
+            self.client.call('get', '/vms', params=params)))
+
+    # pylint: disable=too-many-arguments
+    def export(self, numeric=None, strings=None, params=None,
+               page_size=1000, workers=None):
+        '''Exports virtual servers to columnar buffers (for analytics)
+
+        The collection is paged through and each resource is packed into
+        columns as soon as it has been downloaded (see the stream option
+        of list); only the exported attributes are requested.
+
+        :param list numeric: numeric attributes (default: EXPORT_NUMERIC)
+        :param list strings: string attributes, dictionary-encoded
+                             (default: EXPORT_STRINGS)
+        :param dict params: response-level options (filter, etc.)
+        :param integer page_size: number of resources fetched per request
+        :param integer workers: number of pages fetched concurrently
+        :returns: Cloudforms.export.Columns store
+
+        Example::
+
+            cols = vs_mgr.export()
+            # Total memory of powered on virtual servers (vectorized if
+            # numpy is installed)
+            powered_on = cols['power_state'].codes == \\
+                cols['power_state'].code('on')
+            print(cols['ram_size'][powered_on].sum())
+            print(cols['vendor'].counts())
+        '''
+        numeric = self.EXPORT_NUMERIC if numeric is None else numeric
+        strings = self.EXPORT_STRINGS if strings is None else strings
+        params = update_fields(update_params(
+            params, {'expand': 'resources'}), list(numeric) + list(strings))
+        return export_columns(
+            iter_collection(self.client, '/vms', params, page_size, workers,
+                            stream=True),
+            numeric, strings)
 
     def perform_action(self, _id, action, params=None):
         '''Sends a request to perform an action on a virtual server
@@ -79,6 +216,31 @@ class VSManager(object):
         return normalize_object(
             self.client.call('post', '/vms/%s' % _id, data=params))
 
+    def perform_action_many(self, ids, action, params=None,
+                            batch_size=None):
+        '''Sends requests to perform an action on many virtual servers
+
+        Resources are sent in batches using collection-level POSTs
+        instead of one request per virtual server.
+
+        :param list ids: Specifies which virtual servers the request is for
+        :param string action: The action to request (start, stop, suspend)
+        :param dict params: Additional per-resource POST request data
+        :param integer batch_size: number of virtual servers per request
+        :returns: List of task request dictionaries, in the same order
+                  as ids (failed items have a false 'success' key)
+
+        Example::
+
+            # Stop every virtual server on the account
+            ids = [vsi['id'] for vsi in vs_mgr.list({'attributes': 'id'})]
+            for res in vs_mgr.perform_action_many(ids, 'stop'):
+                if not res.get('success'):
+                    print(res.get('href'), res.get('message'))
+        '''
+        return perform_action_many(self.client, 'vms', ids, action,
+                                   params, batch_size)
+
     def start(self, _id, params=None):
         '''Sends a request to start a virtual server
 
@@ -142,3 +304,43 @@ class VSManager(object):
                 vs_mgr.delete(vsi['id'])
         '''
         return self.perform_action(_id, 'delete', params)
+
+    def start_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to start many virtual servers
+
+        :param list ids: Specifies which virtual servers the request is for
+        :param dict params: Additional per-resource POST request data
+        :param integer batch_size: number of virtual servers per request
+        :returns: List of task request dictionaries (see TaskManager)
+        '''
+        return self.perform_action_many(ids, 'start', params, batch_size)
+
+    def stop_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to stop many virtual servers
+
+        :param list ids: Specifies which virtual servers the request is for
+        :param dict params: Additional per-resource POST request data
+        :param integer batch_size: number of virtual servers per request
+        :returns: List of task request dictionaries (see TaskManager)
+        '''
+        return self.perform_action_many(ids, 'stop', params, batch_size)
+
+    def suspend_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to suspend many virtual servers
+
+        :param list ids: Specifies which virtual servers the request is for
+        :param dict params: Additional per-resource POST request data
+        :param integer batch_size: number of virtual servers per request
+        :returns: List of task request dictionaries (see TaskManager)
+        '''
+        return self.perform_action_many(ids, 'suspend', params, batch_size)
+
+    def delete_many(self, ids, params=None, batch_size=None):
+        '''Sends batched requests to delete many virtual servers
+
+        :param list ids: Specifies which virtual servers the request is for
+        :param dict params: Additional per-resource POST request data
+        :param integer batch_size: number of virtual servers per request
+        :returns: List of task request dictionaries (see TaskManager)
+        '''
+        return self.perform_action_many(ids, 'delete', params, batch_size)
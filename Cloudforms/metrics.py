@@ -0,0 +1,249 @@
+'''
+    Cloudforms.metrics
+    ~~~~~~~~~~~~~~~~~~
+    Per-call instrumentation hooks, histograms and Prometheus export
+
+    :license: MIT, see LICENSE for more details.
+'''
+import re
+import threading
+from bisect import bisect_left
+
+#: Default histogram buckets (upper bounds, in seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                   10, 30)
+
+_ID = re.compile(r'/\d+(?=/|$)')
+
+
+def path_template(path):
+    '''Returns a path with its IDs replaced (/vms/12/tags -> /vms/:id/tags)
+    so calls can be grouped without one series per resource'''
+    return _ID.sub('/:id', path.split('?')[0])
+
+
+class CallInfo(object):
+    '''What happened during one API call (handed to every hook)
+
+    Timings (in seconds) are only present for the phases the call went
+    through:
+
+    - queue: waiting for the rate limiter
+    - dns, connect: name resolution and connection set up, TLS included
+      (asynchronous client only, when a new connection was opened)
+    - server: request sent until response headers received (the
+      threaded client also counts connection set up here)
+    - transfer: reading the response body
+    - decode: JSON decoding
+    - retry_wait: sleeping between retries
+    - total: the whole call, as seen by the caller
+
+    :param string method: HTTP method
+    :param string path: API path
+    '''
+    __slots__ = ('method', 'path', 'template', 'status', 'bytes',
+                 'retries', 'cached', 'coalesced', 'error', 'timings')
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.template = path_template(path)
+        self.status = None
+        self.bytes = 0
+        self.retries = 0
+        self.cached = False
+        self.coalesced = False
+        self.error = None
+        self.timings = dict()
+
+    def add(self, phase, seconds):
+        '''Adds time spent in a phase'''
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def share(self, leader):
+        '''Takes the response of the identical call in progress that
+        answered this one (see :class:`Cloudforms.cache.SingleFlight`)'''
+        self.coalesced = True
+        if leader is not None:
+            self.status = leader.status
+            self.bytes = leader.bytes
+
+    def __repr__(self):
+        return '<CallInfo: [%s] %s %s %.1fms>' % (
+            self.method, self.path, self.status or self.error,
+            1000 * self.timings.get('total', 0.0))
+
+
+class Histogram(object):
+    '''Counts of observed values per bucket (not cumulative)
+
+    :param tuple buckets: sorted bucket upper bounds
+    '''
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        '''Records a value'''
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        '''Estimates a quantile (0 < q <= 1) from the bucket counts'''
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if idx == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[idx - 1] if idx else 0.0
+                return lower + (self.buckets[idx] - lower) * \
+                    (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsCollector(object):
+    '''In-process metrics hook (pass it to a client's hooks)
+
+    Keeps, per method and path template, histograms of call durations
+    (by status) and of time spent in each phase, plus response bytes,
+    retries, cache hits, coalesced calls and errors.
+
+    :param tuple buckets: histogram bucket upper bounds (in seconds)
+
+    Example::
+
+        metrics = MetricsCollector()
+        client = Cloudforms.Client(hooks=[metrics])
+        ...
+        print(metrics.duration('get', '/vms/:id').quantile(0.99))
+        print(metrics.prometheus())
+    '''
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.durations = dict()
+        self.phases = dict()
+        self.bytes = dict()
+        self.retries = dict()
+        self.cached = dict()
+        self.coalesced = dict()
+        self.errors = dict()
+        self._lock = threading.Lock()
+
+    def __call__(self, info):
+        call = (info.method, info.template)
+        with self._lock:
+            self._observe(self.durations, call + (str(info.status or ''),),
+                          info.timings.get('total', 0.0))
+            for phase, seconds in info.timings.items():
+                if phase != 'total':
+                    self._observe(self.phases, call + (phase,), seconds)
+            self._count(self.bytes, call, info.bytes)
+            self._count(self.retries, call, info.retries)
+            self._count(self.cached, call, int(info.cached))
+            self._count(self.coalesced, call, int(info.coalesced))
+            if info.error:
+                self._count(self.errors, call + (info.error,), 1)
+
+    def _observe(self, histograms, key, value):
+        '''Records a value in the histogram for key'''
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    @staticmethod
+    def _count(counters, key, value):
+        '''Adds to the counter for key'''
+        if value:
+            counters[key] = counters.get(key, 0) + value
+
+    def duration(self, method, template, status=None):
+        '''Returns a histogram of call durations (all statuses merged
+        unless status is given)'''
+        merged = Histogram(self.buckets)
+        with self._lock:
+            for key, histogram in self.durations.items():
+                if key[:2] == (method, template) and \
+                   (status is None or key[2] == str(status)):
+                    merged.counts = [x + y for x, y in
+                                     zip(merged.counts, histogram.counts)]
+                    merged.sum += histogram.sum
+                    merged.count += histogram.count
+        return merged
+
+    def prometheus(self, prefix='cloudforms'):
+        '''Returns every metric in the Prometheus text exposition format
+
+        :param string prefix: metric name prefix
+        '''
+        lines = list()
+        with self._lock:
+            for name, kind, text, names, values in [
+                    ('request_duration_seconds', 'histogram',
+                     'API call duration', ('method', 'path', 'status'),
+                     self.durations),
+                    ('request_phase_seconds', 'histogram',
+                     'Time spent per API call phase',
+                     ('method', 'path', 'phase'), self.phases),
+                    ('response_bytes_total', 'counter',
+                     'Response body bytes received', ('method', 'path'),
+                     self.bytes),
+                    ('retries_total', 'counter',
+                     'API call retries', ('method', 'path'),
+                     self.retries),
+                    ('cache_hits_total', 'counter',
+                     'API calls answered from the cache',
+                     ('method', 'path'), self.cached),
+                    ('coalesced_total', 'counter',
+                     'API calls answered by an identical call in progress',
+                     ('method', 'path'), self.coalesced),
+                    ('errors_total', 'counter',
+                     'Failed API calls', ('method', 'path', 'error'),
+                     self.errors)]:
+                name = '%s_%s' % (prefix, name)
+                lines.append('# HELP %s %s' % (name, text))
+                lines.append('# TYPE %s %s' % (name, kind))
+                if kind == 'histogram':
+                    lines.extend(_histogram_lines(name, names, values))
+                else:
+                    lines.extend('%s%s %d' % (name, _labels(names, key),
+                                              values[key])
+                                 for key in sorted(values))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(names, values, extra=None):
+    '''Formats a Prometheus label set'''
+    pairs = list(zip(names, values)) + (extra or [])
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\')
+                     .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs)
+
+
+def _histogram_lines(name, names, histograms):
+    '''Formats histograms as Prometheus samples'''
+    lines = list()
+    for key in sorted(histograms):
+        histogram = histograms[key]
+        cumulative = 0
+        for bound, count in zip(list(histogram.buckets) + ['+Inf'],
+                                histogram.counts):
+            cumulative += count
+            lines.append('%s_bucket%s %d' % (name, _labels(
+                names, key, [('le', bound if bound == '+Inf'
+                              else '%g' % bound)]), cumulative))
+        lines.append('%s_sum%s %r' % (name, _labels(names, key),
+                                      histogram.sum))
+        lines.append('%s_count%s %d' % (name, _labels(names, key),
+                                        histogram.count))
+    return lines
@@ -0,0 +1,279 @@
+'''
+    Cloudforms.multi
+    ~~~~~~~~~~~~~~~~
+    One client for several appliances (regions): fanned out queries and
+    routing of per-ID calls to the region owning the ID
+
+    :license: MIT, see LICENSE for more details.
+'''
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from Cloudforms.exceptions import CloudformsError, CloudformsRegionError
+from Cloudforms.utils import CloudformsBase, CloudformsEndpoint
+
+#: IDs are unique across regions: region N numbers its resources from
+#: N * REGION_ID_FACTOR
+REGION_ID_FACTOR = 10 ** 12
+
+# A path addressing one resource (ex. /vms/1000000000012/tags)
+_RESOURCE_PATH = re.compile(r'^/[a-z_]+/(\d+)(?=/|$)')
+# The ID at the end of a resource href
+_HREF_ID = re.compile(r'/(\d+)/?$')
+# Collection totals added up when merging raw responses
+_COUNTS = ('count', 'subcount', 'subquery_count')
+
+
+def region_of(_id):
+    '''Returns the region number owning a resource ID'''
+    return int(_id) // REGION_ID_FACTOR
+
+
+class MultiClient(object):
+    '''Client of several regions at once, usable with every manager
+
+    Calls for a single resource (ex. GET /vms/1000000000012) go to the
+    region owning its ID. Collection reads (lists, polling) are sent to
+    every region in parallel and merged, each resource tagged with its
+    region (under region_key). Action POSTs on many resources are split
+    by region (from their hrefs); other calls (ex. creates) go to
+    default_region.
+
+    A region that fails or does not answer within timeout either fails
+    the call (CloudformsRegionError), or, with partial set, is left out
+    of the results (and counted in failures) so the other regions'
+    results are not held back. Failed regions of a split POST always
+    show up as failed results, one per resource.
+
+    :param dict regions: region number -> Client, or CloudformsEndpoint
+                         (a client is then created with options)
+    :param integer workers: max calls in flight (default: 4 per region)
+    :param float timeout: seconds to wait for the regions of a fanned
+                          out call (None to wait for all of them)
+    :param bool partial: leave failed regions out instead of raising
+    :param integer default_region: region of calls that are not
+                                   routed (default: the lowest one)
+    :param string region_key: key added to resources to tell their
+                              region
+    :param options: Client options for the regions given as endpoints
+                    (logger, retry, cache, ...)
+
+    Example::
+
+        client = MultiClient({
+            1: Cloudforms.Client(host='cf-east.example.com'),
+            2: Cloudforms.Client(host='cf-west.example.com')
+        }, timeout=30, partial=True)
+        vs_mgr = Cloudforms.VSManager(client)
+        for vm in vs_mgr.list(fields='identity'):
+            print(vm['region'], vm['name'])
+        vm = vs_mgr.get('2000000000042')  # only asks region 2
+    '''
+    # pylint: disable=too-many-arguments
+    def __init__(self, regions, workers=None, timeout=None, partial=False,
+                 default_region=None, region_key='region', **options):
+        if not regions:
+            raise CloudformsError('MultiClient needs at least one region')
+        self.clients = dict(
+            (region, CloudformsBase(client, **options)
+             if isinstance(client, CloudformsEndpoint) else client)
+            for region, client in regions.items())
+        self.regions = sorted(self.clients)
+        self.timeout = timeout
+        self.partial = partial
+        self.default_region = default_region if default_region is not None \
+            else self.regions[0]
+        self.region_key = region_key
+        self.log = options.get('logger')
+        self.failures = dict((region, 0) for region in self.regions)
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers or 4 * len(self.regions))
+
+    @property
+    def base_url(self):
+        '''Returns the (relative) base of the hrefs built for this client,
+        rewritten to the region's URL when a call is routed'''
+        return '/api'
+
+    def client_for(self, _id):
+        '''Returns the client of the region owning a resource ID'''
+        region = region_of(_id)
+        client = self.clients.get(region)
+        if client is None:
+            raise CloudformsError('No client for region %s (ID %s)' % (
+                region, _id))
+        return client
+
+    def close(self):
+        '''Closes every region's connections'''
+        self.pool.shutdown(wait=False)
+        for client in self.clients.values():
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def fan_out(self, func, regions=None, timeout=None):
+        '''Calls func(client) for every region in parallel
+
+        :param func: function of a region's client
+        :param list regions: region numbers (default: all)
+        :param float timeout: seconds to wait (default: the client's)
+        :returns: Generator yielding (region, result) pairs as regions
+                  answer; failed or timed out regions yield a
+                  CloudformsRegionError as result
+
+        Example::
+
+            # Handle each region's VMs as soon as they arrive
+            for region, vms in client.fan_out(
+                    lambda region_client: VSManager(region_client).list()):
+                if not isinstance(vms, Exception):
+                    print(region, len(vms))
+        '''
+        return self._fan_out(dict(
+            (region, lambda client=self.clients[region]: func(client))
+            for region in (regions or self.regions)), timeout)
+
+    def _fan_out(self, calls, timeout=None):
+        '''Runs region -> function calls in parallel (see fan_out)'''
+        futures = dict((self.pool.submit(func), region)
+                       for region, func in calls.items())
+        pending = set(futures)
+        try:
+            for future in as_completed(
+                    futures, timeout if timeout is not None
+                    else self.timeout):
+                pending.discard(future)
+                region = futures[future]
+                try:
+                    yield region, future.result()
+                except Exception as err:  # pylint: disable=broad-except
+                    yield region, CloudformsRegionError(region, err)
+        except FutureTimeoutError:
+            for future in sorted(pending, key=futures.get):
+                future.cancel()
+                yield futures[future], CloudformsRegionError(
+                    futures[future], None)
+
+    def _gather(self, func, regions=None):
+        '''Returns (region, result) pairs of a fanned out call (in region
+        order), raising or skipping (if partial) failed regions'''
+        results = list()
+        for region, result in self.fan_out(func, regions):
+            if isinstance(result, CloudformsRegionError):
+                self.failures[region] += 1
+                if not self.partial:
+                    raise result
+                if self.log:
+                    self.log.warning('Leaving out %s', result)
+                continue
+            results.append((region, result))
+        return sorted(results, key=lambda pair: pair[0])
+
+    def _tag(self, region, obj):
+        '''Tags a resource (or list of resources) with its region'''
+        for resource in obj if isinstance(obj, list) else [obj]:
+            if isinstance(resource, dict):
+                resource[self.region_key] = region
+        return obj
+
+    # pylint: disable=too-many-arguments
+    def call(self, method, path, data=None, params=None, raw=False,
+             stream=False, cache=True):
+        '''Makes an API call on the region(s) concerned
+        (see :meth:`Cloudforms.utils.CloudformsBase.call`)'''
+        method = method.lower()
+        match = _RESOURCE_PATH.match(path)
+        if match:
+            region = region_of(match.group(1))
+            ret = self.client_for(match.group(1)).call(
+                method, path, data, params, raw, stream, cache)
+            return ret if raw or stream else self._tag(region, ret)
+        if method == 'get':
+            return self._read(path, params, raw, stream, cache)
+        resources = data.get('resources') if isinstance(data, dict) \
+            else None
+        if resources and all(_HREF_ID.search(resource.get('href') or '')
+                             for resource in resources):
+            return self._split(method, path, data, params, raw)
+        ret = self.clients[self.default_region].call(
+            method, path, data, params, raw, stream)
+        return ret if raw else self._tag(self.default_region, ret)
+
+    # pylint: disable=too-many-arguments
+    def _read(self, path, params, raw, stream, cache=True):
+        '''Reads a collection from every region and merges the results'''
+        results = self._gather(lambda client: client.call(
+            'get', path, params=params, raw=raw, stream=stream,
+            cache=cache))
+        if stream:
+            return self._chain(results)
+        if raw:
+            merged = dict()
+            for region, ret in results:
+                for key, value in ret.items():
+                    if key == 'resources':
+                        merged.setdefault(key, list()).extend(
+                            self._tag(region, value))
+                    elif key in _COUNTS:
+                        merged[key] = merged.get(key, 0) + (value or 0)
+                    else:
+                        merged.setdefault(key, value)
+            return merged
+        if all(isinstance(ret, list) for _, ret in results):
+            return [resource for region, ret in results
+                    for resource in self._tag(region, ret)]
+        # Not a collection: the caller gets every region's answer
+        return dict(results)
+
+    def _chain(self, results):
+        '''Yields the (tagged) resources of every region's stream'''
+        for region, resources in results:
+            for resource in resources:
+                yield self._tag(region, resource)
+
+    # pylint: disable=too-many-arguments
+    def _split(self, method, path, data, params, raw):
+        '''Sends each region the resources it owns (found from their
+        hrefs), returns the results in the original order'''
+        groups = dict()
+        results = list()
+        for idx, resource in enumerate(data['resources']):
+            region = region_of(_HREF_ID.search(resource['href']).group(1))
+            href = resource['href']
+            client = self.clients.get(region)
+            if client is None:
+                results.append({'success': False, 'href': href,
+                                'message': 'No client for region %s' %
+                                region})
+                continue
+            if href.startswith(self.base_url + '/'):
+                href = client.base_url + href[len(self.base_url):]
+            groups.setdefault(region, list()).append(
+                (idx, dict(resource, href=href)))
+            results.append(None)
+
+        def send(region):
+            '''Returns a function sending a region its resources'''
+            return lambda: self.clients[region].call(
+                method, path, dict(data, resources=[
+                    resource for _, resource in groups[region]]), params)
+
+        for region, ret in self._fan_out(dict(
+                (region, send(region)) for region in groups)):
+            error = ret if isinstance(ret, CloudformsRegionError) else None
+            if error is not None:
+                self.failures[region] += 1
+            ret = ret if isinstance(ret, list) else list()
+            for pos, (idx, resource) in enumerate(groups[region]):
+                results[idx] = self._tag(region, ret[pos]) \
+                    if pos < len(ret) else {
+                        'success': False,
+                        'href': resource['href'],
+                        'message': str(error) if error is not None else
+                        'No result returned for resource'}
+        return {'results': results} if raw else results
@@ -0,0 +1,136 @@
+'''
+    Cloudforms.poller
+    ~~~~~~~~~~~~~~~~~
+    Batched polling of many resources in a collection
+
+    :license: MIT, see LICENSE for more details.
+'''
+from time import sleep
+from random import uniform
+from Cloudforms.utils import (
+    DEFAULT_BATCH_SIZE,
+    chunked,
+    id_filter,
+    monotonic,
+    update_params
+)
+
+
+class Backoff(object):
+    '''Exponential backoff with (equal) jitter
+
+    :param float interval: initial delay (in seconds)
+    :param float max_interval: upper bound for the delay
+    :param float factor: growth factor applied after every delay
+    '''
+    def __init__(self, interval=1, max_interval=30, factor=2):
+        self.interval = interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.current = interval
+
+    def reset(self):
+        '''Goes back to the initial delay'''
+        self.current = self.interval
+
+    def next(self):
+        '''Returns the next delay (and grows the one after that)'''
+        delay = uniform(self.current / 2.0, self.current)
+        self.current = min(self.current * self.factor, self.max_interval)
+        return delay
+
+
+class CollectionPoller(object):
+    '''Tracks many resources of a collection until each one reaches
+    a given value for key (ex. a task's state reaching "finished")
+
+    Every poll issues one collection query per batch_size outstanding
+    resources instead of one GET per resource.
+
+    :param Cloudforms.API.Client client: an API client instance
+    :param string path: collection path (ex. /tasks)
+    :param string key: the attribute to watch (ex. state)
+    :param string value: the value to wait for (case insensitive)
+    :param dict params: response-level options (attributes, etc.)
+    :param integer batch_size: number of resources per query
+    '''
+    # pylint: disable=too-many-arguments
+    def __init__(self, client, path, key, value, params=None,
+                 batch_size=None):
+        self.client = client
+        self.path = path
+        self.key = key
+        self.value = value.lower()
+        self.params = params
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.pending = set()
+        self.missing = set()
+
+    def add(self, ids):
+        '''Starts tracking resources'''
+        self.pending.update(str(_id) for _id in ids)
+
+    def queries(self):
+        '''Returns (IDs, params) for each query needed for one poll'''
+        params = update_params(self.params, {'expand': 'resources'})
+        if params.get('attributes'):
+            params['attributes'] = '%s,id,%s' % (params['attributes'],
+                                                 self.key)
+        return [(chunk, update_params(params, {'filter[]': id_filter(chunk)}))
+                for chunk in chunked(sorted(self.pending), self.batch_size)]
+
+    def update(self, queried, resources):
+        '''Records query results and returns the completed resources
+
+        :param list queried: the IDs that were asked for
+        :param list resources: what the collection query returned
+        '''
+        done = list()
+        found = set()
+        for resource in resources:
+            _id = str(resource.get('id'))
+            found.add(_id)
+            if _id in self.pending and \
+               str(resource.get(self.key) or '').lower() == self.value:
+                self.pending.discard(_id)
+                done.append(resource)
+        # Resources that no longer exist will never complete
+        for _id in set(queried) - found:
+            self.pending.discard(_id)
+            self.missing.add(_id)
+        return done
+
+    def poll(self):
+        '''Queries every outstanding resource once
+
+        :returns: List of resources that completed since the last poll
+        '''
+        done = list()
+        for queried, params in self.queries():
+            # Polls must see the current state, never a cached one
+            ret = self.client.call('get', self.path, params=params,
+                                   cache=False)
+            done.extend(self.update(
+                queried, ret if isinstance(ret, list) else list()))
+        return done
+
+    def wait(self, timeout=30, backoff=None):
+        '''Polls until every resource completes or timeout expires
+
+        :param integer timeout: operation timeout (in seconds)
+        :param Backoff backoff: polling delay policy
+        :returns: Generator yielding each resource as it completes
+        '''
+        backoff = backoff or Backoff()
+        deadline = monotonic() + timeout
+        while self.pending:
+            done = self.poll()
+            for resource in done:
+                yield resource
+            remaining = deadline - monotonic()
+            if not self.pending or remaining <= 0:
+                return
+            # Poll eagerly again while things are progressing
+            if done:
+                backoff.reset()
+            sleep(min(backoff.next(), remaining))
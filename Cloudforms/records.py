@@ -0,0 +1,177 @@
+'''
+    Cloudforms.records
+    ~~~~~~~~~~~~~~~~~~
+    Compact (__slots__) resource records
+
+    :license: MIT, see LICENSE for more details.
+'''
+import json
+try:
+    from sys import intern
+except ImportError:  # pragma: no cover (Python 2 has a builtin intern)
+    pass
+
+_MISSING = object()
+
+
+class Record(object):
+    '''Base class for compact resource records
+
+    Frequently used attributes are stored in slots (no per-record dict
+    and no per-record copy of the key strings). Everything else,
+    including nested objects, is kept as a compact JSON string and only
+    decoded the first time one of those attributes is accessed.
+
+    Records behave like read-only dictionaries (record['name'],
+    record.get('name'), 'name' in record) so they can stand in for the
+    dictionaries the managers return by default.
+
+    :param dict data: the resource as returned by the API
+    '''
+    __slots__ = ('_packed', '_extra')
+    #: Attributes stored in slots
+    FIELDS = ()
+    #: Attributes with few distinct values (their values get interned)
+    INTERNED = ()
+
+    def __init__(self, data):
+        extra = dict()
+        for key, value in data.items():
+            if key in self.FIELDS:
+                if key in self.INTERNED and isinstance(value, str):
+                    value = intern(value)
+                setattr(self, key, value)
+            else:
+                extra[key] = value
+        self._packed = json.dumps(extra, separators=(',', ':')) \
+            if extra else None
+        self._extra = None
+
+    def _unpack(self):
+        '''Decodes the rarely used attributes (once)'''
+        if self._extra is None:
+            self._extra = dict(
+                (intern(str(key)), value)
+                for key, value in json.loads(self._packed).items()) \
+                if self._packed else dict()
+            self._packed = None
+        return self._extra
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not (set) slots
+        if name in self.FIELDS:
+            return None
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._unpack()[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def _slot(self, name):
+        '''Returns a slot's value (or _MISSING if it was never set)'''
+        try:
+            return object.__getattribute__(self, name)
+        except AttributeError:
+            return _MISSING
+
+    def __getitem__(self, key):
+        value = self._slot(key) if key in self.FIELDS else \
+            self._unpack().get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (self.__class__, (self.to_dict(),))
+
+    def __repr__(self):
+        return '<%s(%s): %s>' % (self.__class__.__name__,
+                                 self.get('id'), self.get('name'))
+
+    def get(self, key, default=None):
+        '''Returns an attribute's value, or default if it is not set'''
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        '''Returns the names of every attribute that is set'''
+        return list(self.to_dict().keys())
+
+    def to_dict(self):
+        '''Returns the record as a (new) plain dictionary'''
+        ret = dict()
+        for key in self.FIELDS:
+            value = self._slot(key)
+            if value is not _MISSING:
+                ret[key] = value
+        ret.update(self._unpack())
+        return ret
+
+
+class VirtualServer(Record):
+    '''Virtual server (VM / cloud instance) record'''
+    __slots__ = FIELDS = (
+        'id', 'href', 'name', 'vendor', 'type', 'power_state',
+        'raw_power_state', 'ems_id', 'host_id', 'cpu_total_cores',
+        'ram_size', 'used_disk_storage', 'created_on', 'updated_on')
+    INTERNED = ('vendor', 'type', 'power_state', 'raw_power_state')
+
+
+class Task(Record):
+    '''Task record'''
+    __slots__ = FIELDS = (
+        'id', 'href', 'name', 'state', 'status', 'message', 'userid',
+        'created_on', 'updated_on')
+    INTERNED = ('state', 'status', 'userid')
+
+
+class Provider(Record):
+    '''Provider record'''
+    __slots__ = FIELDS = (
+        'id', 'href', 'name', 'type', 'hostname', 'ipaddress', 'zone_id',
+        'created_on', 'updated_on')
+    INTERNED = ('type',)
+
+
+class ProvisionRequest(Record):
+    '''Provision request record'''
+    __slots__ = FIELDS = (
+        'id', 'href', 'description', 'approval_state', 'request_state',
+        'status', 'message', 'userid', 'created_on', 'updated_on')
+    INTERNED = ('approval_state', 'request_state', 'status', 'userid')
+
+
+class Tag(Record):
+    '''Tag record'''
+    __slots__ = FIELDS = ('id', 'href', 'name')
+
+
+def as_records(record_class, ret):
+    '''Wraps a result (resource, list or generator of resources)
+
+    :param type record_class: Record subclass to use (None for dicts)
+    :param ret: what a manager would otherwise return
+    '''
+    if record_class is None or ret is None:
+        return ret
+    if isinstance(ret, dict):
+        return record_class(ret)
+    if isinstance(ret, list):
+        return [record_class(x) if isinstance(x, dict) else x for x in ret]
+    return (record_class(x) if isinstance(x, dict) else x for x in ret)
@@ -0,0 +1,242 @@
+'''
+    Cloudforms.retry
+    ~~~~~~~~~~~~~~~~
+    Retries (with backoff and a retry budget) and circuit breaking
+
+    :license: MIT, see LICENSE for more details.
+'''
+import threading
+import time
+from email.utils import parsedate_tz, mktime_tz
+from Cloudforms.exceptions import CloudformsCircuitOpenError
+from Cloudforms.poller import Backoff
+from Cloudforms.utils import monotonic
+
+#: Methods that can be sent again without changing the outcome
+IDEMPOTENT_METHODS = ('get', 'head', 'options', 'put', 'delete')
+
+
+def parse_retry_after(value):
+    '''Returns a Retry-After header value in seconds (or None)
+
+    :param string value: delay in seconds, or an HTTP date
+    '''
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        date = parsedate_tz(value)
+        return max(0.0, mktime_tz(date) - time.time()) if date else None
+
+
+class RetryBudget(object):
+    '''Caps retries to a fraction of the requests being sent
+
+    Every call deposits ratio tokens (up to max_tokens) and every retry
+    withdraws one, so when most calls fail retries stop at about ratio
+    times the request rate instead of multiplying the load.
+
+    :param float ratio: retries allowed per call
+    :param float max_tokens: burst of retries allowed (also the
+                             starting balance)
+    '''
+    def __init__(self, ratio=0.1, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(max_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        '''Credits the budget for a new call'''
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        '''Takes a token for a retry, returns False if none are left'''
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    '''Decides which failed calls are sent again, and when
+
+    Connection errors and responses with a status in statuses are
+    retried for idempotent methods only. Delays grow exponentially
+    (with jitter) unless the appliance asks for one (Retry-After).
+
+    :param integer retries: max retries per call
+    :param tuple statuses: HTTP statuses worth retrying
+    :param tuple methods: methods safe to send more than once
+    :param float interval: initial backoff delay (in seconds)
+    :param float max_interval: upper bound for backoff delays
+    :param float max_retry_after: give up rather than honour a longer
+                                  Retry-After (in seconds)
+    :param RetryBudget budget: shared limit on retries (default: a
+                               RetryBudget allowing 10% of calls)
+
+    Example::
+
+        client = Cloudforms.Client(retry=RetryPolicy(retries=5),
+                                   breaker=CircuitBreaker())
+    '''
+    # pylint: disable=too-many-arguments
+    def __init__(self, retries=3, statuses=(429, 502, 503, 504),
+                 methods=IDEMPOTENT_METHODS, interval=0.5, max_interval=10,
+                 max_retry_after=60, budget=None):
+        self.retries = retries
+        self.statuses = statuses
+        self.methods = methods
+        self.interval = interval
+        self.max_interval = max_interval
+        self.max_retry_after = max_retry_after
+        self.budget = budget if budget is not None else RetryBudget()
+        self.retried = 0
+        self.exhausted = 0
+        self.throttled = 0
+
+    def attempt(self, method):
+        '''Starts tracking a call (see RetryState)'''
+        self.budget.deposit()
+        return RetryState(self, method)
+
+    @property
+    def stats(self):
+        '''Returns counters for monitoring'''
+        return {
+            'retried': self.retried,
+            'exhausted': self.exhausted,
+            'throttled': self.throttled,
+            'budget': self.budget.tokens
+        }
+
+
+class RetryState(object):
+    '''Retry bookkeeping of a single call
+
+    :param RetryPolicy policy: the policy in effect
+    :param string method: the call's HTTP method
+    '''
+    def __init__(self, policy, method):
+        self.policy = policy
+        self.enabled = method.lower() in policy.methods
+        self.retries = 0
+        self.backoff = Backoff(policy.interval, policy.max_interval)
+
+    def delay(self, retry_after=None):
+        '''Returns how long to wait before retrying (None to give up)
+
+        :param string retry_after: the response's Retry-After header
+        '''
+        policy = self.policy
+        if not self.enabled:
+            return None
+        if self.retries >= policy.retries:
+            policy.exhausted += 1
+            return None
+        wait = parse_retry_after(retry_after)
+        if wait is None:
+            wait = self.backoff.next()
+        elif wait > policy.max_retry_after:
+            policy.exhausted += 1
+            return None
+        if not policy.budget.withdraw():
+            policy.throttled += 1
+            return None
+        self.retries += 1
+        policy.retried += 1
+        return wait
+
+
+class CircuitBreaker(object):
+    '''Fails calls fast while an appliance is down
+
+    After failure_threshold consecutive failures (connection errors or
+    5xx statuses) the circuit opens and calls raise
+    CloudformsCircuitOpenError without being sent. Once reset_timeout
+    has passed a single trial call is let through (half-open): its
+    success closes the circuit, its failure opens it again.
+
+    Share one breaker between every client of the same appliance.
+
+    :param integer failure_threshold: consecutive failures that open
+                                      the circuit
+    :param float reset_timeout: seconds to wait before a trial call
+    :param string name: name used in errors (defaults to the host of
+                        the first client it is given to)
+    '''
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, name=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._state = self.CLOSED
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        '''Returns the circuit's state (closed, open or half-open)'''
+        with self._lock:
+            if self._state != self.CLOSED and \
+               monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before(self):
+        '''Lets a call through, or raises CloudformsCircuitOpenError'''
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            remaining = self._opened_at + self.reset_timeout - monotonic()
+            if remaining <= 0:
+                # Let one trial call through; the next one will have to
+                # wait for another reset_timeout if it never reports back
+                self._state = self.HALF_OPEN
+                self._opened_at = monotonic()
+                return
+            self.rejected += 1
+        raise CloudformsCircuitOpenError(self.name, max(0.0, remaining))
+
+    def success(self):
+        '''Records a successful call'''
+        with self._lock:
+            self._state = self.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        '''Records a failed call'''
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or \
+               self.failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = monotonic()
+
+    def record(self, status):
+        '''Records a call's HTTP status (5xx counts as a failure)'''
+        if status >= 500:
+            self.failure()
+        else:
+            self.success()
+
+    @property
+    def stats(self):
+        '''Returns counters for monitoring'''
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'opened': self.opened,
+            'rejected': self.rejected
+        }
@@ -0,0 +1,279 @@
+'''
+    Cloudforms.transport
+    ~~~~~~~~~~~~~~~~~~~~
+    Pluggable HTTP transports: pooled HTTP/1.1 connections (requests, the
+    default) or HTTP/2 streams multiplexed over shared connections
+    (httpx, optional)
+
+    :license: MIT, see LICENSE for more details.
+'''
+import threading
+import time
+from datetime import timedelta
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from Cloudforms.exceptions import CloudformsError, CloudformsTransportError
+
+try:
+    import asyncio
+    import httpx
+except ImportError:  # pragma: no cover (httpx missing, or Python 2)
+    httpx = None
+
+# Cloudforms.utils imports this module, its monotonic clock cannot be
+# imported from there
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class Transport(object):
+    '''Sends a client's HTTP requests (see
+    :class:`Cloudforms.utils.CloudformsBase`)
+
+    request() returns a response offering (a subset of) the interface
+    of a requests Response: status_code, reason, headers, content,
+    elapsed (time to headers, a timedelta), iter_content(size) and
+    close(). Failures to get a response are raised as one of the
+    exception types in errors: the client retries those (see
+    :class:`Cloudforms.retry.RetryPolicy`) and reports them to its
+    circuit breaker.
+
+    Transports are thread-safe and may be shared between clients.
+    Subclasses must implement request(), and close() if they hold
+    connections.
+    '''
+    #: Exceptions raised when no response could be had
+    errors = (CloudformsTransportError,)
+
+    # pylint: disable=too-many-arguments
+    def request(self, method, url, auth=None, json=None, params=None,
+                headers=None, stream=False):
+        '''Sends a request, returns its response
+
+        :param string method: HTTP method (get, post, etc.)
+        :param string url: full URL
+        :param tuple auth: (username, password) for basic authentication
+        :param dict json: JSON request body
+        :param dict params: URL query parameters
+        :param dict headers: request headers
+        :param bool stream: return as soon as the response headers are
+                            in, the body is then read with iter_content
+        '''
+        raise NotImplementedError('%s does not implement request()'
+                                  % self.__class__.__name__)
+
+    def close(self):
+        '''Closes all connections'''
+
+
+class RequestsTransport(Transport):
+    '''HTTP/1.1 over pooled keep-alive connections (requests)
+
+    Connections are pooled by a single adapter which is shared (and is
+    safe to share) between threads. Each thread gets its own lightweight
+    session on top of that adapter since sessions carry mutable state
+    (cookies, etc.) of their own. Each call in flight needs a connection
+    of its own.
+
+    :param integer pool_connections: number of host pools to cache
+    :param integer pool_maxsize: max connections kept open per host
+    :param bool pool_block: block (instead of opening throw-away
+                            connections) when a host pool is exhausted
+    :param bool keep_alive: reuse connections between calls
+    :param float timeout: seconds to wait for a connection, and for
+                          each read of a response (None for no limit)
+    '''
+    errors = (RequestException,)
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, pool_connections=10, pool_maxsize=10,
+                 pool_block=False, keep_alive=True, timeout=None):
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize,
+                                   pool_block=pool_block)
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        '''Returns the calling thread's session (bound to the shared pool)'''
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = Session()
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            self._local.session = session
+        return session
+
+    # pylint: disable=too-many-arguments
+    def request(self, method, url, auth=None, json=None, params=None,
+                headers=None, stream=False):
+        return self.session.request(method, url, auth=auth, json=json,
+                                    params=params, headers=headers,
+                                    stream=stream, timeout=self.timeout,
+                                    verify=False)
+
+    def close(self):
+        self.adapter.close()
+
+
+class HTTP2Response(object):
+    '''An httpx response, seen through the requests Response interface
+    the client relies on (see Transport)
+
+    :param HTTP2Transport transport: the transport that got the response
+    :param response: httpx.Response
+    :param float elapsed: seconds spent waiting for the headers
+    '''
+    __slots__ = ('transport', 'response', 'elapsed')
+
+    def __init__(self, transport, response, elapsed):
+        self.transport = transport
+        self.response = response
+        self.elapsed = timedelta(seconds=elapsed)
+
+    @property
+    def status_code(self):
+        '''Returns the HTTP status code'''
+        return self.response.status_code
+
+    @property
+    def reason(self):
+        '''Returns the status text (HTTP/2 has none, the standard one
+        for the status code is used)'''
+        return self.response.reason_phrase
+
+    @property
+    def headers(self):
+        '''Returns the (case-insensitive) response headers'''
+        return self.response.headers
+
+    @property
+    def content(self):
+        '''Returns the response body'''
+        return self.response.content
+
+    def iter_content(self, chunk_size=None):
+        '''Yields the response body chunk by chunk, as it downloads (the
+        transport's timeout applies to each chunk)'''
+        chunks = self.response.aiter_bytes(chunk_size)
+        while True:
+            try:
+                chunk = self.transport.run(chunks.__anext__(),
+                                           self.transport.timeout)
+            except StopAsyncIteration:
+                return
+            yield chunk
+
+    def close(self):
+        '''Releases the response's stream'''
+        self.transport.run(self.response.aclose())
+
+
+class HTTP2Transport(Transport):
+    '''HTTP/2: concurrent calls, from every thread, are multiplexed as
+    streams over shared connections (requires httpx with HTTP/2
+    support: pip install Cloudforms[http2])
+
+    A single connection carries as many calls in flight as the server
+    allows concurrent streams (often 100), a new one is only opened
+    beyond that (up to max_connections). Over HTTPS the protocol is
+    negotiated, falling back to HTTP/1.1 if the server does not offer
+    HTTP/2. Over plain HTTP the server must accept HTTP/2 with prior
+    knowledge (h2c).
+
+    The connections are driven by an event loop of the transport's own,
+    on a background thread; calling threads hand their requests over
+    and wait for the responses.
+
+    Timeouts are per stream: a call taking longer than timeout is
+    cancelled alone, the other calls sharing its connection go on (a
+    timed out read would otherwise fail the whole connection).
+
+    :param float timeout: seconds a call may wait for its response (or,
+                          when streaming, for each chunk of its body)
+                          (None for no limit)
+    :param float connect_timeout: seconds to wait for a connection
+                                  (default: timeout)
+    :param integer max_connections: max connections open per host
+    :param bool verify: check the appliance's TLS certificate
+
+    Example::
+
+        client = Cloudforms.Client(host='cf.example.com',
+                                   transport=HTTP2Transport(timeout=30))
+    '''
+    # pylint: disable=too-many-arguments
+    def __init__(self, timeout=30.0, connect_timeout=None,
+                 max_connections=10, verify=False):
+        if httpx is None:
+            raise CloudformsError('The HTTP/2 transport needs httpx '
+                                  '(pip install Cloudforms[http2])')
+        self.timeout = timeout
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_connections)
+        try:
+            self.client = httpx.AsyncClient(
+                # Reads are bounded per call (see run), not by httpx
+                timeout=httpx.Timeout(None, connect=connect_timeout
+                                      if connect_timeout is not None
+                                      else timeout),
+                mounts={
+                    'http://': httpx.AsyncHTTPTransport(
+                        http1=False, http2=True, limits=limits),
+                    'https://': httpx.AsyncHTTPTransport(
+                        http2=True, verify=verify, limits=limits)
+                })
+        except ImportError:
+            raise CloudformsError('The HTTP/2 transport needs the h2 '
+                                  'package (pip install Cloudforms[http2])')
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever,
+                                       name='cloudforms-http2')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self, awaitable, timeout=None):
+        '''Runs an awaitable on the transport's event loop, returns its
+        result (once done, or cancelled after timeout seconds)'''
+        # wait_for turns any awaitable into a coroutine the loop accepts
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.wait_for(awaitable, timeout), self.loop)
+        try:
+            return future.result()
+        except asyncio.TimeoutError:
+            raise CloudformsTransportError(
+                'No response within %ss' % timeout)
+        except httpx.TransportError as err:
+            raise CloudformsTransportError(err)
+        except BaseException:
+            # The caller gave up (ex. KeyboardInterrupt)
+            future.cancel()
+            raise
+
+    # pylint: disable=too-many-arguments
+    def request(self, method, url, auth=None, json=None, params=None,
+                headers=None, stream=False):
+        req = self.client.build_request(method, url, json=json,
+                                        params=params, headers=headers)
+        start = _clock()
+        res = self.run(self.client.send(req, auth=auth, stream=True),
+                       self.timeout)
+        elapsed = _clock() - start
+        if not stream:
+            try:
+                self.run(res.aread(), self.timeout)
+            finally:
+                self.run(res.aclose())
+        return HTTP2Response(self, res, elapsed)
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        self.run(self.client.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
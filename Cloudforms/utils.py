@@ -1,7 +1,25 @@
 '''Cloudforms - Core classes and definitions'''
-from collections import namedtuple
-from requests import request
-from Cloudforms.exceptions import CloudformsHTTPError
+import time
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import RequestException
+from Cloudforms.decoders import get_decoder, iter_resources
+from Cloudforms.exceptions import CloudformsError, CloudformsHTTPError
+from Cloudforms.logs import log_payload
+from Cloudforms.metrics import CallInfo
+from Cloudforms.transport import RequestsTransport
+
+# Python 2 has no monotonic clock, fall back to wall time there
+monotonic = getattr(time, 'monotonic', time.time)
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_BATCH_SIZE = 100
+#: Bytes read from the socket at a time when streaming a response
+STREAM_CHUNK_SIZE = 65536
+#: Failed action result messages (lowercase substrings) that sending the
+#: same request again cannot change
+PERMANENT_MESSAGES = ("couldn't find", 'not found', 'invalid',
+                      'not authorized', 'forbidden')
 
 CloudformsEndpoint = namedtuple(
     'CloudformsEndpoint',
@@ -15,6 +33,23 @@ def update_params(params, updates):
     return params
 
 
+def update_fields(params, fields, presets=None):
+    '''Merges a list of fields (or a preset name) into params as the
+    attributes option, so only those columns are returned
+
+    :param dict params: response-level options
+    :param fields: list of attribute names, or the name of a preset
+    :param dict presets: preset name -> list of attribute names
+    '''
+    if not fields:
+        return params
+    if not isinstance(fields, (list, tuple, set, frozenset)):
+        if fields not in (presets or dict()):
+            raise CloudformsError('Unknown fields preset "%s"' % fields)
+        fields = presets[fields]
+    return update_params(params, {'attributes': ','.join(fields)})
+
+
 def normalize_object(ret):
     '''Returns a single object'''
     return ret if not isinstance(ret, list) else ret[0]
@@ -25,61 +60,625 @@ def normalize_collection(ret):
     return ret if isinstance(ret, list) else [ret]
 
 
+def normalize_result(method, obj):
+    '''Returns the part of a decoded response the consumer cares about'''
+    # With an API design rich in unnecessary complexities, we find
+    # ourselves in need of a post-processor to ensure we return the
+    # correct object to the consumer. Inconsistent API returns need
+    # to be killed with fiya. </rant>
+    if method == 'post':
+        ret = obj.get('results')
+    else:
+        ret = obj.get('resources')
+    # Fall back to returning the entire result if we couldn't
+    # adequately guess what the API arbitrarily felt like returning.
+    return ret if ret is not None else obj
+
+
+def id_filter(ids):
+    '''Returns filter[] expressions matching any of the given IDs'''
+    return ['%sid=%s' % ('or ' if idx else '', _id)
+            for idx, _id in enumerate(ids)]
+
+
+def chunked(items, size):
+    '''Splits an iterable into lists of (at most) size items'''
+    chunk = list()
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = list()
+    if chunk:
+        yield chunk
+
+
+def post_resources(client, collection, action, resources):
+    '''Sends one collection-level action POST for a batch of resources
+
+    A failed request (HTTP error, connection error, short response) is
+    reported as a failed result for each resource it did not answer for
+    rather than raised (with the HTTP status, for HTTP errors).
+
+    :param Cloudforms.API.Client client: an API client instance
+    :param string collection: collection name (ex. vms)
+    :param string action: The action to request (start, assign_tags, etc.)
+    :param list resources: per-resource POST request data (each with
+                           the resource's href)
+    :returns: List of result dictionaries, one per resource (in order)
+    '''
+    try:
+        ret = client.call('post', '/%s' % collection, data={
+            'action': action,
+            'resources': resources
+        })
+        ret = ret if isinstance(ret, list) else list()
+        failure = {'message': 'No result returned for resource'}
+    except (CloudformsError, RequestException) as err:
+        ret, failure = list(), request_failure(err)
+    # Report every resource the appliance did not answer for
+    return ret[:len(resources)] + [
+        dict(failure, success=False, href=resource.get('href'))
+        for resource in resources[len(ret):]]
+
+
+def request_failure(err):
+    '''Returns the failed result reported for the resources of a
+    request that raised err (see post_resources)'''
+    if isinstance(err, CloudformsHTTPError):
+        return {'message': str(err), 'status': err.faultCode}
+    return {'message': str(err)}
+
+
+def permanent_failure(result):
+    '''Returns True if a failed action result would fail again if sent
+    again: the request was rejected (4xx status, other than 408 and
+    429) or the appliance reported the resource missing or the request
+    invalid (see PERMANENT_MESSAGES)'''
+    status = result.get('status')
+    if status is not None:
+        return 400 <= status < 500 and status not in (408, 429)
+    message = str(result.get('message') or '').lower()
+    return any(text in message for text in PERMANENT_MESSAGES)
+
+
+def perform_action_many(client, collection, ids, action, params=None,
+                        batch_size=None):
+    '''Performs an action on many resources using collection-level POSTs
+
+    A failed batch (HTTP error, connection error, short response) is
+    reported as a failed result for each resource in that batch rather
+    than raised, so one bad batch does not hide the others' results.
+
+    :param Cloudforms.API.Client client: an API client instance
+    :param string collection: collection name (ex. vms)
+    :param list ids: IDs of the resources to act on
+    :param string action: The action to request (start, stop, etc.)
+    :param dict params: Additional per-resource POST request data
+    :param integer batch_size: number of resources per request
+    :returns: List of result dictionaries, in the same order as ids
+    '''
+    results = list()
+    for chunk in chunked(ids, batch_size or DEFAULT_BATCH_SIZE):
+        results.extend(post_resources(client, collection, action, [
+            update_params(params, {
+                'href': '%s/%s/%s' % (client.base_url, collection, _id)
+            }) for _id in chunk]))
+    return results
+
+
+def id_params(params, ids):
+    '''Returns params for a collection query of the given IDs (making
+    sure IDs are returned when only some attributes are asked for)'''
+    params = update_params(params, {
+        'expand': 'resources',
+        'filter[]': id_filter(ids)
+    })
+    attributes = params.get('attributes')
+    if attributes and 'id' not in attributes.split(','):
+        params['attributes'] = '%s,id' % attributes
+    return params
+
+
+def query_resources(client, collection, ids):
+    '''Returns the POST request data of a query action on the given IDs'''
+    return {
+        'action': 'query',
+        'resources': [{
+            'href': '%s/%s/%s' % (client.base_url, collection, _id)
+        } for _id in ids]
+    }
+
+
+def changes_collection(method, data):
+    '''Returns whether a call may change its collection (query actions
+    only read resources, so they do not)'''
+    return method != 'get' and not (
+        isinstance(data, dict) and data.get('action') == 'query')
+
+
+def index_resources(ids, resources):
+    '''Returns resources in the order of ids (None for those missing)'''
+    found = dict()
+    for resource in resources if isinstance(resources, list) else list():
+        if isinstance(resource, dict) and resource.get('id') is not None \
+           and resource.get('success', True):
+            found[str(resource['id'])] = resource
+    return [found.get(str(_id)) for _id in ids]
+
+
+# pylint: disable=too-many-arguments
+def get_many(client, collection, ids, params=None, batch_size=None,
+             query=False):
+    '''Fetches many resources by ID, batch_size per request
+
+    Each batch is a single collection query: a GET filtered by ID, or
+    (with query set) a query action POST, which keeps URLs short.
+
+    :param Cloudforms.API.Client client: an API client instance
+    :param string collection: collection name (ex. vms)
+    :param list ids: IDs of the resources to fetch
+    :param dict params: response-level options (attributes, etc.)
+    :param integer batch_size: number of resources per request
+    :param bool query: use query action POSTs instead of filtered GETs
+    :returns: List of resources, in the same order as ids (None for IDs
+              that were not found)
+    '''
+    unique = sorted(set(str(_id) for _id in ids))
+    resources = list()
+    for chunk in chunked(unique, batch_size or DEFAULT_BATCH_SIZE):
+        if query:
+            resources.extend(client.call(
+                'post', '/%s' % collection, params=params,
+                data=query_resources(client, collection, chunk)) or list())
+        else:
+            resources.extend(client.call(
+                'get', '/%s' % collection,
+                params=id_params(params, chunk)) or list())
+    return index_resources(ids, resources)
+
+
+# pylint: disable=too-many-arguments
+def get_page(client, path, params, offset, limit, stream=False):
+    '''Returns a single offset/limit page of a collection
+
+    With stream set the page is returned as a generator instead.
+    '''
+    page = client.call('get', path, stream=stream,
+                       params=update_params(params, {
+                           'offset': offset,
+                           'limit': limit
+                       }))
+    if stream:
+        return page
+    # An exhausted collection returns an empty list of resources
+    return page if isinstance(page, list) else list()
+
+
+# pylint: disable=too-many-arguments
+def iter_collection(client, path, params=None, page_size=None,
+                    workers=None, stream=False):
+    '''Lazily walks a collection one offset/limit page at a time
+
+    If workers is set, the total is read from the first page and
+    the remaining pages are prefetched concurrently (at most workers
+    requests in flight). Resources are yielded in collection order
+    either way. Pages the appliance returns shorter than page_size
+    (it caps limit at its max_results_per_page) do not end the walk.
+
+    If stream is set, each page is decoded as it downloads (see
+    :meth:`CloudformsBase.call`), without page_size the collection is
+    then streamed in a single request. Prefetched pages (workers) are
+    always decoded whole.
+
+    :param Cloudforms.API.Client client: an API client instance
+    :param string path: collection path (ex. /vms)
+    :param dict params: response-level options (attributes, etc.)
+    :param integer page_size: number of resources fetched per request
+    :param integer workers: number of pages to fetch concurrently
+    :param bool stream: decode pages as they download
+    :returns: Generator yielding one resource at a time
+    '''
+    if stream and not (page_size or workers):
+        return client.call('get', path, params=params, stream=True)
+    page_size = page_size or DEFAULT_PAGE_SIZE
+    if workers:
+        return _prefetch_collection(client, path, params, page_size, workers)
+    return _walk_collection(client, path, params, page_size, stream)
+
+
+def collection_total(page):
+    '''Returns the number of resources a collection query matches, as
+    reported by one of its (raw) pages (None if it does not tell)'''
+    # subquery_count is the filtered total (API v2.3+), count is not
+    return page.get('subquery_count', page.get('count')) \
+        if isinstance(page, dict) else None
+
+
+def _walk_collection(client, path, params, page_size, stream=False,
+                     offset=0):
+    '''Fetches pages one after another
+
+    The appliance may return fewer resources than asked for (limit is
+    capped by its max_results_per_page), so the offset moves on by the
+    number of resources actually returned. The walk ends on an empty
+    page, or once the reported total is reached.
+    '''
+    while True:
+        total = None
+        if stream:
+            count = 0
+            for resource in get_page(client, path, params, offset,
+                                     page_size, stream):
+                count += 1
+                yield resource
+        else:
+            page = client.call('get', path, raw=True,
+                               params=update_params(params, {
+                                   'offset': offset,
+                                   'limit': page_size
+                               }))
+            resources = page.get('resources') or list() \
+                if isinstance(page, dict) else list()
+            for resource in resources:
+                yield resource
+            count, total = len(resources), collection_total(page)
+        if not count:
+            return
+        offset += count
+        if total is not None and offset >= total:
+            return
+
+
+def _prefetch_collection(client, path, params, page_size, workers):
+    '''Fetches the first page, then the rest on a bounded worker pool'''
+    first = client.call('get', path, raw=True,
+                        params=update_params(params, {
+                            'offset': 0,
+                            'limit': page_size
+                        }))
+    page = first.get('resources') or list()
+    for resource in page:
+        yield resource
+    total = collection_total(first)
+    if not page or (total is not None and len(page) >= total):
+        return
+    if total is None:
+        for resource in _walk_collection(client, path, params, page_size,
+                                         offset=len(page)):
+            yield resource
+        return
+    # Pages are as long as the first one: the appliance may have capped
+    # it (max_results_per_page), asking for more would leave gaps
+    stride = len(page)
+    offsets = iter(range(stride, total, stride))
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def submit_next():
+            '''Queues up the next page (if any are left)'''
+            offset = next(offsets, None)
+            if offset is not None:
+                pending.append(pool.submit(
+                    get_page, client, path, params, offset, stride))
+        # Keep a bounded window of pages queued so memory stays bounded
+        for _ in range(workers * 2):
+            submit_next()
+        while pending:
+            page = pending.popleft().result()
+            submit_next()
+            for resource in page:
+                yield resource
+
+
 # pylint: disable=too-few-public-methods
 class CloudformsBase(object):
-    '''Base class that all other classes inherit from'''
-    def __init__(self, endpoint, logger=None):
+    '''Base class that all other classes inherit from
+
+    Requests are sent by a transport (see :mod:`Cloudforms.transport`),
+    by default over HTTP/1.1 connections kept alive and pooled between
+    threads (see :class:`Cloudforms.transport.RequestsTransport`, the
+    pool options are its own).
+
+    :param CloudformsEndpoint endpoint: the appliance to talk to
+    :param logger: a logger-like object (optional)
+    :param integer pool_connections: number of host pools to cache
+    :param integer pool_maxsize: max connections kept open per host
+    :param bool pool_block: block (instead of opening throw-away
+                            connections) when a host pool is exhausted
+    :param bool keep_alive: reuse connections between calls
+    :param Cloudforms.cache.ResponseCache cache: cache for GET results
+    :param decoder: JSON decoder name or function
+                    (see :func:`Cloudforms.decoders.get_decoder`)
+    :param Cloudforms.retry.RetryPolicy retry: retry policy for failed
+                                               calls (disabled by default)
+    :param Cloudforms.retry.CircuitBreaker breaker: circuit breaker for
+                                                    the appliance
+    :param Cloudforms.limiter.RateLimiter limiter: rate / concurrency
+                                                   limits for the appliance
+    :param list hooks: functions called with a
+                       :class:`Cloudforms.metrics.CallInfo` after every
+                       call (ex. a MetricsCollector)
+    :param Cloudforms.cache.SingleFlight coalesce: shares calls in
+                                                   progress between
+                                                   identical reads
+    :param Cloudforms.transport.Transport transport: sends the requests
+                                                     (ex. an
+                                                     HTTP2Transport)
+    '''
+    # pylint: disable=too-many-arguments
+    def __init__(self, endpoint, logger=None,
+                 pool_connections=10, pool_maxsize=10,
+                 pool_block=False, keep_alive=True, cache=None,
+                 decoder=None, retry=None, breaker=None, limiter=None,
+                 hooks=None, coalesce=None, transport=None):
         self.endpoint = endpoint
         self.log = logger
+        self.cache = cache
+        self.coalesce = coalesce
+        self.decoder = get_decoder(decoder)
+        self.retry = retry
+        self.breaker = breaker
+        self.limiter = limiter
+        self.hooks = list(hooks or [])
+        if breaker is not None and breaker.name is None:
+            breaker.name = endpoint.host
+        self.transport = transport if transport is not None else \
+            RequestsTransport(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block,
+                              keep_alive=keep_alive)
+        self.auth = (endpoint.username, endpoint.password)
+
+    @property
+    def base_url(self):
+        '''Returns the API base URL for the endpoint'''
+        return '%s://%s/api' % (
+            'https' if self.endpoint.secure else 'http',
+            self.endpoint.host)
+
+    def close(self):
+        '''Closes all of the transport's connections'''
+        self.transport.close()
 
-    def call(self, method, path, data=None, params=None):
-        '''Makes an API call'''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # pylint: disable=too-many-arguments
+    def call(self, method, path, data=None, params=None, raw=False,
+             stream=False, cache=True):
+        '''Makes an API call
+
+        :param string method: HTTP method (get, post, etc.)
+        :param string path: API path (ex. /vms)
+        :param dict data: JSON request body
+        :param dict params: URL query parameters
+        :param bool raw: return the decoded response as-is instead of
+                         just its results / resources
+        :param bool stream: (GET of a collection only) return a generator
+                            yielding each resource as soon as it has been
+                            downloaded, instead of waiting for the whole
+                            body. Streamed responses bypass the cache and
+                            hold their connection until fully consumed.
+        :param bool cache: (GET only) answer from, and store in, the
+                           client's cache; set to False to get the current
+                           state from the appliance (ex. when polling)
+
+        Example::
+
+            for vm in client.call('get', '/vms', stream=True,
+                                  params={'expand': 'resources'}):
+                print(vm['name'])
+        '''
         # Normalize the method name for later string comparison
         method = method.lower()
+        if not self.hooks:
+            return self._dispatch(method, path, data, params, raw, stream,
+                                  cache)
+        info = CallInfo(method, path)
+        start = monotonic()
+        try:
+            return self._dispatch(method, path, data, params, raw, stream,
+                                  cache, info)
+        except Exception as err:
+            info.error = err.__class__.__name__
+            raise
+        finally:
+            info.timings['total'] = monotonic() - start
+            self._report(info)
+
+    # pylint: disable=too-many-arguments
+    def _dispatch(self, method, path, data, params, raw, stream,
+                  cache=True, info=None):
+        '''Makes an API call (sharing an identical call in progress, if
+        coalescing is enabled)'''
+        if stream:
+            return self._stream(method, path, data, params, raw, info)
+        # Writes always go through the cache (they invalidate it)
+        send = self._cached if cache or method != 'get' else self._call
+        if self.coalesce is not None and data is None and \
+           method in self.coalesce.methods:
+            # The leader's CallInfo goes along, for the others to report
+            (ret, leader), shared = self.coalesce.do(
+                self.coalesce.key(method, path, params, raw) + (cache,),
+                lambda: (send(method, path, data, params, raw, info), info))
+            if shared and info:
+                info.share(leader)
+            return ret
+        return send(method, path, data, params, raw, info)
+
+    # pylint: disable=too-many-arguments
+    def _cached(self, method, path, data, params, raw, info=None):
+        '''Makes an API call (through the cache, if there is one)'''
+        if self.cache is None:
+            return self._call(method, path, data, params, raw, info)
+        if changes_collection(method, data):
+            try:
+                return self._call(method, path, data, params, raw, info)
+            finally:
+                self.cache.invalidate(path)
+        if method != 'get':
+            return self._call(method, path, data, params, raw, info)
+        key = self.cache.key(method, path, params, raw)
+        ret = self.cache.get(key)
+        if ret is not None:
+            if info:
+                # Only successful reads are cached
+                info.cached, info.status = True, 200
+            return ret
+        # Revalidate a stale copy (if we have one) instead of refetching
+        res = self._request(method, path, data, params,
+                            headers=self.cache.validators(key), info=info)
+        if res.status_code == 304:
+            ret = self.cache.revalidated(key)
+            if ret is not None:
+                if info:
+                    info.cached = True
+                return ret
+            res = self._request(method, path, data, params, info=info)
+        ret = self._result(method, path, res, raw, info)
+        self.cache.set(key, ret, res.headers)
+        return ret
+
+    def _report(self, info):
+        '''Hands a call's CallInfo to every hook'''
+        for hook in self.hooks:
+            try:
+                hook(info)
+            # pylint: disable=broad-except
+            except Exception as err:
+                # Instrumentation must never break API calls
+                if self.log:
+                    self.log.error('Metrics hook failed: %s', err)
+
+    # pylint: disable=too-many-arguments
+    def _call(self, method, path, data, params, raw, info=None):
+        '''Makes an API call (bypassing the cache)'''
+        return self._result(method, path, self._request(
+            method, path, data, params, info=info), raw, info)
+
+    # pylint: disable=too-many-arguments
+    def _stream(self, method, path, data, params, raw, info=None):
+        '''Makes an API call, returns a generator over its resources'''
+        if method != 'get' or raw:
+            raise CloudformsError('Only (non-raw) GET responses '
+                                  'can be streamed')
+        # Send the request now so errors are raised here rather than
+        # on the first iteration
+        res = self._request(method, path, data, params, stream=True,
+                            info=info)
+
+        def resources():
+            '''Yields resources as they are decoded'''
+            try:
+                for resource in iter_resources(
+                        res.iter_content(STREAM_CHUNK_SIZE)):
+                    yield resource
+            finally:
+                res.close()
+        return resources()
+
+    # pylint: disable=too-many-arguments
+    def _request(self, method, path, data, params, headers=None,
+                 stream=False, info=None):
+        '''Sends a request (retrying it if need be) and checks the
+        response status
+
+        A 304 (Not Modified) status is only accepted for conditional
+        requests (when headers carry If-None-Match / If-Modified-Since).
+        '''
         # Log our API call
         if self.log:
-            self.log.info('API Call: [%s] %s://%s/api%s [%s]' % (
-                method,
-                'https' if self.endpoint.secure else 'http',
-                self.endpoint.host,
-                path,
-                data
-            ))
-        # Make the API call
-        res = request(
-            method,
-            '%s://%s/api%s' % (
-                'https' if self.endpoint.secure else 'http',
-                self.endpoint.host, path
-            ),
-            auth=(self.endpoint.username, self.endpoint.password),
-            headers=self.endpoint.headers,
-            json=data,
-            params=params,
-            verify=False)
-        # If the call was rejected, return None
-        if res.status_code not in [200, 201]:
+            log_payload(self.log, 'API Call', method,
+                        '%s%s' % (self.base_url, path), data)
+        attempt = self.retry.attempt(method) if self.retry else None
+        while True:
+            try:
+                res = self._send(method, path, data, params, headers, stream,
+                                 info)
+            except self.transport.errors:
+                delay = attempt.delay() if attempt else None
+                if delay is None:
+                    raise
+            else:
+                delay = attempt.delay(res.headers.get('Retry-After')) \
+                    if attempt and res.status_code in self.retry.statuses \
+                    else None
+                if delay is None:
+                    break
+                res.close()
+            if self.log:
+                self.log.info('API Retry: [%s] %s%s in %.2fs', method,
+                              self.base_url, path, delay)
+            if info:
+                info.add('retry_wait', delay)
+            time.sleep(delay)
+        if info:
+            info.status = res.status_code
+            info.retries = attempt.retries if attempt else 0
+        # If the call was rejected, raise an error
+        if res.status_code not in [200, 201] and \
+           not (headers and res.status_code == 304):
+            res.close()
             raise CloudformsHTTPError(res.status_code, res.reason)
+        return res
+
+    # pylint: disable=too-many-arguments
+    def _send(self, method, path, data, params, headers, stream,
+              info=None):
+        '''Sends a request once (if the circuit breaker allows it), as
+        soon as the rate limiter allows it'''
+        if self.breaker is not None:
+            self.breaker.before()
+        if self.limiter is not None:
+            waited = self.limiter.acquire()
+            if info:
+                info.add('queue', waited)
+        start = monotonic() if info else None
+        try:
+            res = self.transport.request(
+                method,
+                '%s%s' % (self.base_url, path),
+                auth=self.auth,
+                json=data,
+                params=params,
+                headers=dict(self.endpoint.headers or dict(), **headers)
+                if headers else self.endpoint.headers,
+                stream=stream)
+        except self.transport.errors:
+            if self.breaker is not None:
+                self.breaker.failure()
+            raise
+        finally:
+            if self.limiter is not None:
+                self.limiter.release()
+        if info:
+            # Time to headers, the rest was spent reading the body
+            server = res.elapsed.total_seconds()
+            info.add('server', server)
+            info.add('transfer', max(0.0, monotonic() - start - server))
+        if self.breaker is not None:
+            self.breaker.record(res.status_code)
+        return res
+
+    # pylint: disable=too-many-arguments
+    def _result(self, method, path, res, raw, info=None):
+        '''Decodes a response into what the consumer cares about'''
         # Get a proper return object
-        obj = res.json()
-        # With an API design rich in unnecessary complexities, we find
-        # ourselves in need of a post-processor to ensure we return the
-        # correct object to the consumer. Inconsistent API returns need
-        # to be killed with fiya. </rant>
-        if method == 'post':
-            ret = obj.get('results')
+        if info:
+            start = monotonic()
+            obj = self.decoder(res.content)
+            info.add('decode', monotonic() - start)
+            info.bytes = len(res.content)
         else:
-            ret = obj.get('resources')
-        # Fall back to returning the entire result if we couldn't
-        # adequately guess what the API arbitrarily felt like returning.
-        ret = ret if ret is not None else obj
+            obj = self.decoder(res.content)
+        if raw:
+            return obj
+        ret = normalize_result(method, obj)
         # Log our API result
         if self.log:
-            self.log.info('API Result: [%s] %s://%s/api%s [%s]' % (
-                method,
-                'https' if self.endpoint.secure else 'http',
-                self.endpoint.host,
-                path,
-                ret
-            ))
+            log_payload(self.log, 'API Result', method,
+                        '%s%s' % (self.base_url, path), ret, len(res.content))
         return ret
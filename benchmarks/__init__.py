@@ -0,0 +1 @@
+'''Cloudforms - Benchmarks (run against a local stub API server)'''
@@ -0,0 +1,80 @@
+'''
+    benchmarks.bench_decode
+    ~~~~~~~~~~~~~~~~~~~~~~~
+    Decoding time of large collection responses, whole body (per JSON
+    decoder) vs. streaming (resource by resource)
+
+    Usage::
+
+        python -m benchmarks.bench_decode [--vms N] [--repeat N]
+                                          [--response FILE ...]
+
+    Responses can be recorded from an appliance with, for example,
+    curl -k -u admin:smartvm 'https://HOST/api/vms?expand=resources'
+
+    :license: MIT, see LICENSE for more details.
+'''
+from __future__ import print_function
+import argparse
+import json
+import timeit
+from Cloudforms.decoders import DECODERS, get_decoder, iter_resources
+from Cloudforms.exceptions import CloudformsError
+from benchmarks.stub_server import make_vm
+
+CHUNK_SIZE = 65536
+
+
+def make_response(count):
+    '''Returns the body of a fake /vms?expand=resources response'''
+    return json.dumps({
+        'name': 'vms',
+        'count': count,
+        'subcount': count,
+        'resources': [make_vm(i) for i in range(count)]
+    }).encode('utf-8')
+
+
+def chunks(body):
+    '''Splits a body the way a streamed response would arrive'''
+    return [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)]
+
+
+def report(name, func, repeat):
+    '''Prints the best of repeat timings (milliseconds)'''
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print('  %-8s %8.1fms' % (name, 1000 * best))
+
+
+def main():
+    '''Runs the benchmark'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vms', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--response', action='append', default=[],
+                        help='recorded response body (repeatable)')
+    args = parser.parse_args()
+
+    bodies = list()
+    for path in args.response:
+        with open(path, 'rb') as body:
+            bodies.append((path, body.read()))
+    if not bodies:
+        bodies.append(('%d vms' % args.vms, make_response(args.vms)))
+
+    for label, body in bodies:
+        print('%s (%.1f MB)' % (label, len(body) / 1048576.0))
+        parts = chunks(body)
+        for name in DECODERS:
+            try:
+                loads = get_decoder(name)
+            except CloudformsError:
+                print('  %-8s not installed' % name)
+                continue
+            report(name, lambda: loads(body), args.repeat)
+        report('stream', lambda: sum(1 for _ in iter_resources(parts)),
+               args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+'''
+    benchmarks.bench_session
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+    Per-call latency: one connection per call vs. the pooled session
+
+    Usage::
+
+        python -m benchmarks.bench_session [--calls N] [--certfile PEM
+                                            --keyfile PEM]
+
+    :license: MIT, see LICENSE for more details.
+'''
+from __future__ import print_function
+import argparse
+import timeit
+import warnings
+import requests
+import Cloudforms
+from benchmarks.stub_server import StubServer
+
+
+def unpooled_call(client, path):
+    '''The pre-pooling code path (module-level requests.request)'''
+    return requests.request(
+        'get', '%s%s' % (client.base_url, path),
+        auth=(client.endpoint.username, client.endpoint.password),
+        headers=client.endpoint.headers,
+        verify=False).json().get('resources')
+
+
+def report(name, timings):
+    '''Prints latency statistics (milliseconds)'''
+    timings = sorted(timings)
+    print('%-10s mean %7.3fms  p50 %7.3fms  p99 %7.3fms' % (
+        name,
+        1000 * sum(timings) / len(timings),
+        1000 * timings[len(timings) // 2],
+        1000 * timings[int(len(timings) * 0.99)]))
+
+
+def main():
+    '''Runs the benchmark'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--certfile')
+    parser.add_argument('--keyfile')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    server = StubServer(certfile=args.certfile, keyfile=args.keyfile).start()
+    client = Cloudforms.Client(host=server.host, secure_host=server.secure)
+    try:
+        for name, func in [
+                ('unpooled', lambda: unpooled_call(client, '/vms')),
+                ('pooled', lambda: client.call('get', '/vms'))]:
+            func()
+            report(name, timeit.repeat(func, number=1, repeat=args.calls))
+    finally:
+        client.close()
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
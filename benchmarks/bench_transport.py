@@ -0,0 +1,94 @@
+'''
+    benchmarks.bench_transport
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+    Concurrent calls: pooled HTTP/1.1 connections vs. HTTP/2 streams
+    multiplexed over one connection (against a local h2 stub server)
+
+    Usage::
+
+        python -m benchmarks.bench_transport [--calls N] [--latency S]
+                                             [--concurrency N ...]
+                                             [--certfile PEM --keyfile PEM]
+
+    Requires Cloudforms[http2].
+
+    :license: MIT, see LICENSE for more details.
+'''
+from __future__ import print_function
+import argparse
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import Cloudforms
+from Cloudforms.transport import HTTP2Transport, RequestsTransport
+from benchmarks.h2_stub_server import H2StubServer
+
+#: Transports compared, by name
+TRANSPORTS = [
+    ('http1', RequestsTransport),
+    ('http2', HTTP2Transport)
+]
+
+
+def timed_call(client):
+    '''Makes a small GET, returns how long it took (seconds)'''
+    start = time.time()
+    client.call('get', '/vms/1')
+    return time.time() - start
+
+
+def run(server, transport, calls, concurrency):
+    '''Makes calls from concurrency threads, returns the wall time,
+    per-call timings and number of connections opened'''
+    client = Cloudforms.Client(host=server.host, secure_host=server.secure,
+                               transport=transport)
+    try:
+        # Warm up (and open) the connection(s)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: timed_call(client), range(concurrency)))
+        connections = server.connections
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            timings = list(pool.map(lambda _: timed_call(client),
+                                    range(calls)))
+        elapsed = time.time() - start
+        return elapsed, sorted(timings), server.connections - connections
+    finally:
+        client.close()
+
+
+def main():
+    '''Runs the benchmark'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='server latency per call (seconds)')
+    parser.add_argument('--concurrency', type=int, action='append',
+                        help='threads making calls (default: 1, 16, 64)')
+    parser.add_argument('--certfile')
+    parser.add_argument('--keyfile')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    print('%-6s %8s %10s %10s %10s %8s %8s' % (
+        'proto', 'threads', 'calls/s', 'p50 ms', 'p99 ms', 'conns',
+        'new'))
+    for concurrency in args.concurrency or [1, 16, 64]:
+        for name, transport_class in TRANSPORTS:
+            server = H2StubServer(latency=args.latency,
+                                  certfile=args.certfile,
+                                  keyfile=args.keyfile).start()
+            try:
+                elapsed, timings, new = run(server, transport_class(),
+                                            args.calls, concurrency)
+            finally:
+                server.stop()
+            print('%-6s %8d %10.1f %10.2f %10.2f %8d %8d' % (
+                name, concurrency, args.calls / elapsed,
+                1000 * timings[len(timings) // 2],
+                1000 * timings[int(len(timings) * 0.99)],
+                server.connections, new))
+
+
+if __name__ == '__main__':
+    main()
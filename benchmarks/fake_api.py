@@ -0,0 +1,512 @@
+'''
+    benchmarks.fake_api
+    ~~~~~~~~~~~~~~~~~~~
+    Stateful local stand-in for the Cloudforms REST API
+
+    Serves /api/vms, /api/providers, /api/tags, /api/tasks and
+    /api/provision_requests (offset / limit paging, expand, attributes
+    filters, sort_by), resource and collection action POSTs (which start
+    tasks finishing after task_duration seconds), query actions,
+    provision requests and tag (un)assignment, with configurable latency,
+    payload sizes, error rates and (optional) ETag revalidation.
+
+    Usage::
+
+        python -m benchmarks.fake_api [--port N] [--vms N] [--padding N]
+                                      [--latency S] [--error-rate R] ...
+
+    :license: MIT, see LICENSE for more details.
+'''
+from __future__ import print_function
+import argparse
+import hashlib
+import json
+import operator
+import random
+import re
+import sys
+import threading
+import time
+from benchmarks.stub_server import make_vm
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qs
+except ImportError:  # pragma: no cover (Python 2)
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qs
+
+#: Collections served (tasks and provision requests start out empty)
+COLLECTIONS = ('vms', 'providers', 'tags', 'tasks', 'provision_requests')
+
+# A filter[] expression: "[or ]attr<op>value"
+_FILTER = re.compile(r'^(or )?\s*([\w.]+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$')
+_OPERATORS = {'=': operator.eq, '!=': operator.ne, '>': operator.gt,
+              '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+
+def sort_key(value):
+    '''Returns a key comparing numbers as numbers, anything else as text'''
+    try:
+        return (0, float(value), '')
+    except (TypeError, ValueError):
+        return (1, 0.0, str(value))
+
+
+def make_provider(_id):
+    '''Returns a fake provider resource'''
+    return {
+        'id': str(_id),
+        'href': '/api/providers/%s' % _id,
+        'name': 'provider-%03d' % _id,
+        'type': 'ManageIQ::Providers::Amazon::CloudManager',
+        'provider_region': 'us-east-1',
+        'updated_on': '2016-01-01T00:00:00Z'
+    }
+
+
+def make_tag(_id):
+    '''Returns a fake tag resource'''
+    return {
+        'id': str(_id),
+        'href': '/api/tags/%s' % _id,
+        'name': '/managed/environment/env-%03d' % _id
+    }
+
+
+class Collection(object):
+    '''Resources of one collection (with their JSON encoding cached)'''
+    def __init__(self, name, resources=None):
+        self.name = name
+        self.resources = list()
+        self.encoded = list()
+        self.index = dict()
+        for resource in resources or list():
+            self.add(resource)
+
+    def add(self, resource):
+        '''Appends a resource'''
+        self.index[resource['id']] = len(self.resources)
+        self.resources.append(resource)
+        self.encoded.append(json.dumps(resource))
+
+    def get(self, _id):
+        '''Returns a resource by ID (or None)'''
+        idx = self.index.get(str(_id))
+        return None if idx is None else self.resources[idx]
+
+    def select(self, filters):
+        '''Returns the positions of the resources matching filter[]
+        expressions ("[or ]attr<op>value", op being one of =, !=, >, >=,
+        < or <=)'''
+        if not filters:
+            return range(len(self.resources))
+        exprs = list()
+        for expr in filters:
+            match = _FILTER.match(expr)
+            if match is None:
+                continue
+            either, attr, oper, value = match.groups()
+            exprs.append((bool(either), attr, oper, value))
+        if all(attr == 'id' and oper == '=' and (either or not idx)
+               for idx, (either, attr, oper, _) in enumerate(exprs)):
+            # ID lookups (the common case) skip the collection scan
+            found = (self.index.get(value) for _, _, _, value in exprs)
+            return sorted(set(idx for idx in found if idx is not None))
+        selected = list()
+        for idx, resource in enumerate(self.resources):
+            match = None
+            for either, attr, oper, value in exprs:
+                hit = str(resource.get(attr)) == value if oper == '=' \
+                    else _OPERATORS[oper](sort_key(resource.get(attr)),
+                                          sort_key(value))
+                match = hit if match is None else \
+                    (match or hit) if either else (match and hit)
+            if match:
+                selected.append(idx)
+        return selected
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    '''Answers API calls from the server's in-memory state'''
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, headers=None):
+        self._send(status, json.dumps({'error': {
+            'kind': 'error', 'message': message}}), headers)
+
+    def _route(self):
+        '''Applies latency and error injection, splits the URL
+
+        :returns: Tuple of (path segments, query), or None if the call
+                  was failed on purpose
+        '''
+        server = self.server
+        server.count(self.command)
+        if server.latency or server.jitter:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+        if server.error_rate and random.random() < server.error_rate:
+            self._error(503, 'Injected failure', {
+                'Retry-After': str(server.retry_after)
+            } if server.retry_after is not None else None)
+            return None
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        if parts[:1] == ['api']:
+            parts = parts[1:]
+        if not parts or parts[0] not in server.collections:
+            self._error(404, 'Unknown path %s' % url.path)
+            return None
+        return parts, parse_qs(url.query)
+
+    # pylint: disable=invalid-name
+    def do_GET(self):
+        '''Returns a collection, a resource or a resource's tags'''
+        route = self._route()
+        if route is None:
+            return
+        parts, query = route
+        server = self.server
+        collection = server.collections[parts[0]]
+        if len(parts) == 1:
+            self._send_current(server.page(collection, query))
+            return
+        resource = server.resource(collection, parts[1])
+        if resource is None:
+            self._error(404, "Couldn't find %s with 'id'=%s" % tuple(parts))
+        elif len(parts) == 3 and parts[2] == 'tags':
+            tags = server.resource_tags(parts[0], parts[1])
+            self._send_current(json.dumps({
+                'name': 'tags', 'count': len(tags), 'subcount': len(tags),
+                'resources': tags}))
+        else:
+            self._send_current(json.dumps(
+                server.select_attributes(resource, query)))
+
+    def _send_current(self, body):
+        '''Sends a GET's body, or a 304 if the client's copy (ETag) is
+        still current'''
+        if not self.server.etags:
+            self._send(200, body)
+            return
+        etag = '"%s"' % hashlib.md5(body.encode('utf-8')).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            with self.server.lock:
+                self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._send(200, body, {'ETag': etag})
+
+    # pylint: disable=invalid-name
+    def do_POST(self):
+        '''Performs an action on a collection, a resource or its tags'''
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        route = self._route()
+        if route is None:
+            return
+        parts, _ = route
+        try:
+            data = json.loads(body.decode('utf-8')) if body else dict()
+        except ValueError:
+            self._error(400, 'Invalid JSON body')
+            return
+        server = self.server
+        action = data.get('action')
+        if len(parts) == 1:
+            results = [server.action(parts[0], action, resource)
+                       for resource in data.get('resources') or [data]]
+            self._send(200, json.dumps({'results': results}))
+        elif len(parts) == 3 and parts[2] == 'tags':
+            self._send(200, json.dumps({'results': [
+                server.tag_action(parts[0], parts[1], action, resource)
+                for resource in data.get('resources') or list()]}))
+        else:
+            self._send(200, json.dumps(server.action(
+                parts[0], action, dict(data, href='/api/%s/%s' % (
+                    parts[0], parts[1])))))
+
+
+class FakeApiServer(ThreadingMixIn, HTTPServer):
+    '''Threaded fake API server
+
+    :param integer port: port to listen on (0 picks a free port)
+    :param integer vms: number of virtual servers
+    :param integer providers: number of providers
+    :param integer tags: number of tags
+    :param integer padding: extra bytes added to every virtual server
+                            (to simulate larger payloads)
+    :param float latency: seconds added to every response
+    :param float jitter: up to this many more seconds (uniform)
+    :param float error_rate: fraction of calls answered with a 503
+    :param integer retry_after: Retry-After sent with 503s (None: none)
+    :param float task_duration: seconds until tasks and provision
+                                requests finish
+    :param integer region: region number (IDs start at region * 10**12)
+    :param bool etags: send ETags with GET responses, and answer
+                       If-None-Match with a 304 while they still match
+    :param integer max_results: max resources per collection response,
+                                whatever the limit asked for (as the
+                                appliance's max_results_per_page)
+
+    Example::
+
+        server = FakeApiServer(vms=10000, latency=0.01).start()
+        client = Cloudforms.Client(host=server.host, secure_host=False)
+        ...
+        server.stop()
+    '''
+    daemon_threads = True
+    request_queue_size = 128
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, port=0, vms=1000, providers=10, tags=50, padding=0,
+                 latency=0.0, jitter=0.0, error_rate=0.0, retry_after=None,
+                 task_duration=1.0, region=0, etags=False,
+                 max_results=None):
+        HTTPServer.__init__(self, ('127.0.0.1', port), FakeHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.task_duration = task_duration
+        self.etags = etags
+        self.max_results = max_results
+        self.not_modified = 0
+        self.id_base = region * 10 ** 12
+        self.requests = dict()
+        self.tags = dict()
+        self.started = dict()
+        self.lock = threading.Lock()
+        self.collections = dict(
+            (name, Collection(name)) for name in COLLECTIONS)
+        for _id in range(self.id_base + 1, self.id_base + vms + 1):
+            resource = make_vm(_id)
+            if padding:
+                resource['description'] = 'x' * padding
+            self.collections['vms'].add(resource)
+        for _id in range(self.id_base + 1, self.id_base + providers + 1):
+            self.collections['providers'].add(make_provider(_id))
+        for _id in range(self.id_base + 1, self.id_base + tags + 1):
+            self.collections['tags'].add(make_tag(_id))
+        self.thread = None
+
+    @property
+    def host(self):
+        '''Returns host:port the server listens on'''
+        return '%s:%s' % self.server_address[:2]
+
+    def count(self, method):
+        '''Counts a request (see requests)'''
+        with self.lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+
+    def resource(self, collection, _id):
+        '''Returns a resource (tasks and requests with current state)'''
+        with self.lock:
+            resource = collection.get(_id)
+            if resource is not None and _id in self.started:
+                resource = self._progress(resource)
+        return resource
+
+    def _progress(self, resource):
+        '''Returns a task / provision request in its current state'''
+        done = time.time() - self.started[resource['id']] >= \
+            self.task_duration
+        resource = dict(resource)
+        if 'state' in resource:
+            resource['state'] = 'Finished' if done else 'Active'
+            resource['status'] = 'Ok'
+        else:
+            resource['request_state'] = 'finished' if done else 'pending'
+            resource['approval_state'] = 'approved'
+        return resource
+
+    @staticmethod
+    def select_attributes(resource, query):
+        '''Applies the attributes option to a resource'''
+        attributes = ','.join(query.get('attributes', list()))
+        if not attributes:
+            return resource
+        keep = set(attributes.split(',')) | set(['id', 'href'])
+        return dict((key, value) for key, value in resource.items()
+                    if key in keep)
+
+    def page(self, collection, query):
+        '''Returns the JSON body of a collection query'''
+        offset = int(query.get('offset', ['0'])[0])
+        limit = int(query['limit'][0]) if query.get('limit') else None
+        if self.max_results:
+            limit = min(limit or self.max_results, self.max_results)
+        expand = 'resources' in query.get('expand', list())
+        attributes = query.get('attributes')
+        with self.lock:
+            selected = collection.select(query.get('filter[]'))
+            if query.get('sort_by'):
+                attr = query['sort_by'][0]
+                selected = sorted(selected, key=lambda idx: sort_key(
+                    collection.resources[idx].get(attr)), reverse=query.get(
+                        'sort_order', ['asc'])[0] == 'desc')
+            total = len(collection.resources)
+            subtotal = len(selected)
+            selected = selected[offset:offset + limit if limit else None]
+            dynamic = collection.name in ('tasks', 'provision_requests')
+            if not expand:
+                items = [json.dumps({'href': '/api/%s/%s' % (
+                    collection.name, collection.resources[idx]['id'])})
+                         for idx in selected]
+            elif attributes or dynamic:
+                items = [json.dumps(self.select_attributes(
+                    self._progress(collection.resources[idx])
+                    if dynamic else collection.resources[idx], query))
+                         for idx in selected]
+            else:
+                items = [collection.encoded[idx] for idx in selected]
+        return '{"name": "%s", "count": %d, "subcount": %d, ' \
+            '"subquery_count": %d, "resources": [%s]}' % (
+                collection.name, total, len(items), subtotal,
+                ', '.join(items))
+
+    def action(self, collection, action, resource):
+        '''Performs an action (see FakeHandler.do_POST), returns its
+        result'''
+        if collection == 'provision_requests' and action == 'create':
+            return self._start('provision_requests', {
+                'description': 'Provision from [%s]' % (
+                    resource.get('template_fields') or dict()).get(
+                        'name', 'template'),
+                'request_type': 'template',
+                'options': resource.get('vm_fields') or dict()
+            })
+        if collection == 'providers' and action in (None, 'create'):
+            return self._add('providers', dict(
+                (key, value) for key, value in resource.items()
+                if key not in ('action', 'credentials')))
+        href = resource.get('href') or ''
+        _id = href.rsplit('/', 1)[-1]
+        found = self.resource(self.collections[collection], _id)
+        if found is None:
+            return {'success': False, 'href': href,
+                    'message': "Couldn't find resource %s" % href}
+        if action == 'query':
+            return found
+        if action in ('assign_tags', 'unassign_tags'):
+            for tag in resource.get('tags') or list():
+                self.tag_action(collection, _id, action.split('_')[0], tag)
+            return {'success': True, 'href': href,
+                    'message': '%s tags' % action.split('_')[0]}
+        task = self._start('tasks', {
+            'name': '%s %s' % (action, href),
+            'state': 'Queued',
+            'status': 'Ok'
+        })
+        return {
+            'success': True,
+            'href': href,
+            'message': '%s %s' % (action, href),
+            'task_id': task['id'],
+            'task_href': task['href']
+        }
+
+    def _add(self, name, resource):
+        '''Stores a new resource (with a new ID)'''
+        collection = self.collections[name]
+        with self.lock:
+            _id = str(self.id_base + len(collection.resources) + 1)
+            resource = dict(resource, id=_id,
+                            href='/api/%s/%s' % (name, _id))
+            collection.add(resource)
+        return resource
+
+    def _start(self, name, resource):
+        '''Stores a new task / provision request'''
+        resource = self._add(name, resource)
+        with self.lock:
+            self.started[resource['id']] = time.time()
+            return self._progress(resource)
+
+    def resource_tags(self, collection, _id):
+        '''Returns the tags assigned to a resource'''
+        with self.lock:
+            return [dict(tag) for tag in
+                    self.tags.get((collection, _id), dict()).values()]
+
+    def tag_action(self, collection, _id, action, tag):
+        '''(Un)assigns a tag (by name or href) to a resource'''
+        name = tag.get('name') or tag.get('href')
+        if not name:
+            return {'success': False, 'message': 'No tag name given'}
+        with self.lock:
+            tags = self.tags.setdefault((collection, _id), dict())
+            if action == 'assign':
+                tags[name] = {'name': name}
+            else:
+                tags.pop(name, None)
+        return {'success': True, 'message': '%s %s' % (action, name),
+                'href': '/api/%s/%s' % (collection, _id)}
+
+    def start(self):
+        '''Serves requests on a background thread'''
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        '''Stops serving and closes the socket'''
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    '''Runs a fake API server until interrupted'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--vms', type=int, default=1000)
+    parser.add_argument('--padding', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int)
+    parser.add_argument('--task-duration', type=float, default=1.0)
+    parser.add_argument('--region', type=int, default=0)
+    parser.add_argument('--etags', action='store_true')
+    parser.add_argument('--max-results', type=int)
+    args = parser.parse_args()
+    server = FakeApiServer(
+        port=args.port, vms=args.vms, padding=args.padding,
+        latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, retry_after=args.retry_after,
+        task_duration=args.task_duration, region=args.region,
+        etags=args.etags, max_results=args.max_results)
+    # The first line tells whoever started us where to connect
+    print(server.host)
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
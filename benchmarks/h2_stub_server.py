@@ -0,0 +1,225 @@
+'''
+    benchmarks.h2_stub_server
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+    Local stand-in for the Cloudforms REST API behind an HTTP/2-capable
+    reverse proxy: speaks HTTP/2 (negotiated over TLS, or h2c with prior
+    knowledge) and HTTP/1.1 on the same port, answering every call after
+    a fixed latency (calls in flight are answered concurrently, whether
+    on separate connections or multiplexed streams)
+
+    Requires the h2 package (installed with Cloudforms[http2]).
+
+    :license: MIT, see LICENSE for more details.
+'''
+import asyncio
+import json
+import ssl
+import threading
+import h2.config
+import h2.connection
+import h2.events
+from benchmarks.stub_server import make_vm
+
+_PREFACE = b'PRI * HTTP/2.0'
+
+
+class StubProtocol(asyncio.Protocol):
+    '''One client connection, HTTP/2 or HTTP/1.1 (picked from the TLS
+    negotiation, or from the first bytes received)'''
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.conn = None
+        self.buffer = b''
+        self.streams = dict()
+        self.unsent = dict()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connections += 1
+        ssl_object = transport.get_extra_info('ssl_object')
+        if ssl_object is not None:
+            self._start(ssl_object.selected_alpn_protocol() == 'h2')
+
+    def _start(self, http2):
+        '''Sets the protocol of the connection'''
+        if http2:
+            self.conn = h2.connection.H2Connection(
+                config=h2.config.H2Configuration(client_side=False))
+            self.conn.initiate_connection()
+            self.transport.write(self.conn.data_to_send())
+        else:
+            self.conn = False
+
+    def data_received(self, data):
+        if self.conn is None:
+            self.buffer += data
+            if len(self.buffer) < len(_PREFACE) and \
+               _PREFACE.startswith(self.buffer):
+                return
+            self._start(self.buffer.startswith(_PREFACE))
+            data, self.buffer = self.buffer, b''
+        if self.conn:
+            self._h2_received(data)
+        else:
+            self._h1_received(data)
+
+    def _h2_received(self, data):
+        '''Handles HTTP/2 frames'''
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                self.streams[event.stream_id] = dict(event.headers)
+            elif isinstance(event, h2.events.DataReceived):
+                self.conn.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, h2.events.StreamEnded):
+                headers = self.streams.pop(event.stream_id, dict())
+                self.server.schedule(self._h2_reply, event.stream_id,
+                                     headers.get(b':method', b'GET'))
+            elif isinstance(event, h2.events.StreamReset):
+                self.streams.pop(event.stream_id, None)
+                self.unsent.pop(event.stream_id, None)
+            elif isinstance(event, h2.events.WindowUpdated):
+                self._h2_flush()
+        self.transport.write(self.conn.data_to_send())
+
+    def _h2_reply(self, stream_id, method):
+        '''Answers an HTTP/2 stream'''
+        if self.transport.is_closing() or \
+           stream_id not in self.conn.streams:
+            return
+        body = self.server.body(method.decode('ascii').upper())
+        self.conn.send_headers(stream_id, [
+            (':status', '200'),
+            ('content-type', 'application/json'),
+            ('content-length', str(len(body)))])
+        self.unsent[stream_id] = body
+        self._h2_flush()
+
+    def _h2_flush(self):
+        '''Sends as much of the pending bodies as flow control allows'''
+        for stream_id, body in list(self.unsent.items()):
+            size = min(len(body), self.conn.local_flow_control_window(
+                stream_id), self.conn.max_outbound_frame_size)
+            while size > 0:
+                self.conn.send_data(stream_id, body[:size])
+                body = body[size:]
+                size = min(len(body), self.conn.local_flow_control_window(
+                    stream_id), self.conn.max_outbound_frame_size)
+            if body:
+                self.unsent[stream_id] = body
+            else:
+                del self.unsent[stream_id]
+                self.conn.end_stream(stream_id)
+        self.transport.write(self.conn.data_to_send())
+
+    def _h1_received(self, data):
+        '''Handles an HTTP/1.1 request (one at a time, no pipelining)'''
+        self.buffer += data
+        head, sep, body = self.buffer.partition(b'\r\n\r\n')
+        if not sep:
+            return
+        lines = head.decode('latin-1').split('\r\n')
+        headers = dict(line.lower().split(':', 1) for line in lines[1:]
+                       if ':' in line)
+        length = int(headers.get('content-length', 0))
+        if len(body) < length:
+            return
+        self.buffer = body[length:]
+        self.server.schedule(self._h1_reply, lines[0].split(' ')[0],
+                             headers.get('connection', '').strip())
+
+    def _h1_reply(self, method, connection):
+        '''Answers an HTTP/1.1 request'''
+        if self.transport.is_closing():
+            return
+        body = self.server.body(method.upper())
+        self.transport.write(
+            b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+            b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        if connection == 'close':
+            self.transport.close()
+
+
+class H2StubServer(object):
+    '''Stub server running its own event loop on a background thread
+
+    :param integer port: port to listen on (0 picks a free port)
+    :param integer page_size: number of resources returned per GET
+    :param float latency: seconds before each call is answered
+    :param string certfile: PEM certificate (enables HTTPS, the
+                            protocol is then negotiated)
+    :param string keyfile: PEM private key
+    '''
+    # pylint: disable=too-many-arguments
+    def __init__(self, port=0, page_size=1, latency=0.0, certfile=None,
+                 keyfile=None):
+        self.port = port
+        self.latency = latency
+        self.secure = certfile is not None
+        self.ssl = None
+        if self.secure:
+            self.ssl = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.ssl.load_cert_chain(certfile, keyfile)
+            self.ssl.set_alpn_protocols(['h2', 'http/1.1'])
+        self.bodies = {
+            'GET': json.dumps({
+                'name': 'vms',
+                'count': page_size,
+                'subcount': page_size,
+                'resources': [make_vm(i) for i in range(page_size)]
+            }).encode('utf-8'),
+            'POST': json.dumps({
+                'results': [{'success': True, 'message': 'ok'}]
+            }).encode('utf-8')
+        }
+        self.connections = 0
+        self.requests = 0
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    @property
+    def host(self):
+        '''Returns host:port the server listens on'''
+        return '127.0.0.1:%s' % self.port
+
+    def body(self, method):
+        '''Returns the response body for a method'''
+        return self.bodies.get(method, self.bodies['POST'])
+
+    def schedule(self, func, *args):
+        '''Answers a call once the latency has passed'''
+        self.requests += 1
+        if self.latency:
+            self.loop.call_later(self.latency, func, *args)
+        else:
+            func(*args)
+
+    def start(self):
+        '''Serves requests on a background thread'''
+        started = threading.Event()
+
+        def run():
+            '''Runs the event loop'''
+            self.loop = asyncio.new_event_loop()
+            self.server = self.loop.run_until_complete(
+                self.loop.create_server(lambda: StubProtocol(self),
+                                        '127.0.0.1', self.port,
+                                        ssl=self.ssl))
+            self.port = self.server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+            self.server.close()
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run)
+        self.thread.daemon = True
+        self.thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        '''Stops serving and closes the socket'''
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
@@ -0,0 +1,115 @@
+'''
+    benchmarks.stub_server
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Minimal local stand-in for the Cloudforms REST API
+
+    :license: MIT, see LICENSE for more details.
+'''
+import json
+import ssl
+import threading
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # pragma: no cover (Python 2)
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+def make_vm(_id):
+    '''Returns a fake virtual server resource'''
+    return {
+        'id': str(_id),
+        'href': '/api/vms/%s' % _id,
+        'name': 'vm-%05d' % _id,
+        'vendor': 'redhat',
+        'power_state': 'on' if _id % 3 else 'off',
+        'raw_power_state': 'up' if _id % 3 else 'down',
+        'cpu_total_cores': 1 + _id % 8,
+        'ram_size': 1024 * (1 + _id % 16),
+        'used_disk_storage': 10737418240 + _id,
+        'updated_on': '2016-01-01T00:00:00Z'
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    '''Answers every GET with a small collection and every POST with
+    a successful action result'''
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, obj, etag=None):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # pylint: disable=invalid-name
+    def do_GET(self):
+        '''Returns a fake collection (or 304 if the client's copy is good)'''
+        etag = '"stub-%s"' % self.server.page_size
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        resources = [make_vm(i) for i in range(self.server.page_size)]
+        self._reply({
+            'name': 'vms',
+            'count': len(resources),
+            'subcount': len(resources),
+            'resources': resources
+        }, etag)
+
+    # pylint: disable=invalid-name
+    def do_POST(self):
+        '''Returns a fake action result'''
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        self._reply({'results': [{'success': True, 'message': 'ok'}]})
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    '''Threaded stub server, optionally wrapped in TLS
+
+    :param integer port: port to listen on (0 picks a free port)
+    :param integer page_size: number of resources returned per GET
+    :param string certfile: PEM certificate (enables HTTPS)
+    :param string keyfile: PEM private key
+    '''
+    daemon_threads = True
+
+    def __init__(self, port=0, page_size=1, certfile=None, keyfile=None):
+        HTTPServer.__init__(self, ('127.0.0.1', port), StubHandler)
+        self.page_size = page_size
+        self.secure = certfile is not None
+        if self.secure:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ctx.load_cert_chain(certfile, keyfile)
+            self.socket = ctx.wrap_socket(self.socket, server_side=True)
+        self.thread = None
+
+    @property
+    def host(self):
+        '''Returns host:port the server listens on'''
+        return '%s:%s' % self.server_address[:2]
+
+    def start(self):
+        '''Serves requests on a background thread'''
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        '''Stops serving and closes the socket'''
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,241 @@
+'''
+    benchmarks.suite
+    ~~~~~~~~~~~~~~~~
+    Benchmark suite tracking list throughput, per-call latency, memory
+    (peak and retained) per 10k virtual servers and task-wait overhead
+    (against the fake API server, run in its own process)
+
+    Usage::
+
+        python -m benchmarks.suite [--vms N] [--repeat N] [--only NAME]
+                                   [--output FILE] [--compare FILE]
+
+    Results saved with --output (one file per release, ex.
+    results-0.1.1.json) can be compared with --compare to spot
+    regressions between releases.
+
+    :license: MIT, see LICENSE for more details.
+'''
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import warnings
+import Cloudforms
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover (Python 2)
+    tracemalloc = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeApi(object):
+    '''Runs benchmarks.fake_api in a child process (so that serving
+    requests does not compete with the client for the interpreter)
+
+    :param options: fake_api command line options (ex. vms=10000)
+    '''
+    def __init__(self, **options):
+        self.args = [sys.executable, '-m', 'benchmarks.fake_api']
+        for name, value in sorted(options.items()):
+            self.args.extend(['--%s' % name.replace('_', '-'), str(value)])
+        self.process = None
+        self.host = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.args, cwd=ROOT,
+                                        stdout=subprocess.PIPE)
+        self.host = self.process.stdout.readline().decode('utf-8').strip()
+        if not self.host:
+            raise RuntimeError('The fake API server did not start')
+        return self
+
+    def __exit__(self, *args):
+        self.process.terminate()
+        self.process.wait()
+        self.process.stdout.close()
+
+    def client(self, **kwargs):
+        '''Returns a client of the fake API'''
+        return Cloudforms.Client(host=self.host, secure_host=False,
+                                 **kwargs)
+
+
+def best(func, repeat):
+    '''Returns the best of repeat timings (seconds)'''
+    func()
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def bench_list(args):
+    '''Virtual servers listed per second, per listing strategy'''
+    results = dict()
+    with FakeApi(vms=args.vms) as api:
+        vs_mgr = Cloudforms.VSManager(api.client())
+        for name, func in [
+                ('single', lambda: vs_mgr.list()),
+                ('paged', lambda: list(vs_mgr.list(page_size=1000))),
+                ('prefetch', lambda: list(vs_mgr.list(page_size=1000,
+                                                      workers=4))),
+                ('stream', lambda: list(vs_mgr.list(stream=True)))]:
+            results['%s_vms_per_s' % name] = args.vms / best(func,
+                                                             args.repeat)
+        vs_mgr.client.close()
+    return results
+
+
+def bench_latency(args):
+    '''Per-call latency (milliseconds) of a small GET'''
+    with FakeApi(vms=10) as api:
+        client = api.client()
+        client.call('get', '/vms/1')
+        timings = sorted(timeit.repeat(lambda: client.call('get', '/vms/1'),
+                                       number=1, repeat=args.calls))
+        client.close()
+    return {
+        'mean_ms': 1000 * sum(timings) / len(timings),
+        'p50_ms': 1000 * timings[len(timings) // 2],
+        'p99_ms': 1000 * timings[int(len(timings) * 0.99)]
+    }
+
+
+def bench_memory(args):
+    '''Memory (MB per 10k virtual servers) per listing strategy: peak
+    while listing, and retained by the result'''
+    if tracemalloc is None:
+        return dict()
+    results = dict()
+    with FakeApi(vms=args.vms) as api:
+        client = api.client()
+        for name, func in [
+                ('list', lambda: Cloudforms.VSManager(client).list()),
+                ('records', lambda: Cloudforms.VSManager(
+                    client, records=True).list()),
+                # Paged, the peak is not dominated by decoding one body
+                ('list_paged', lambda: list(Cloudforms.VSManager(
+                    client).list(page_size=1000))),
+                ('records_paged', lambda: list(Cloudforms.VSManager(
+                    client, records=True).list(page_size=1000))),
+                ('stream', lambda: sum(1 for _ in Cloudforms.VSManager(
+                    client).list(stream=True))),
+                ('export', lambda: Cloudforms.VSManager(client).export())]:
+            func()
+            tracemalloc.start()
+            kept = func()
+            # Measured while the result is still alive
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del kept
+            scale = 10000.0 / args.vms / 1048576
+            results['%s_peak_mb' % name] = peak * scale
+            results['%s_kept_mb' % name] = current * scale
+        client.close()
+    return results
+
+
+def bench_task_wait(args):
+    '''Time spent waiting for tasks beyond their duration, and calls made'''
+    calls = list()
+    with FakeApi(vms=args.tasks, task_duration=args.task_duration) as api:
+        client = api.client(hooks=[calls.append])
+        vs_mgr = Cloudforms.VSManager(client)
+        task_mgr = Cloudforms.TaskManager(client)
+        start = time.time()
+        ids = [result['task_id'] for result in vs_mgr.start_many(
+            [str(_id) for _id in range(1, args.tasks + 1)])]
+        done = sum(1 for _ in task_mgr.wait_many(ids, timeout=60))
+        elapsed = time.time() - start
+        client.close()
+    if done != args.tasks:
+        raise RuntimeError('%d of %d tasks finished' % (done, args.tasks))
+    return {
+        'overhead_ms': 1000 * (elapsed - args.task_duration),
+        'calls': len(calls)
+    }
+
+
+#: Benchmarks run by default, in order
+BENCHMARKS = [
+    ('list', bench_list),
+    ('latency', bench_latency),
+    ('memory', bench_memory),
+    ('task_wait', bench_task_wait)
+]
+
+
+def version():
+    '''Returns the version of Cloudforms being benchmarked'''
+    try:
+        from importlib.metadata import version as dist_version
+    except ImportError:  # pragma: no cover (Python < 3.8)
+        from pkg_resources import get_distribution
+
+        def dist_version(name):
+            '''Returns an installed distribution's version'''
+            return get_distribution(name).version
+    # pylint: disable=broad-except
+    try:
+        return dist_version('Cloudforms')
+    except Exception:
+        return 'unknown'
+
+
+def compare(baseline, results):
+    '''Prints each metric next to its baseline value'''
+    print('\n%-28s %12s %12s %8s' % ('vs. %s' % baseline['label'],
+                                     'baseline', 'current', 'ratio'))
+    for name, metrics in sorted(results['benchmarks'].items()):
+        for metric, value in sorted(metrics.items()):
+            old = baseline['benchmarks'].get(name, dict()).get(metric)
+            if old is None:
+                continue
+            print('%-28s %12.2f %12.2f %7.2fx' % (
+                '%s.%s' % (name, metric), old, value,
+                value / old if old else float('inf')))
+
+
+def main():
+    '''Runs the benchmark suite'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vms', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--task-duration', type=float, default=1.0)
+    parser.add_argument('--only', action='append',
+                        choices=[name for name, _ in BENCHMARKS])
+    parser.add_argument('--label', default=version(),
+                        help='name of these results (default: version)')
+    parser.add_argument('--output', help='save results (JSON) to a file')
+    parser.add_argument('--compare', help='results file to compare with')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    results = {
+        'label': args.label,
+        'python': platform.python_version(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'benchmarks': dict()
+    }
+    for name, func in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+        metrics = results['benchmarks'][name] = func(args)
+        for metric, value in sorted(metrics.items()):
+            print('%-28s %12.2f' % ('%s.%s' % (name, metric), value))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(json.load(baseline), results)
+
+
+if __name__ == '__main__':
+    main()
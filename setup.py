@@ -6,13 +6,21 @@ setup(
     name='Cloudforms',
     version='0.1.1',
     install_requires=[
-        "requests"
+        "requests",
+        "futures; python_version < '3'"
     ],
+    extras_require={
+        'async': ['aiohttp'],
+        'fast': ["orjson; python_version >= '3'",
+                 "ujson; python_version < '3'"],
+        'http2': ["httpx[http2]; python_version >= '3'"]
+    },
     description='Cloudforms (ManageIQ) RESTful API Client',
     url='http://github.com/01000101',
     author='Joshua Cornutt',
     author_email='jcornutt@gmail.com',
-    packages=['Cloudforms', 'Cloudforms.managers'],
+    packages=['Cloudforms', 'Cloudforms.managers',
+              'Cloudforms.aio', 'Cloudforms.aio.managers'],
     classifiers=[
         'Intended Audience :: Developers',
         'Natural Language :: English',
@@ -21,6 +29,7 @@ setup(
         'Programming Language :: Python',
         'Programming Language :: Python :: 2',
         'Programming Language :: Python :: 2.7',
+        'Programming Language :: Python :: 3',
         'Topic :: Software Development :: Libraries :: Python Modules'
     ]
 )
@@ -66,6 +66,15 @@ class TestVSManager(unittest.TestCase):
         logging.info('res: %s [%s]', res, type(res))
         self.assertTrue(isinstance(res, list))
 
+    def test_list_paged(self):
+        '''Tests VSManager.list(page_size=N)'''
+        client = get_client()
+        vs_mgr = Cloudforms.VSManager(client)
+        res = vs_mgr.list({'attributes': 'id'})
+        paged = list(vs_mgr.list({'attributes': 'id'}, page_size=2))
+        self.assertEqual([x.get('id') for x in paged],
+                         [x.get('id') for x in res])
+
 
 class TestProviderManager(unittest.TestCase):
     '''Tests ProviderManager'''
@@ -0,0 +1,303 @@
+'''Asyncio client tests (offline, against benchmarks.fake_api)'''
+import asyncio
+import unittest
+from Cloudforms.aio import (
+    AsyncClient,
+    AsyncProvisionRequestManager,
+    AsyncTaskManager,
+    AsyncVSManager
+)
+from Cloudforms.cache import ResponseCache, SingleFlight
+from Cloudforms.limiter import RateLimiter
+from Cloudforms.poller import Backoff
+from Cloudforms.utils import monotonic
+from benchmarks.fake_api import FakeApiServer
+from tests.test_limiter import track_in_flight
+from tests.test_tags import flaky_actions
+
+
+def run(coro):
+    '''Runs a coroutine on a new event loop'''
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestAsyncCachePolling(unittest.TestCase):
+    '''Polls must see the current state, not the cached one'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10, task_duration=0.5).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def poll(self, many):
+        '''Stops a VM and waits for its task, with a cache'''
+        client = AsyncClient(host=self.server.host, secure_host=False,
+                             cache=ResponseCache())
+        try:
+            task_mgr = AsyncTaskManager(client)
+            task_id = (await AsyncVSManager(client).stop('1'))['task_id']
+            task = await task_mgr.get(task_id)
+            self.assertEqual(task['state'], 'Active')
+            if not many:
+                return await task_mgr.wait(task_id, timeout=5)
+            return [task['id'] async for task in
+                    task_mgr.wait_many([task_id], timeout=5)] == [task_id]
+        finally:
+            await client.close()
+
+    def test_wait(self):
+        '''Tests AsyncTaskManager.wait with a cache'''
+        self.assertTrue(run(self.poll(many=False)))
+
+    def test_wait_many(self):
+        '''Tests AsyncTaskManager.wait_many with a cache'''
+        self.assertTrue(run(self.poll(many=True)))
+
+
+class TestAsyncIterCollection(unittest.TestCase):
+    '''Paged (and streamed) collection walks'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def walk(self, **options):
+        '''Lists VMs, returns (IDs, whether each call streamed)'''
+        client = AsyncClient(host=self.server.host, secure_host=False)
+        streamed = list()
+        call = client.call
+
+        def spy(*args, **kwargs):
+            '''Records whether a call streams'''
+            streamed.append(kwargs.get('stream', False))
+            return call(*args, **kwargs)
+
+        client.call = spy
+        try:
+            ids = [vm['id'] async for vm in
+                   AsyncVSManager(client).list(**options)]
+            return ids, streamed
+        finally:
+            await client.close()
+
+    def test_paged_stream(self):
+        '''Tests each page is streamed when page_size is set'''
+        ids, streamed = run(self.walk(page_size=4, stream=True))
+        self.assertEqual(ids, [str(_id) for _id in range(1, 11)])
+        # Streamed pages do not tell the total: ends on an empty page
+        self.assertEqual(streamed, [True] * 4)
+
+    def test_paged(self):
+        '''Tests pages are decoded whole unless stream is set'''
+        ids, streamed = run(self.walk(page_size=5))
+        self.assertEqual(ids, [str(_id) for _id in range(1, 11)])
+        self.assertEqual(streamed, [False] * 2)
+
+
+class TestAsyncConcurrency(unittest.TestCase):
+    '''max_concurrency limits, across event loops'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10, latency=0.02).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def get_all(self, client):
+        '''Gets every VM at once (more than max_concurrency)'''
+        try:
+            return await asyncio.gather(*[
+                client.call('get', '/vms/%d' % _id) for _id in range(1, 11)])
+        finally:
+            await client.close()
+
+    def test_loops(self):
+        '''Tests a client used by one event loop after another'''
+        client = AsyncClient(host=self.server.host, secure_host=False,
+                             max_concurrency=2)
+        for _ in range(2):
+            vms = run(self.get_all(client))
+            self.assertEqual([vm['id'] for vm in vms],
+                             [str(_id) for _id in range(1, 11)])
+
+
+class TestAsyncRateLimiter(unittest.TestCase):
+    '''Asyncio clients sharing a RateLimiter'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def get_all(self, limiter):
+        '''Gets 8 VMs at once'''
+        client = AsyncClient(host=self.server.host, secure_host=False,
+                             limiter=limiter)
+        try:
+            return await asyncio.gather(*[
+                client.call('get', '/vms/%d' % _id) for _id in range(1, 9)])
+        finally:
+            await client.close()
+
+    def test_rate(self):
+        '''Tests calls are spaced out, time waited is recorded'''
+        limiter = RateLimiter(rate=20, burst=2)
+        start = monotonic()
+        self.assertEqual(len(run(self.get_all(limiter))), 8)
+        # 2 calls at once, then 6 more at 20 per second
+        self.assertGreaterEqual(monotonic() - start, 0.29)
+        stats = limiter.stats
+        self.assertEqual(stats['acquired'], 8)
+        self.assertEqual(stats['waited'], 6)
+        self.assertGreater(stats['wait_max'], 0.25)
+        self.assertEqual(stats['queued'], 0)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_max_in_flight(self):
+        '''Tests the concurrency cap, in one event loop then another'''
+        seen = track_in_flight(self.server)
+        limiter = RateLimiter(max_in_flight=3)
+        for _ in range(2):
+            self.assertEqual(len(run(self.get_all(limiter))), 8)
+        self.assertEqual(seen['max'], 3)
+        stats = limiter.stats
+        self.assertEqual(stats['acquired'], 16)
+        self.assertGreater(stats['waited'], 0)
+        self.assertEqual(stats['in_flight'], 0)
+
+
+class TestAsyncCoalesce(unittest.TestCase):
+    '''Identical reads in progress share one call'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10, latency=0.1).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def get_same(self, client):
+        '''Gets the same VM many times at once'''
+        try:
+            return await asyncio.gather(*[
+                client.call('get', '/vms/1') for _ in range(8)])
+        finally:
+            await client.close()
+
+    def test_coalesce(self):
+        '''Tests every caller reports the shared response'''
+        infos = list()
+        flights = SingleFlight()
+        client = AsyncClient(host=self.server.host, secure_host=False,
+                             coalesce=flights, hooks=[infos.append])
+        vms = run(self.get_same(client))
+        self.assertEqual([vm['id'] for vm in vms], ['1'] * 8)
+        self.assertEqual(self.server.requests['GET'], 1)
+        self.assertEqual(flights.stats['hits'], 7)
+        self.assertEqual(sum(info.coalesced for info in infos), 7)
+        self.assertEqual(set(info.status for info in infos), {200})
+        self.assertEqual(len(set(info.bytes for info in infos)), 1)
+        self.assertGreater(infos[0].bytes, 0)
+
+
+class TestAsyncAssignMany(unittest.TestCase):
+    '''AsyncServiceTagManager.assign_many tests'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def assign_many(self, tags):
+        '''Tags VMs, returns the results'''
+        client = AsyncClient(host=self.server.host, secure_host=False)
+        try:
+            return await AsyncVSManager(client).tags.assign_many(
+                tags, batch_size=2, backoff=Backoff(0.01))
+        finally:
+            await client.close()
+
+    def test_results(self):
+        '''Tests per-resource results, only transient failures retried'''
+        sent = flaky_actions(self.server, ['2'])
+        results = run(self.assign_many(dict(
+            (_id, ['/a']) for _id in ('1', '2', '3', '999'))))
+        self.assertEqual(dict((_id, res['success'])
+                              for _id, res in results.items()),
+                         {'1': True, '2': True, '3': True, '999': False})
+        self.assertEqual(self.server.requests['POST'], 3)
+        self.assertEqual(sorted(sent), ['1', '2', '2', '3', '999'])
+
+
+class TestAsyncCappedPaging(unittest.TestCase):
+    '''Walks of an appliance capping limit at 100 resources'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=250, max_results=100).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def ids(self, **options):
+        '''Returns the IDs of the VMs listed'''
+        client = AsyncClient(host=self.server.host, secure_host=False)
+        try:
+            return [vm['id'] async for vm in
+                    AsyncVSManager(client).list(**options)]
+        finally:
+            await client.close()
+
+    def test_walk(self):
+        '''Tests pages larger than the cap, decoded whole or streamed'''
+        ids = [str(_id) for _id in range(1, 251)]
+        self.assertEqual(run(self.ids(page_size=200)), ids)
+        self.assertEqual(run(self.ids(page_size=200, stream=True)), ids)
+
+    def test_prefetch(self):
+        '''Tests prefetched pages larger than the cap'''
+        self.assertEqual(run(self.ids(page_size=200, workers=2)),
+                         [str(_id) for _id in range(1, 251)])
+
+
+class TestAsyncCreateMany(unittest.TestCase):
+    '''AsyncProvisionRequestManager.create_many tests'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=1, task_duration=0.2).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def create_many(self, count, **options):
+        '''Provisions count VMs, returns the results'''
+        client = AsyncClient(host=self.server.host, secure_host=False)
+        try:
+            return [preq async for preq in AsyncProvisionRequestManager(
+                client).create_many(({
+                    'template_fields': {'name': 'template'},
+                    'vm_fields': {'vm_name': 'vm-%03d' % idx}
+                } for idx in range(count)), backoff=Backoff(0.05, 0.2),
+                                    **options)]
+        finally:
+            await client.close()
+
+    def test_create_many(self):
+        '''Tests every spec is provisioned'''
+        done = run(self.create_many(9, max_outstanding=4, batch_size=2,
+                                    timeout=30))
+        self.assertEqual(sorted(int(preq['id']) for preq in done),
+                         list(range(1, 10)))
+        self.assertTrue(all(preq['request_state'] == 'finished'
+                            for preq in done))
+
+    def test_timeout(self):
+        '''Tests what is left after timeout is reported'''
+        self.server.task_duration = 60
+        done = run(self.create_many(5, max_outstanding=3, timeout=0.3))
+        self.assertEqual(len(done), 5)
+        self.assertEqual([preq.get('id') for preq in done],
+                         ['1', '2', '3', None, None])
+        self.assertFalse(any(preq['success'] for preq in done))
+        with self.assertRaises(ValueError):
+            AsyncProvisionRequestManager(None).create_many(
+                list(), max_outstanding=0)
@@ -0,0 +1,71 @@
+'''Micro-batching tests (offline, against benchmarks.fake_api)'''
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import Cloudforms
+from Cloudforms.batcher import Batcher
+from benchmarks.fake_api import FakeApiServer
+
+
+class TestBatcher(unittest.TestCase):
+    '''Batcher tests'''
+    def test_batches(self):
+        '''Tests concurrent lookups are fetched together'''
+        server = FakeApiServer(vms=200).start()
+        client = Cloudforms.Client(host=server.host, secure_host=False)
+        try:
+            vms = Cloudforms.VSManager(client).batcher(window=0.05,
+                                                       batch_size=50)
+            ids = [str(_id) for _id in range(1, 201)] + ['1', '9999']
+            with ThreadPoolExecutor(max_workers=32) as pool:
+                found = list(pool.map(vms.get, ids))
+            self.assertEqual([vm and vm['id'] for vm in found],
+                             ids[:-1] + [None])
+            self.assertEqual(vms.stats['lookups'], len(ids))
+            self.assertLess(vms.stats['batches'], 20)
+            self.assertEqual(server.requests['GET'], vms.stats['batches'])
+        finally:
+            client.close()
+            server.stop()
+
+    def test_order(self):
+        '''Tests each caller gets its own resources back'''
+        batches = list()
+
+        def fetch(ids):
+            '''Returns fake resources, in order'''
+            batches.append(ids)
+            return [{'id': _id} for _id in ids]
+
+        batcher = Batcher(fetch, window=0.01, max_batch=4)
+        self.assertEqual(batcher.get_many(['1', '2', '1', '3', '4', '5']),
+                         [{'id': _id} for _id in '121345'])
+        self.assertEqual(batches, [['1', '2', '3', '4'], ['5']])
+
+    def test_errors(self):
+        '''Tests a failed batch fails each of its callers'''
+        calls = list()
+
+        def fetch(ids):
+            '''Fails every fetch'''
+            calls.append(ids)
+            raise ValueError('down')
+
+        batcher = Batcher(fetch, window=0.05)
+        errors = list()
+
+        def lookup(_id):
+            '''Records a lookup's error'''
+            try:
+                batcher.get(_id)
+            except ValueError as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=lookup, args=(str(_id),))
+                   for _id in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 8)
+        self.assertLess(len(calls), 8)
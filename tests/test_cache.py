@@ -0,0 +1,117 @@
+'''Response cache tests (offline, against benchmarks.fake_api)'''
+import unittest
+import Cloudforms
+from Cloudforms.cache import ResponseCache
+from benchmarks.fake_api import FakeApiServer
+
+
+class TestCachePolling(unittest.TestCase):
+    '''Polls must see the current state, not the cached one'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10, task_duration=0.5).start()
+        self.client = Cloudforms.Client(host=self.server.host,
+                                        secure_host=False,
+                                        cache=ResponseCache())
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def start_task(self):
+        '''Stops a VM, returns the ID of its (cached, active) task'''
+        task_id = Cloudforms.VSManager(self.client).stop('1')['task_id']
+        task = Cloudforms.TaskManager(self.client).get(task_id)
+        self.assertEqual(task['state'], 'Active')
+        return task_id
+
+    def test_wait(self):
+        '''Tests TaskManager.wait with a cache'''
+        task_mgr = Cloudforms.TaskManager(self.client)
+        self.assertTrue(task_mgr.wait(self.start_task(), timeout=5))
+
+    def test_wait_many(self):
+        '''Tests TaskManager.wait_many with a cache'''
+        task_mgr = Cloudforms.TaskManager(self.client)
+        task_id = self.start_task()
+        tasks = list(task_mgr.wait_many([task_id], timeout=5))
+        self.assertEqual([task['id'] for task in tasks], [task_id])
+
+    def test_cache_bypass(self):
+        '''Tests cache=False neither reads nor stores'''
+        self.client.call('get', '/vms/1')
+        gets = self.server.requests['GET']
+        self.client.call('get', '/vms/1')
+        self.assertEqual(self.server.requests['GET'], gets)
+        self.client.call('get', '/vms/1', cache=False)
+        self.assertEqual(self.server.requests['GET'], gets + 1)
+
+
+class TestCacheRevalidation(unittest.TestCase):
+    '''ETag revalidation and invalidation tests'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10, etags=True).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def client(self, cache):
+        '''Returns a client of the server (closed after the test)'''
+        client = Cloudforms.Client(host=self.server.host, secure_host=False,
+                                   cache=cache)
+        self.addCleanup(client.close)
+        return client
+
+    def rename(self, _id, name):
+        '''Changes a VM on the server'''
+        collection = self.server.collections['vms']
+        collection.resources[collection.index[_id]] = dict(
+            collection.get(_id), name=name)
+
+    def test_not_modified(self):
+        '''Tests expired entries are revalidated (304) or refetched'''
+        cache = ResponseCache(ttl=0)
+        client = self.client(cache)
+        first = client.call('get', '/vms/1')
+        self.assertIs(client.call('get', '/vms/1'), first)
+        self.assertEqual(self.server.not_modified, 1)
+        self.assertEqual(cache.revalidations, 1)
+        self.rename('1', 'renamed')
+        self.assertEqual(client.call('get', '/vms/1')['name'], 'renamed')
+        self.assertEqual(self.server.not_modified, 1)
+        self.assertEqual(self.server.requests['GET'], 3)
+
+    def test_no_revalidation(self):
+        '''Tests revalidate=False does not send conditional GETs'''
+        client = self.client(ResponseCache(ttl=0, revalidate=False))
+        client.call('get', '/vms/1')
+        client.call('get', '/vms/1')
+        self.assertEqual(self.server.not_modified, 0)
+        self.assertEqual(self.server.requests['GET'], 2)
+
+    def test_invalidation(self):
+        '''Tests actions drop the cached entries of their collection'''
+        cache = ResponseCache(ttl=60)
+        client = self.client(cache)
+        client.call('get', '/vms/1')
+        client.call('get', '/vms', params={'expand': 'resources'})
+        client.call('get', '/providers/1')
+        self.rename('1', 'renamed')
+        self.assertNotEqual(client.call('get', '/vms/1')['name'], 'renamed')
+        Cloudforms.VSManager(client).stop('2')
+        self.assertEqual(client.call('get', '/vms/1')['name'], 'renamed')
+        client.call('get', '/providers/1')
+        self.assertEqual(self.server.requests['GET'], 4)
+        self.assertEqual(cache.hits, 2)
+
+    def test_query_keeps_cache(self):
+        '''Tests query actions (read-only POSTs) do not invalidate'''
+        cache = ResponseCache(ttl=60)
+        client = self.client(cache)
+        vs_mgr = Cloudforms.VSManager(client)
+        client.call('get', '/vms/1')
+        vms = vs_mgr.get_many(['1', '2', '3'], query=True)
+        self.assertEqual([vm['id'] for vm in vms], ['1', '2', '3'])
+        self.assertEqual(self.server.requests['POST'], 1)
+        client.call('get', '/vms/1')
+        self.assertEqual(self.server.requests['GET'], 1)
+        self.assertEqual(cache.hits, 1)
@@ -0,0 +1,62 @@
+'''Call coalescing tests (offline, against benchmarks.fake_api)'''
+import threading
+import unittest
+import Cloudforms
+from Cloudforms.cache import ResponseCache, SingleFlight
+from benchmarks.fake_api import FakeApiServer
+
+
+class TestCoalesce(unittest.TestCase):
+    '''Identical reads in progress share one call'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10, latency=0.2).start()
+        self.infos = list()
+        self.flights = SingleFlight()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def client(self, cache=None):
+        '''Returns a client of the server (closed after the test)'''
+        client = Cloudforms.Client(host=self.server.host, secure_host=False,
+                                   cache=cache, coalesce=self.flights,
+                                   hooks=[self.infos.append])
+        self.addCleanup(client.close)
+        return client
+
+    def test_coalesce(self):
+        '''Tests concurrent callers all report the shared response'''
+        client = self.client()
+        barrier = threading.Barrier(8)
+        vms = list()
+
+        def get():
+            '''Gets the same VM as every other thread'''
+            barrier.wait()
+            vms.append(client.call('get', '/vms/1'))
+
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([vm['id'] for vm in vms], ['1'] * 8)
+        self.assertEqual(self.server.requests['GET'], self.flights.calls)
+        self.assertEqual(self.flights.calls + self.flights.hits, 8)
+        self.assertGreater(self.flights.hits, 0)
+        self.assertEqual(len(self.infos), 8)
+        self.assertEqual(sum(info.coalesced for info in self.infos),
+                         self.flights.hits)
+        self.assertEqual(set(info.status for info in self.infos), {200})
+        self.assertEqual(len(set(info.bytes for info in self.infos)), 1)
+        self.assertGreater(self.infos[0].bytes, 0)
+
+    def test_cache_hit(self):
+        '''Tests cache hits report a status'''
+        client = self.client(ResponseCache())
+        client.call('get', '/vms/1')
+        client.call('get', '/vms/1')
+        self.assertEqual(self.server.requests['GET'], 1)
+        self.assertEqual([info.cached for info in self.infos],
+                         [False, True])
+        self.assertEqual([info.status for info in self.infos], [200, 200])
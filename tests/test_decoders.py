@@ -0,0 +1,87 @@
+'''Streaming decoder tests'''
+import json
+import random
+import unittest
+from Cloudforms.decoders import iter_resources
+from Cloudforms.exceptions import CloudformsBadResult
+
+
+def chunked(body, sizes):
+    '''Splits a body into chunks of the given sizes (the rest last)'''
+    chunks = list()
+    for size in sizes:
+        chunks.append(body[:size])
+        body = body[size:]
+    return chunks + [body]
+
+
+class TestResourceScanner(unittest.TestCase):
+    '''ResourceScanner / iter_resources tests'''
+    DOCUMENTS = [
+        {'name': 'vms', 'count': 3, 'resources': [
+            {'id': '1', 'name': 'a "quoted" ]}, name'},
+            {'id': '2', 'tags': [1, 2.5, None], 'nested': {'a': [{}]}},
+            {'id': '3', 'name': u'café ☃'}]},
+        {'resources': [12.5, 3, -1e-3, 0, 1E+10, True, False, None,
+                       'x', [], {}, [1, [2]]], 'subcount': 12},
+        {'count': 0, 'resources': []},
+        {'resources': [1234567890.125e-2], 'actions': [{'name': 'x'}]}
+    ]
+
+    def check(self, body, expected):
+        '''Decodes a body split at every offset (one or two boundaries)'''
+        for idx in range(len(body) + 1):
+            self.assertEqual(list(iter_resources(
+                chunked(body, [idx]))), expected, body[:idx])
+        for idx in range(0, len(body), 3):
+            for jdx in range(0, len(body) - idx, 2):
+                self.assertEqual(list(iter_resources(
+                    chunked(body, [idx, jdx]))), expected)
+
+    def test_chunk_boundaries(self):
+        '''Tests resources split across chunks at any byte'''
+        for doc in self.DOCUMENTS:
+            for separators in ((',', ':'), (' , ', ' : ')):
+                body = json.dumps(doc, separators=separators).encode(
+                    'utf-8')
+                self.check(body, doc['resources'])
+
+    def test_split_numbers(self):
+        '''Tests numbers split at their decimal point or exponent'''
+        self.assertEqual(list(iter_resources(
+            [b'{"resources": [12.', b'5, 3]}'])), [12.5, 3])
+        self.assertEqual(list(iter_resources(
+            [b'{"resources": [1e', b'3, 1', b'0', b'E-1]}'])), [1e3, 10E-1])
+        self.assertEqual(list(iter_resources(
+            [b'{"resources": [tr', b'ue ', b' ,nul', b'l]}'])), [True, None])
+
+    def test_fuzz(self):
+        '''Tests random scalar and object resources in random chunks'''
+        rand = random.Random(42)
+        scalars = [lambda: rand.randint(-10 ** 6, 10 ** 6),
+                   lambda: rand.uniform(-1e6, 1e6),
+                   lambda: rand.choice([True, False, None]),
+                   lambda: rand.choice(['', 'a,b', ']', '\\"'])]
+        for _ in range(200):
+            resources = [rand.choice(scalars)() if rand.random() < 0.7
+                         else {'id': str(rand.randint(1, 99))}
+                         for _ in range(rand.randint(0, 10))]
+            body = json.dumps({'name': 'x', 'resources': resources}).encode(
+                'utf-8')
+            sizes = [rand.randint(1, 8) for _ in range(len(body))]
+            self.assertEqual(list(iter_resources(chunked(body, sizes))),
+                             resources)
+
+    def test_other_key(self):
+        '''Tests extracting another array'''
+        body = b'{"resources": [1], "results": [{"success": true}, 2]}'
+        self.assertEqual(list(iter_resources(chunked(body, [20, 9]),
+                                             key='results')),
+                         [{'success': True}, 2])
+
+    def test_truncated(self):
+        '''Tests bodies ending inside the resources array'''
+        for body in (b'{"resources": [1, 2', b'{"resources": [{"id": 1}',
+                     b'{"resources": [12.'):
+            with self.assertRaises(CloudformsBadResult):
+                list(iter_resources([body]))
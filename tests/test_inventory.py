@@ -0,0 +1,55 @@
+'''Inventory store tests (offline, against benchmarks.fake_api)'''
+import unittest
+import Cloudforms
+from Cloudforms.inventory import InventoryStore
+from benchmarks.fake_api import Collection, FakeApiServer
+
+
+class TestInventoryStore(unittest.TestCase):
+    '''InventoryStore tests, against an appliance capping limit at 100'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=250, max_results=100).start()
+        self.client = Cloudforms.Client(host=self.server.host,
+                                        secure_host=False)
+        self.store = InventoryStore(self.client, ':memory:', ['vms'],
+                                    page_size=1000)
+        self.assertEqual(self.store.refresh(), {'vms': 250})
+
+    def tearDown(self):
+        self.store.close()
+        self.client.close()
+        self.server.stop()
+
+    def remove(self, *ids):
+        '''Removes VMs from the server'''
+        self.server.collections['vms'] = Collection('vms', [
+            vm for vm in self.server.collections['vms'].resources
+            if vm['id'] not in ids])
+
+    def test_removed(self):
+        '''Tests removed records are dropped, past capped sweep pages'''
+        self.remove('2', '170', '250')
+        self.store.refresh()
+        self.assertEqual(self.store.count('vms'), 247)
+        self.assertIsNone(self.store.get('vms', '170'))
+        self.assertIsNotNone(self.store.get('vms', '249'))
+
+    def test_removed_mid_sweep(self):
+        '''Tests removals during the sweep do not drop live records'''
+        page = self.server.page
+
+        def remove_after(collection, query):
+            '''Removes VMs once the first sweep page is out'''
+            ret = page(collection, query)
+            if query.get('attributes') == ['id'] and \
+               not query.get('filter[]'):
+                self.remove('5', '6')
+            return ret
+
+        self.server.page = remove_after
+        self.store.refresh()
+        self.assertEqual(self.store.count('vms'), 250)
+        self.server.page = page
+        self.store.refresh()
+        self.assertEqual(self.store.count('vms'), 248)
+        self.assertIsNone(self.store.get('vms', '6'))
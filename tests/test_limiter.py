@@ -0,0 +1,115 @@
+'''Rate limiter tests (offline, against benchmarks.fake_api)'''
+import threading
+import time
+import unittest
+import Cloudforms
+from Cloudforms.limiter import RateLimiter
+from benchmarks.fake_api import FakeApiServer
+
+
+def track_in_flight(server, delay=0.05):
+    '''Makes resource GETs last delay seconds, returns a dict whose 'max'
+    is the most of them the server handled at once'''
+    seen = {'now': 0, 'max': 0}
+    lock = threading.Lock()
+    resource = server.resource
+
+    def slow_resource(collection, _id):
+        '''Counts the request in flight while it lasts'''
+        with lock:
+            seen['now'] += 1
+            seen['max'] = max(seen['max'], seen['now'])
+        try:
+            time.sleep(delay)
+            return resource(collection, _id)
+        finally:
+            with lock:
+                seen['now'] -= 1
+
+    server.resource = slow_resource
+    return seen
+
+
+class TestTokenBucket(unittest.TestCase):
+    '''RateLimiter token accounting'''
+    def test_burst(self):
+        '''Tests burst tokens are free, the next ones are queued'''
+        limiter = RateLimiter(rate=10, burst=2)
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertAlmostEqual(limiter.reserve(), 0.1, delta=0.01)
+        self.assertAlmostEqual(limiter.reserve(), 0.2, delta=0.01)
+
+    def test_refill(self):
+        '''Tests tokens come back at rate, up to burst'''
+        limiter = RateLimiter(rate=10, burst=2)
+        limiter.reserve()
+        limiter.reserve()
+        time.sleep(0.12)
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertGreater(limiter.reserve(), 0.0)
+        time.sleep(0.4)
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertGreater(limiter.reserve(), 0.0)
+
+    def test_no_rate(self):
+        '''Tests limiters without a rate never wait for tokens'''
+        limiter = RateLimiter(max_in_flight=1)
+        self.assertEqual([limiter.reserve() for _ in range(5)], [0.0] * 5)
+        with limiter:
+            self.assertEqual(limiter.stats['in_flight'], 1)
+        self.assertEqual(limiter.stats['in_flight'], 0)
+        self.assertEqual(limiter.stats['waited'], 0)
+
+
+class TestRateLimiter(unittest.TestCase):
+    '''Clients sharing a RateLimiter'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def client(self, limiter):
+        '''Returns a client of the server (closed after the test)'''
+        client = Cloudforms.Client(host=self.server.host, secure_host=False,
+                                   limiter=limiter)
+        self.addCleanup(client.close)
+        return client
+
+    def test_rate(self):
+        '''Tests calls are spaced out, time waited is recorded'''
+        limiter = RateLimiter(rate=20, burst=2)
+        client = self.client(limiter)
+        start = time.time()
+        for _id in range(1, 9):
+            client.call('get', '/vms/%d' % _id)
+        # 2 calls at once, then 6 more at 20 per second
+        self.assertGreaterEqual(time.time() - start, 0.29)
+        stats = limiter.stats
+        self.assertEqual(stats['acquired'], 8)
+        self.assertEqual(stats['waited'], 6)
+        self.assertGreater(stats['wait_total'], 0.2)
+        self.assertGreater(stats['wait_max'], 0.0)
+        self.assertEqual(stats['queued'], 0)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_max_in_flight(self):
+        '''Tests threads sharing a limiter respect its concurrency cap'''
+        seen = track_in_flight(self.server)
+        limiter = RateLimiter(max_in_flight=2)
+        clients = [self.client(limiter) for _ in range(4)]
+        threads = [threading.Thread(target=client.call,
+                                    args=('get', '/vms/%d' % _id))
+                   for _id, client in enumerate(clients * 2, 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(seen['max'], 2)
+        self.assertEqual(self.server.requests['GET'], 8)
+        stats = limiter.stats
+        self.assertEqual(stats['acquired'], 8)
+        self.assertGreater(stats['waited'], 0)
+        self.assertEqual(stats['in_flight'], 0)
@@ -0,0 +1,107 @@
+'''Payload logging tests (offline, against benchmarks.fake_api)'''
+import logging
+import unittest
+import Cloudforms
+from Cloudforms import logs
+from benchmarks.fake_api import FakeApiServer
+
+SECRETS = {
+    'name': 'vm-1',
+    'password': 'hunter2',
+    'credentials': [{'userid': 'admin', 'Auth_Key': 'ssh-rsa AAAA'}],
+    'options': {'X-Auth-Token': 'abc123', 'api_token': 'def456',
+                'client_secret': 'ghi789'}
+}
+
+
+class Spy(object):
+    '''Counts how many times it is formatted'''
+    formatted = 0
+
+    def __repr__(self):
+        Spy.formatted += 1
+        return '<Spy>'
+
+
+class TestRedaction(unittest.TestCase):
+    '''Credential-like values are never formatted'''
+    def test_redacted(self):
+        '''Tests nested credential values are replaced, case-insensitively'''
+        text = logs.truncate(SECRETS)
+        for secret in ('hunter2', 'ssh-rsa', 'abc123', 'def456', 'ghi789'):
+            self.assertNotIn(secret, text)
+        self.assertEqual(text.count(logs.REDACTED), 5)
+        self.assertIn('"userid": "admin"', text)
+        self.assertIn('"name": "vm-1"', text)
+
+    def test_truncate(self):
+        '''Tests long payloads are cut (with an ellipsis)'''
+        text = logs.truncate(list(range(10000)), 100)
+        self.assertEqual(len(text), 100)
+        self.assertTrue(text.endswith('...'))
+        self.assertEqual(logs.truncate(None), '')
+
+    def test_summarize(self):
+        '''Tests collections are summarized by their size'''
+        self.assertEqual(logs.summarize([{}] * 1234, 3355443),
+                         '1,234 resources, 3.2MB')
+        self.assertEqual(logs.summarize({'action': 'query',
+                                         'resources': [{}]}),
+                         'query, 1 resource')
+        self.assertIn(logs.REDACTED, logs.summarize(SECRETS))
+
+
+class TestPayloadLogging(unittest.TestCase):
+    '''What clients log about their calls'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10).start()
+        self.log = logging.getLogger('Cloudforms.tests.logs')
+        self.client = Cloudforms.Client(host=self.server.host,
+                                        secure_host=False, logger=self.log)
+        Spy.formatted = 0
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def messages(self, level):
+        '''Provisions a VM (with credentials), returns what was logged'''
+        with self.assertLogs(self.log, level) as logged:
+            self.client.call('post', '/provision_requests', data=dict(
+                SECRETS, template_fields={'name': 'template'}))
+        return logged.output
+
+    def test_debug(self):
+        '''Tests request bodies are logged in full, but redacted'''
+        messages = self.messages('DEBUG')
+        self.assertEqual(len(messages), 2)
+        self.assertIn('API Call: [post] http://%s/api/provision_requests'
+                      % self.server.host, messages[0])
+        self.assertIn('"template_fields": {"name": "template"}',
+                      messages[0])
+        for secret in ('hunter2', 'ssh-rsa', 'abc123', 'def456', 'ghi789'):
+            self.assertNotIn(secret, '\n'.join(messages))
+
+    def test_info(self):
+        '''Tests request bodies are only summarized, still redacted'''
+        messages = self.messages('INFO')
+        self.assertEqual(len(messages), 2)
+        self.assertNotIn('hunter2', messages[0])
+        self.assertNotIn('template_fields', messages[0])
+
+    def test_lazy(self):
+        '''Tests payloads are only formatted when a record is emitted'''
+        payload = [Spy()]
+        self.log.setLevel(logging.WARNING)
+        self.addCleanup(self.log.setLevel, logging.NOTSET)
+        logs.log_payload(self.log, 'API Call', 'get', '/vms', payload)
+        self.assertEqual(Spy.formatted, 0)
+        # Summaries of collections do not format their resources
+        with self.assertLogs(self.log, 'INFO') as logged:
+            logs.log_payload(self.log, 'API Call', 'get', '/vms', payload)
+        self.assertEqual(Spy.formatted, 0)
+        self.assertIn('[1 resource]', logged.output[0])
+        with self.assertLogs(self.log, 'DEBUG') as logged:
+            logs.log_payload(self.log, 'API Call', 'get', '/vms', payload)
+        self.assertEqual(Spy.formatted, 1)
+        self.assertIn('[[<Spy>]]', logged.output[0])
@@ -0,0 +1,163 @@
+'''Metrics hook tests (offline, against benchmarks.fake_api)'''
+import threading
+import unittest
+import Cloudforms
+from Cloudforms.cache import ResponseCache, SingleFlight
+from Cloudforms.exceptions import CloudformsHTTPError
+from Cloudforms.metrics import CallInfo, MetricsCollector, path_template
+from benchmarks.fake_api import FakeApiServer
+
+
+def call_info(method, path, total, status=200, **timings):
+    '''Returns the CallInfo of a made up call'''
+    info = CallInfo(method, path)
+    info.status = status
+    info.timings = dict(timings, total=total)
+    return info
+
+
+class TestPrometheus(unittest.TestCase):
+    '''Prometheus text exposition of made up calls'''
+    def setUp(self):
+        self.metrics = MetricsCollector(buckets=(0.5, 1))
+
+    def samples(self, name):
+        '''Returns the samples of a metric, by name and labels'''
+        return [line for line in self.metrics.prometheus().splitlines()
+                if line.startswith('cloudforms_%s{' % name)]
+
+    def test_path_template(self):
+        '''Tests resource IDs are not labels of their own'''
+        self.assertEqual(path_template('/vms/12/tags?expand=resources'),
+                         '/vms/:id/tags')
+        self.assertEqual(path_template('/vms'), '/vms')
+
+    def test_histogram(self):
+        '''Tests cumulative buckets, sum and count (per status)'''
+        for total in (0.25, 0.75, 2.0):
+            self.metrics(call_info('get', '/vms/%d' % int(total * 4),
+                                   total))
+        self.metrics(call_info('get', '/vms/1', 0.5, status=404))
+        self.assertEqual(self.samples('request_duration_seconds_bucket'), [
+            'cloudforms_request_duration_seconds_bucket{method="get",'
+            'path="/vms/:id",status="200",le="0.5"} 1',
+            'cloudforms_request_duration_seconds_bucket{method="get",'
+            'path="/vms/:id",status="200",le="1"} 2',
+            'cloudforms_request_duration_seconds_bucket{method="get",'
+            'path="/vms/:id",status="200",le="+Inf"} 3',
+            'cloudforms_request_duration_seconds_bucket{method="get",'
+            'path="/vms/:id",status="404",le="0.5"} 1',
+            'cloudforms_request_duration_seconds_bucket{method="get",'
+            'path="/vms/:id",status="404",le="1"} 1',
+            'cloudforms_request_duration_seconds_bucket{method="get",'
+            'path="/vms/:id",status="404",le="+Inf"} 1'])
+        self.assertEqual(self.samples('request_duration_seconds_sum')[0],
+                         'cloudforms_request_duration_seconds_sum{method='
+                         '"get",path="/vms/:id",status="200"} 3.0')
+        self.assertEqual(self.samples('request_duration_seconds_count'), [
+            'cloudforms_request_duration_seconds_count{method="get",'
+            'path="/vms/:id",status="200"} 3',
+            'cloudforms_request_duration_seconds_count{method="get",'
+            'path="/vms/:id",status="404"} 1'])
+        self.assertEqual(
+            self.metrics.duration('get', '/vms/:id', 200).count, 3)
+        self.assertEqual(self.metrics.duration('get', '/vms/:id').count, 4)
+
+    def test_phases(self):
+        '''Tests phases get a histogram each (total excluded)'''
+        self.metrics(call_info('post', '/vms', 0.8, queue=0.6, server=0.2))
+        self.assertEqual(self.samples('request_phase_seconds_count'), [
+            'cloudforms_request_phase_seconds_count{method="post",'
+            'path="/vms",phase="queue"} 1',
+            'cloudforms_request_phase_seconds_count{method="post",'
+            'path="/vms",phase="server"} 1'])
+
+    def test_counters(self):
+        '''Tests counters only have samples once they count something'''
+        info = call_info('get', '/vms/1', 0.1)
+        info.bytes, info.retries, info.cached = 100, 2, True
+        self.metrics(info)
+        self.metrics(call_info('get', '/vms/2', 0.1))
+        error = call_info('get', '/vms/3', 0.1, status=None)
+        error.error = 'CloudformsTransportError'
+        self.metrics(error)
+        self.assertEqual(self.samples('response_bytes_total'), [
+            'cloudforms_response_bytes_total{method="get",'
+            'path="/vms/:id"} 100'])
+        self.assertEqual(self.samples('retries_total'), [
+            'cloudforms_retries_total{method="get",path="/vms/:id"} 2'])
+        self.assertEqual(self.samples('cache_hits_total'), [
+            'cloudforms_cache_hits_total{method="get",path="/vms/:id"} 1'])
+        self.assertEqual(self.samples('coalesced_total'), [])
+        self.assertEqual(self.samples('errors_total'), [
+            'cloudforms_errors_total{method="get",path="/vms/:id",'
+            'error="CloudformsTransportError"} 1'])
+
+    def test_exposition(self):
+        '''Tests HELP / TYPE headers, label escaping and the prefix'''
+        self.metrics(call_info('get', '/a"b\\c', 0.1))
+        text = self.metrics.prometheus(prefix='cf')
+        self.assertTrue(text.endswith('\n'))
+        self.assertIn('# TYPE cf_request_duration_seconds histogram\n',
+                      text)
+        self.assertIn('# TYPE cf_errors_total counter\n', text)
+        self.assertIn('cf_request_duration_seconds_count{method="get",'
+                      'path="/a\\"b\\\\c",status="200"} 1\n', text)
+
+
+class TestMetricsCollector(unittest.TestCase):
+    '''MetricsCollector as a client hook'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10, latency=0.2).start()
+        self.metrics = MetricsCollector()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def client(self, **options):
+        '''Returns a client of the server (closed after the test)'''
+        client = Cloudforms.Client(host=self.server.host, secure_host=False,
+                                   hooks=[self.metrics], **options)
+        self.addCleanup(client.close)
+        return client
+
+    def statuses(self):
+        '''Returns the status label of every duration sample'''
+        return set(key[2] for key in self.metrics.durations)
+
+    def test_calls(self):
+        '''Tests calls, cache hits and errors are counted'''
+        client = self.client(cache=ResponseCache())
+        client.call('get', '/vms/1')
+        client.call('get', '/vms/1')
+        with self.assertRaises(CloudformsHTTPError):
+            client.call('get', '/vms/99')
+        self.assertEqual(self.statuses(), set(['200', '404']))
+        self.assertEqual(self.metrics.duration('get', '/vms/:id', 200).count,
+                         2)
+        self.assertEqual(self.metrics.cached, {('get', '/vms/:id'): 1})
+        self.assertEqual(self.metrics.errors, {
+            ('get', '/vms/:id', 'CloudformsHTTPError'): 1})
+        self.assertGreater(self.metrics.bytes[('get', '/vms/:id')], 0)
+        # A cache hit is not a server round trip
+        self.assertLess(self.metrics.duration('get', '/vms/:id').quantile(
+            0.25), 0.2)
+
+    def test_coalesced(self):
+        '''Tests coalesced calls are reported with the shared status'''
+        client = self.client(coalesce=SingleFlight())
+        barrier = threading.Barrier(4)
+
+        def get():
+            '''Gets the same VM as every other thread'''
+            barrier.wait()
+            client.call('get', '/vms/1')
+
+        threads = [threading.Thread(target=get) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreater(self.metrics.coalesced[('get', '/vms/:id')], 0)
+        self.assertEqual(self.statuses(), set(['200']))
+        self.assertNotIn('status=""', self.metrics.prometheus())
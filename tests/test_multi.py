@@ -0,0 +1,67 @@
+'''Multi-region client tests (offline, against benchmarks.fake_api)'''
+import unittest
+import Cloudforms
+from Cloudforms.exceptions import CloudformsError, CloudformsRegionError
+from benchmarks.fake_api import FakeApiServer
+
+ID_1 = str(10 ** 12 + 3)
+ID_2 = str(2 * 10 ** 12 + 3)
+
+
+class TestMultiClient(unittest.TestCase):
+    '''MultiClient routing and merging tests'''
+    def setUp(self):
+        self.servers = dict(
+            (region, FakeApiServer(vms=5, region=region).start())
+            for region in (1, 2))
+        self.client = Cloudforms.MultiClient(dict(
+            (region, Cloudforms.Client(host=server.host, secure_host=False))
+            for region, server in self.servers.items()), timeout=5)
+
+    def tearDown(self):
+        self.client.close()
+        for server in self.servers.values():
+            server.stop()
+
+    def gets(self):
+        '''Returns the number of GETs each region served'''
+        return dict((region, server.requests.get('GET', 0))
+                    for region, server in self.servers.items())
+
+    def test_routing(self):
+        '''Tests per-ID calls only go to the region owning the ID'''
+        vs_mgr = Cloudforms.VSManager(self.client)
+        vm = vs_mgr.get(ID_2)
+        self.assertEqual((vm['id'], vm['region']), (ID_2, 2))
+        self.assertEqual(self.gets(), {1: 0, 2: 1})
+        with self.assertRaises(CloudformsError):
+            vs_mgr.get('3')
+
+    def test_fan_out(self):
+        '''Tests collection reads are merged from every region'''
+        vms = Cloudforms.VSManager(self.client).list()
+        self.assertEqual(len(vms), 10)
+        self.assertEqual(sorted(set(vm['region'] for vm in vms)), [1, 2])
+        self.assertEqual(self.gets(), {1: 1, 2: 1})
+        raw = self.client.call('get', '/vms', raw=True)
+        self.assertEqual(raw['count'], 10)
+
+    def test_split(self):
+        '''Tests action POSTs are split by region, in order'''
+        results = Cloudforms.VSManager(self.client).stop_many(
+            [ID_2, ID_1, str(10 ** 12 + 99)])
+        self.assertEqual([res['success'] for res in results],
+                         [True, True, False])
+        self.assertEqual([res['region'] for res in results], [2, 1, 1])
+        self.assertEqual(dict(
+            (region, server.requests['POST'])
+            for region, server in self.servers.items()), {1: 1, 2: 1})
+
+    def test_partial(self):
+        '''Tests a failed region fails the call, unless partial is set'''
+        self.servers[2].error_rate = 1.0
+        with self.assertRaises(CloudformsRegionError):
+            self.client.call('get', '/vms')
+        self.client.partial = True
+        self.assertEqual(len(Cloudforms.VSManager(self.client).list()), 5)
+        self.assertEqual(self.client.failures, {1: 0, 2: 2})
@@ -0,0 +1,58 @@
+'''Collection paging tests (offline, against benchmarks.fake_api)'''
+import unittest
+import Cloudforms
+from benchmarks.fake_api import FakeApiServer
+
+IDS = [str(_id) for _id in range(1, 251)]
+
+
+class TestCappedPaging(unittest.TestCase):
+    '''Walks of an appliance capping limit at 100 resources'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=250, max_results=100).start()
+        self.client = Cloudforms.Client(host=self.server.host,
+                                        secure_host=False)
+        self.vs_mgr = Cloudforms.VSManager(self.client)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def ids(self, **options):
+        '''Returns the IDs of the VMs listed'''
+        return [vm['id'] for vm in self.vs_mgr.list(**options)]
+
+    def test_walk(self):
+        '''Tests pages larger than the cap'''
+        self.assertEqual(self.ids(page_size=200), IDS)
+        # The reported total ends the walk (no trailing empty page)
+        self.assertEqual(self.server.requests['GET'], 3)
+
+    def test_walk_below_cap(self):
+        '''Tests pages smaller than the cap'''
+        self.assertEqual(self.ids(page_size=50), IDS)
+        self.assertEqual(self.server.requests['GET'], 5)
+
+    def test_stream(self):
+        '''Tests streamed pages larger than the cap'''
+        self.assertEqual(self.ids(page_size=200, stream=True), IDS)
+
+    def test_prefetch(self):
+        '''Tests prefetched pages larger than the cap'''
+        self.assertEqual(self.ids(page_size=200, workers=2), IDS)
+        self.assertEqual(self.server.requests['GET'], 3)
+
+    def test_prefetch_below_cap(self):
+        '''Tests prefetched pages smaller than the cap'''
+        self.assertEqual(self.ids(page_size=30, workers=4), IDS)
+        self.assertEqual(self.server.requests['GET'], 9)
+
+    def test_export(self):
+        '''Tests exports (1000 per page by default)'''
+        self.assertEqual(len(self.vs_mgr.export()), 250)
+
+    def test_filtered(self):
+        '''Tests walks of a filtered collection'''
+        self.assertEqual(self.ids(page_size=200, params={
+            'filter[]': ['power_state=off']}),
+                         [_id for _id in IDS if not int(_id) % 3])
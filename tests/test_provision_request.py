@@ -0,0 +1,75 @@
+'''Bulk provisioning tests (offline, against benchmarks.fake_api)'''
+import unittest
+import Cloudforms
+from Cloudforms.poller import Backoff
+from benchmarks.fake_api import FakeApiServer
+
+
+def make_specs(count):
+    '''Returns provision request specs'''
+    return ({
+        'template_fields': {'name': 'template'},
+        'vm_fields': {'vm_name': 'vm-%03d' % idx}
+    } for idx in range(count))
+
+
+class TestCreateMany(unittest.TestCase):
+    '''ProvisionRequestManager.create_many tests'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=1, task_duration=0.2).start()
+        self.client = Cloudforms.Client(host=self.server.host,
+                                        secure_host=False)
+        self.preq_mgr = Cloudforms.ProvisionRequestManager(self.client)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def outstanding(self):
+        '''Returns the number of provision requests not finished yet'''
+        return sum(1 for preq in self.client.call(
+            'get', '/provision_requests', params={'expand': 'resources'})
+                   if preq['request_state'] != 'finished')
+
+    def test_create_many(self):
+        '''Tests every spec is provisioned, max_outstanding at a time'''
+        done = list()
+        for preq in self.preq_mgr.create_many(
+                make_specs(25), max_outstanding=10, batch_size=4,
+                timeout=30, backoff=Backoff(0.05, 0.2)):
+            self.assertLessEqual(self.outstanding(), 10)
+            done.append(preq)
+        self.assertEqual(len(done), 25)
+        self.assertTrue(all(preq['request_state'] == 'finished'
+                            for preq in done))
+        self.assertEqual(len(set(preq['id'] for preq in done)), 25)
+        # Up to 4 specs per create request
+        self.assertGreaterEqual(self.server.requests['POST'], 7)
+        self.assertLess(self.server.requests['POST'], 25)
+
+    def test_timeout(self):
+        '''Tests create_many reports what is left after timeout'''
+        self.server.task_duration = 60
+        done = list(self.preq_mgr.create_many(
+            make_specs(6), max_outstanding=4, timeout=0.3,
+            backoff=Backoff(0.05, 0.1)))
+        self.assertEqual(len(self.server.collections[
+            'provision_requests'].resources), 4)
+        self.assertFalse(any(preq['success'] for preq in done))
+        self.assertEqual(sorted(preq['id'] for preq in done[:4]),
+                         ['1', '2', '3', '4'])
+        self.assertEqual([preq['spec']['vm_fields']['vm_name']
+                          for preq in done[4:]], ['vm-004', 'vm-005'])
+
+    def test_max_outstanding(self):
+        '''Tests create_many needs room for a provision request'''
+        with self.assertRaises(ValueError):
+            self.preq_mgr.create_many(make_specs(1), max_outstanding=0)
+
+    def test_wait_many(self):
+        '''Tests wait_many yields each provision request once done'''
+        ids = [self.preq_mgr.create(spec)['id']
+               for spec in make_specs(3)]
+        done = list(self.preq_mgr.wait_many(ids, timeout=10,
+                                            backoff=Backoff(0.05, 0.2)))
+        self.assertEqual(sorted(preq['id'] for preq in done), sorted(ids))
@@ -0,0 +1,89 @@
+'''Retry policy and circuit breaker tests (offline, against
+benchmarks.fake_api)'''
+import random
+import unittest
+import Cloudforms
+from Cloudforms.exceptions import (
+    CloudformsCircuitOpenError,
+    CloudformsHTTPError
+)
+from Cloudforms.retry import CircuitBreaker, RetryBudget, RetryPolicy
+from benchmarks.fake_api import FakeApiServer
+
+
+class TestRetry(unittest.TestCase):
+    '''RetryPolicy / CircuitBreaker tests'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10, retry_after=0).start()
+        random.seed(42)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def client(self, **options):
+        '''Returns a client of the server (closed after the test)'''
+        client = Cloudforms.Client(host=self.server.host, secure_host=False,
+                                   **options)
+        self.addCleanup(client.close)
+        return client
+
+    def test_retried(self):
+        '''Tests failed idempotent calls are retried until they succeed'''
+        self.server.error_rate = 0.5
+        policy = RetryPolicy(retries=10, interval=0.01,
+                             budget=RetryBudget(ratio=1, max_tokens=100))
+        client = self.client(retry=policy)
+        for _id in range(1, 11):
+            self.assertEqual(client.call('get', '/vms/%s' % _id)['id'],
+                             str(_id))
+        self.assertGreater(policy.retried, 0)
+        self.assertEqual(self.server.requests['GET'], 10 + policy.retried)
+
+    def test_exhausted(self):
+        '''Tests calls fail once their retries are used up'''
+        self.server.error_rate = 1.0
+        policy = RetryPolicy(retries=2, interval=0.01)
+        client = self.client(retry=policy)
+        with self.assertRaises(CloudformsHTTPError):
+            client.call('get', '/vms/1')
+        self.assertEqual(self.server.requests['GET'], 3)
+        self.assertEqual(policy.exhausted, 1)
+
+    def test_not_idempotent(self):
+        '''Tests POSTs are not retried'''
+        self.server.error_rate = 1.0
+        client = self.client(retry=RetryPolicy(interval=0.01))
+        with self.assertRaises(CloudformsHTTPError):
+            client.call('post', '/vms/1', {'action': 'stop'})
+        self.assertEqual(self.server.requests['POST'], 1)
+
+    def test_budget(self):
+        '''Tests retries stop once the budget is spent'''
+        self.server.error_rate = 1.0
+        policy = RetryPolicy(retries=5, interval=0.01,
+                             budget=RetryBudget(ratio=0, max_tokens=3))
+        client = self.client(retry=policy)
+        for _ in range(2):
+            with self.assertRaises(CloudformsHTTPError):
+                client.call('get', '/vms/1')
+        self.assertEqual(policy.retried, 3)
+        self.assertEqual(policy.throttled, 2)
+        self.assertEqual(self.server.requests['GET'], 5)
+
+    def test_breaker(self):
+        '''Tests the circuit opens, fails fast, then closes again'''
+        self.server.error_rate = 1.0
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.2)
+        client = self.client(breaker=breaker)
+        for _ in range(3):
+            with self.assertRaises(CloudformsHTTPError):
+                client.call('get', '/vms/1')
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CloudformsCircuitOpenError):
+            client.call('get', '/vms/1')
+        self.assertEqual(self.server.requests['GET'], 3)
+        self.assertEqual(breaker.rejected, 1)
+        self.server.error_rate = 0.0
+        breaker.reset_timeout = 0
+        self.assertEqual(client.call('get', '/vms/1')['id'], '1')
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
@@ -0,0 +1,104 @@
+'''Bulk tagging tests (offline, against benchmarks.fake_api)'''
+import unittest
+import Cloudforms
+from Cloudforms.managers.tag import ServiceTagManager
+from Cloudforms.poller import Backoff
+from Cloudforms.utils import permanent_failure
+from benchmarks.fake_api import FakeApiServer
+
+
+def flaky_actions(server, failing):
+    '''Fails the first action on each resource of failing (as the
+    appliance would on a transient error), returns the hrefs of every
+    resource acted on'''
+    sent = list()
+    action = server.action
+
+    def flaky_action(collection, name, resource):
+        '''Records the resource, fails it the first time if asked to'''
+        href = resource.get('href') or ''
+        _id = href.rsplit('/', 1)[-1]
+        sent.append(_id)
+        if _id in failing and sent.count(_id) == 1:
+            return {'success': False, 'href': href,
+                    'message': 'Temporary failure, try again'}
+        return action(collection, name, resource)
+
+    server.action = flaky_action
+    return sent
+
+
+class TestPermanentFailure(unittest.TestCase):
+    '''Which failed results are worth sending again'''
+    def test_permanent(self):
+        '''Tests missing resources and rejected requests are final'''
+        self.assertTrue(permanent_failure({
+            'success': False, 'message': "Couldn't find resource /vms/9"}))
+        self.assertTrue(permanent_failure({
+            'success': False, 'message': 'Invalid tag name'}))
+        self.assertTrue(permanent_failure({
+            'success': False, 'message': 'Not Found', 'status': 404}))
+
+    def test_transient(self):
+        '''Tests server errors, throttling and timeouts are retried'''
+        for status in (408, 429, 500, 503):
+            self.assertFalse(permanent_failure({
+                'success': False, 'message': 'Not Found',
+                'status': status}))
+        self.assertFalse(permanent_failure({
+            'success': False, 'message': 'Connection reset by peer'}))
+        self.assertFalse(permanent_failure({'success': False}))
+
+
+class TestAssignMany(unittest.TestCase):
+    '''ServiceTagManager.assign_many / unassign_many tests'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10).start()
+        self.client = Cloudforms.Client(host=self.server.host,
+                                        secure_host=False)
+        self.tags = Cloudforms.VSManager(self.client).tags
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_results(self):
+        '''Tests per-resource results, only transient failures retried'''
+        sent = flaky_actions(self.server, ['3', '7'])
+        ids = [str(_id) for _id in range(1, 9)] + ['998', '999']
+        results = self.tags.assign_many(
+            dict((_id, ['/environment/prod']) for _id in ids),
+            batch_size=4, backoff=Backoff(0.01))
+        self.assertEqual(sorted(results), sorted(ids))
+        self.assertEqual(sorted(_id for _id, res in results.items()
+                                if res['success']), ids[:8])
+        for _id in ('998', '999'):
+            self.assertIn("Couldn't find", results[_id]['message'])
+        # 3 batches, then the transient failures once more (in one)
+        self.assertEqual(self.server.requests['POST'], 4)
+        self.assertEqual(sorted(sent), sorted(ids + ['3', '7']))
+        self.assertEqual(self.server.tags[('vms', '3')],
+                         {'/environment/prod': {
+                             'name': '/environment/prod'}})
+
+    def test_retries(self):
+        '''Tests transient failures are final after retries'''
+        flaky_actions(self.server, ['1'])
+        results = self.tags.unassign_many({'1': ['/a'], '2': ['/a']},
+                                          retries=0, backoff=Backoff(0.01))
+        self.assertFalse(results['1']['success'])
+        self.assertTrue(results['2']['success'])
+        self.assertEqual(self.server.requests['POST'], 1)
+
+    def test_rejected(self):
+        '''Tests rejected requests are reported, not sent again'''
+        tags = ServiceTagManager(self.client, 'unknown')
+        results = tags.assign_many({'1': ['/a'], '2': ['/a']},
+                                   backoff=Backoff(0.01))
+        self.assertEqual(self.server.requests['POST'], 1)
+        self.assertEqual(sorted(results), ['1', '2'])
+        for result in results.values():
+            self.assertFalse(result['success'])
+            self.assertEqual(result['status'], 404)
+            self.assertEqual(result['href'], '%s/unknown/%s' % (
+                self.client.base_url, result['href'][-1]))
@@ -0,0 +1,155 @@
+'''Transport tests (offline, against benchmarks.fake_api and
+benchmarks.h2_stub_server)'''
+import threading
+import unittest
+from requests.exceptions import RequestException
+import Cloudforms
+from Cloudforms.exceptions import CloudformsTransportError
+from Cloudforms.transport import (
+    HTTP2Transport,
+    RequestsTransport,
+    Transport,
+    httpx
+)
+from benchmarks.fake_api import FakeApiServer
+
+try:
+    from benchmarks.h2_stub_server import H2StubServer
+except ImportError:  # pragma: no cover (h2 missing)
+    H2StubServer = None
+
+
+class RecordingTransport(RequestsTransport):
+    '''Records the calls it sends'''
+    def __init__(self, **options):
+        RequestsTransport.__init__(self, **options)
+        self.sent = list()
+        self.closed = False
+
+    # pylint: disable=too-many-arguments
+    def request(self, method, url, auth=None, json=None, params=None,
+                headers=None, stream=False):
+        self.sent.append((method, url))
+        return RequestsTransport.request(self, method, url, auth, json,
+                                         params, headers, stream)
+
+    def close(self):
+        self.closed = True
+        RequestsTransport.close(self)
+
+
+class TestTransportSelection(unittest.TestCase):
+    '''Which transport a client sends its requests with'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_default(self):
+        '''Tests clients default to pooled HTTP/1.1 (requests)'''
+        client = Cloudforms.Client(host=self.server.host, secure_host=False)
+        try:
+            self.assertIs(type(client.transport), RequestsTransport)
+            self.assertEqual(client.call('get', '/vms/1')['id'], '1')
+        finally:
+            client.close()
+
+    def test_custom(self):
+        '''Tests a given transport sends every call (and is closed)'''
+        transport = RecordingTransport()
+        client = Cloudforms.Client(host=self.server.host, secure_host=False,
+                                   transport=transport)
+        Cloudforms.VSManager(client).get('1')
+        Cloudforms.VSManager(client).stop('2')
+        client.close()
+        self.assertEqual(transport.sent, [
+            ('get', 'http://%s/api/vms/1' % self.server.host),
+            ('post', 'http://%s/api/vms/2' % self.server.host)])
+        self.assertTrue(transport.closed)
+
+    def test_interface(self):
+        '''Tests Transport itself cannot send requests'''
+        client = Cloudforms.Client(host=self.server.host, secure_host=False,
+                                   transport=Transport())
+        with self.assertRaises(NotImplementedError):
+            client.call('get', '/vms/1')
+        self.assertEqual(self.server.requests, dict())
+
+
+class TestRequestsTimeout(unittest.TestCase):
+    '''RequestsTransport timeouts'''
+    def setUp(self):
+        self.server = FakeApiServer(vms=10, latency=0.5).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def call(self, timeout):
+        '''Gets a VM with a transport timing out after timeout seconds'''
+        client = Cloudforms.Client(
+            host=self.server.host, secure_host=False,
+            transport=RequestsTransport(timeout=timeout))
+        try:
+            return client.call('get', '/vms/1')
+        finally:
+            client.close()
+
+    def test_timeout(self):
+        '''Tests calls slower than the timeout fail'''
+        with self.assertRaises(RequestException):
+            self.call(0.1)
+
+    def test_no_timeout(self):
+        '''Tests calls within the timeout (or without one) succeed'''
+        self.assertEqual(self.call(2)['id'], '1')
+        self.assertEqual(self.call(None)['id'], '1')
+
+
+@unittest.skipIf(httpx is None or H2StubServer is None,
+                 'HTTP/2 needs httpx and h2 (pip install Cloudforms[http2])')
+class TestHTTP2Transport(unittest.TestCase):
+    '''HTTP/2 (h2c) streams multiplexed over one connection'''
+    def setUp(self):
+        self.server = H2StubServer(latency=0.2).start()
+        self.transport = HTTP2Transport(timeout=1)
+        self.client = Cloudforms.Client(host=self.server.host,
+                                        secure_host=False,
+                                        transport=self.transport)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def get_many(self, count):
+        '''Lists VMs from count threads at once, returns the errors'''
+        errors = list()
+
+        def get():
+            '''Lists VMs, records the error (if any)'''
+            try:
+                self.client.call('get', '/vms')
+            except CloudformsTransportError as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=get) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_multiplexed(self):
+        '''Tests concurrent calls share one connection'''
+        self.assertEqual(self.get_many(20), list())
+        self.assertEqual(self.server.requests, 20)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_stream_timeout(self):
+        '''Tests a timed out call does not fail its connection'''
+        self.assertEqual(self.get_many(1), list())
+        self.server.latency = 1.5
+        self.assertEqual(len(self.get_many(4)), 4)
+        self.server.latency = 0.0
+        self.assertEqual(self.get_many(4), list())
+        self.assertEqual(self.server.connections, 1)